@@ -1,15 +1,23 @@
 import streamlit as st
 import pandas as pd
-import io
 from file_processor import FileProcessor
+from background import IngestJob
+from parse_cache import ParseCache
+from instrumentation import Instrumentation, stage_rows
+from excel_generator import TABLE_FORMATS, TABLE_LAYOUTS, available_table_formats
+from report_formats import REPORT_FORMATS
 import base64
+import os
+import time
 
-def add_bg_image():
-    with open("image.jpg", "rb") as f:
+@st.cache_data
+def background_css(path, modified):
+    """Style with the background image inlined, read and encoded once per image version (modified is its mtime)"""
+    with open(path, "rb") as f:
         data = f.read()
     encoded = base64.b64encode(data).decode()
     
-    st.markdown(f"""
+    return f"""
     <style>
     .stApp {{
         background-image: url(data:image/jpeg;base64,{encoded});
@@ -18,22 +26,120 @@ def add_bg_image():
         background-repeat: no-repeat;
     }}
     </style>
-    """, unsafe_allow_html=True)
+    """
+
+def add_bg_image():
+    st.markdown(background_css("image.jpg", os.path.getmtime("image.jpg")), unsafe_allow_html=True)
 add_bg_image()
 # Page configuration
 st.title("Hello :) Vijai Bhushan Sharma !")
 st.set_page_config(page_title="Coverage Data Extractor", page_icon="📊", layout="wide")
 
+@st.cache_resource
+def get_parse_cache():
+    """One on-disk parse cache per server process, shared by every session"""
+    return ParseCache(os.environ.get('COVERAGE_PARSE_CACHE'))
+
+def memory_budget():
+    """Per-session RAM budget for coverage rows (COVERAGE_MEMORY_BUDGET_MB); rows beyond it spill to disk"""
+    budget = os.environ.get('COVERAGE_MEMORY_BUDGET_MB')
+    return int(float(budget) * 1024 * 1024) if budget else None
+
 # Initialize session state
 if 'processor' not in st.session_state:
     st.session_state.processor = None
 if 'results' not in st.session_state:
     st.session_state.results = None
+if 'ingest_job' not in st.session_state:
+    st.session_state.ingest_job = None
+
+# Seconds between reruns while a background import is running
+IMPORT_POLL_SECONDS = 0.5
+
+def import_running():
+    """Whether a background import is still adding files"""
+    job = st.session_state.ingest_job
+    return job is not None and job.running
+
+def render_downloads(excel_generator, format_type, device_filter, date_filter, latest_only, tab_key):
+    """Workbook, workbook bundle and table downloads for the filters of a format tab"""
+    report_format = REPORT_FORMATS.get(format_type)
+    format_label = report_format.label if report_format is not None else format_type
+    # Many devices: one workbook per device (or per shard of devices) in a ZIP, built by a process pool
+    devices_per_workbook = st.selectbox(
+        "Workbook layout",
+        [0, 1, 25, 100],
+        format_func=lambda count: {0: "Single workbook", 1: "ZIP: one workbook per device"}.get(
+            count, f"ZIP: {count} devices per workbook"),
+        key=f"bundle_{tab_key}"
+    )
+    fleet_summary = st.checkbox(
+        "Add fleet summary sheet",
+        key=f"fleet_sheet_{tab_key}",
+        disabled=bool(devices_per_workbook),
+        help="Start the workbook with a devices x sections pivot per channel, with fleet mean and percentile rows"
+    )
+    
+    # Download button (each artifact is cached until the filters or the data change)
+    if devices_per_workbook:
+        st.download_button(
+            f"Download {format_label} Workbooks (ZIP)",
+            excel_generator.get_bundle_bytes(devices_per_workbook, format_type, device_filter, date_filter, workers=0,
+                                            latest_only=latest_only),
+            f"coverage_data_{format_type.replace('-', '_')}_workbooks.zip",
+            "application/zip",
+            key=f"dl_bundle_{tab_key}"
+        )
+    else:
+        st.download_button(
+            f"Download {format_label} Excel",
+            excel_generator.get_excel_bytes(format_type, device_filter, date_filter, latest_only, fleet_summary),
+            f"coverage_data_{format_type.replace('-', '_')}.xlsx",
+            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            key=f"dl_{tab_key}"
+        )
+    cache_stats = excel_generator.excel_cache.stats()
+    st.caption(f"Workbook cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+               f"{cache_stats['entries']} cached ({cache_stats['bytes'] / 1024:.0f} KB)")
+    
+    # Flat tables for analytics tools (built only once a format is picked)
+    table_labels = {'csv': "CSV", 'parquet': "Parquet", 'feather': "Feather (Arrow IPC)"}
+    col1, col2 = st.columns(2)
+    with col1:
+        table_format = st.selectbox(
+            "Also export as",
+            [None] + available_table_formats(),
+            format_func=lambda value: "Excel only" if value is None else table_labels[value],
+            key=f"tbl_fmt_{tab_key}"
+        )
+    with col2:
+        table_layout = st.radio(
+            "Table layout",
+            TABLE_LAYOUTS,
+            format_func={'device': "Per device (Y/M/C/K columns)", 'tidy': "Tidy (one row per value)"}.get,
+            horizontal=True,
+            key=f"tbl_layout_{tab_key}"
+        )
+    if table_format:
+        extension, mime = TABLE_FORMATS[table_format]
+        st.download_button(
+            f"Download {format_label} {table_labels[table_format]}",
+            excel_generator.get_table_bytes(table_format, table_layout, format_type, device_filter, date_filter, latest_only),
+            f"coverage_data_{format_type.replace('-', '_')}_{table_layout}.{extension}",
+            mime,
+            key=f"dl_tbl_{tab_key}"
+        )
+
+def format_devices_of(excel_generator, format_type, data):
+    """Sorted device IDs of a format, rebuilt only when the data changes"""
+    return excel_generator.memoized(('devices', format_type), lambda: excel_generator.get_unique_devices(data))
 
 def render_format_tab(format_type, data, tab_key):
     """Render a format-specific tab with filters, download, and preview"""
-    format_devices = sorted(list(set(row['Device_ID'] for row in data if row['Device_ID'])))
-    format_dates = sorted(list(set(str(row['Date']) for row in data if row['Date'])))
+    excel_generator = st.session_state.processor.excel_generator
+    # Reruns with unchanged data reuse the option lists, views, pivots and previews (see ExcelGenerator.memoized)
+    format_devices = format_devices_of(excel_generator, format_type, data)
+    format_dates = excel_generator.memoized(('dates', format_type), lambda: excel_generator.get_unique_dates(data))
     
     # Filters
     col1, col2, col3 = st.columns(3)
@@ -56,166 +162,193 @@ def render_format_tab(format_type, data, tab_key):
     with col3:
         max_rows = st.number_input("Preview rows", 1, 1000, 20, key=f"rows_{tab_key}")
     
-    # Filter data
-    filtered_data = [
-        row for row in st.session_state.processor.excel_generator.all_data 
-        if row.get('Format_Type') == format_type and
-        (not device_filter or row['Device_ID'] == device_filter) and
-        (not date_filter or date_filter in str(row['Date']))
-    ]
+    latest_only = st.checkbox(
+        "Latest report per device only",
+        key=f"latest_{tab_key}",
+        help="Keep each device's most recent matching report instead of merging all of its reports into one sheet"
+    )
+    if device_filter:
+        with st.expander(f"Report history of {device_filter}", expanded=False):
+            st.dataframe(excel_generator.get_device_history(device_filter), use_container_width=True)
     
-    # Generate Excel
-    excel_data = st.session_state.processor.excel_generator.generate_excel_with_device_headers(filtered_data)
+    if import_running():
+        st.info("Downloads are available once processing has finished")
+    else:
+        render_downloads(excel_generator, format_type, device_filter, date_filter, latest_only, tab_key)
     
-    # Download button
-    format_label = "Mono" if format_type == "1-column" else "Multi Coverage"
-    st.download_button(
-        f"Download {format_label} Excel",
-        excel_data,
-        f"coverage_data_{format_type.replace('-', '_')}.xlsx",
-        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        key=f"dl_{tab_key}"
-    )
+    # Fleet comparison: every device's sections side by side (all devices, whatever the device filter)
+    if st.checkbox("Show fleet section pivot", key=f"pivot_{tab_key}"):
+        pivot = excel_generator.memoized(
+            ('pivot', format_type, date_filter, latest_only),
+            lambda: excel_generator.get_section_pivot(
+                excel_generator.apply_filters(None, date_filter, format_type, latest_only=latest_only))
+        )
+        display_section_pivot(pivot, tab_key)
     
-    # Preview
+    # Preview (built from the in-memory store; no workbook round-trip)
     if st.checkbox("Show Preview", key=f"prev_{tab_key}"):
         try:
-            excel_file = io.BytesIO(excel_data)
-            sheet_names = pd.ExcelFile(excel_file).sheet_names
+            previews = excel_generator.memoized(
+                ('previews', format_type, device_filter, date_filter, latest_only, max_rows),
+                lambda: excel_generator.get_device_previews(
+                    excel_generator.apply_filters(device_filter, date_filter, format_type, latest_only=latest_only), max_rows)
+            )
             
-            if len(sheet_names) > 1:
-                sheet_tabs = st.tabs(sheet_names)
-                for j, sheet_name in enumerate(sheet_names):
+            if len(previews) > 1:
+                sheet_tabs = st.tabs([preview['sheet_name'] for preview in previews])
+                for j, preview in enumerate(previews):
                     with sheet_tabs[j]:
-                        display_excel_sheet(excel_file, sheet_name, max_rows, format_type, f"{tab_key}_{j}")
+                        display_device_preview(preview, format_type, f"{tab_key}_{j}")
+            elif previews:
+                display_device_preview(previews[0], format_type, tab_key)
             else:
-                display_excel_sheet(excel_file, sheet_names[0], max_rows, format_type, tab_key)
+                st.dataframe(pd.DataFrame(columns=['Section', 'Coverage']), use_container_width=True)
                 
         except Exception as e:
             st.error(f"Preview error: {str(e)}")
 
-def display_excel_sheet(excel_file, sheet_name, max_rows, format_type, unique_key):
-    """Display Excel sheet with proper formatting and calculate averages"""
-    df = pd.read_excel(excel_file, sheet_name=sheet_name, header=None)
+def display_section_pivot(pivot, unique_key):
+    """Devices x sections table of one channel, fleet mean and percentile rows first"""
+    if not len(pivot):
+        st.info("No section rows to compare")
+        return
+    channels = pivot.channels
+    channel = st.radio("Channel", channels, horizontal=True, key=f"pivot_channel_{unique_key}") if len(channels) > 1 else channels[0]
+    st.caption(f"Mean coverage {channel}(%) per device and section: {len(pivot)} devices, {len(pivot.sections)} sections")
+    st.dataframe(pivot.frame(channel).round(2), use_container_width=True)
+
+def display_device_preview(preview, format_type, unique_key):
+    """Display a device sheet preview with proper formatting and calculate averages"""
+    total_row = preview['total_row']
+    data_rows = preview['rows']
     
-    if len(df) > 6:
-        header_df = df.iloc[:6]
-        data_section = df.iloc[6:]
-        
-        # Find Total row and other data rows
-        total_row = None
-        data_rows = []
-        
-        for idx, row in data_section.iterrows():
-            if pd.notna(row.iloc[0]) and str(row.iloc[0]).lower().strip() == 'total':
-                total_row = row
-            else:
-                data_rows.append(row)
-        
-        # FIXED: Always show Total row first, then add limited data rows
-        display_rows = []
-        
-        # Always add Total row first if it exists
-        if total_row is not None:
-            display_rows.append(total_row)
-        
-        # Add up to max_rows of non-total data
-        display_rows.extend(data_rows[:max_rows])
-        
-        # Create display dataframe with header + total + data
-        if display_rows:
-            display_data = pd.DataFrame(display_rows)
-            display_df = pd.concat([header_df, display_data], ignore_index=True)
-        else:
-            display_df = header_df
-        
-        # Display the dataframe
-        st.dataframe(display_df, use_container_width=True)
-        
-        # Show averages section
-        if total_row is not None or len(data_rows) > 0:
-            visible_data_rows = data_rows[:max_rows]
-            calculate_and_display_averages(visible_data_rows, format_type, unique_key, total_row)
-    else:
-        st.dataframe(df, use_container_width=True)
+    # Always show Total row first, then the limited data rows
+    display_rows = preview['header_rows'] + ([total_row] if total_row is not None else []) + data_rows
+    st.dataframe(pd.DataFrame(display_rows), use_container_width=True)
+    
+    # Show averages section
+    if total_row is not None or len(data_rows) > 0:
+        calculate_and_display_averages(preview['averages'], format_type, unique_key, total_row)
 
-def calculate_and_display_averages(data_rows, format_type, unique_key, total_row=None):
-    """Calculate and display column-wise averages with Total section values"""
+def calculate_and_display_averages(averages, format_type, unique_key, total_row=None):
+    """Display column-wise averages (computed vectorized from the store)"""
     try:
         st.markdown("#### Coverage Averages")
         
         if format_type == "1-column":
-            coverage_values = []
-            for row in data_rows:
-                if len(row) > 1 and pd.notna(row.iloc[1]):
-                    try:
-                        coverage_values.append(float(row.iloc[1]))
-                    except (ValueError, TypeError):
-                        continue
-            
-            # Create summary data
-            summary_data = []
-            
-            if coverage_values:
-                avg = sum(coverage_values) / len(coverage_values)
-                summary_data.append({
-                    'Coverage Type': 'Calculated Average',
-                    'Average (%)': f"{avg:.2f}"
-                })
-            
-            if summary_data:
-                summary_df = pd.DataFrame(summary_data)
-                st.dataframe(summary_df, use_container_width=True, hide_index=True)
-        
+            channels = [('Y', 'Calculated Average')]
         else:  # 4-column format
-            summary_data = []
-            
-            # Calculate averages from visible data
-            for col, name in [(1, 'Y'), (2, 'M'), (3, 'C'), (4, 'K')]:
-                values = []
-                for row in data_rows:
-                    if len(row) > col and pd.notna(row.iloc[col]):
-                        try:
-                            values.append(float(row.iloc[col]))
-                        except (ValueError, TypeError):
-                            continue
-                
-                if values:
-                    avg = sum(values) / len(values)
-                    summary_data.append({
-                        'Coverage Type': f'{name} Calculated Average',
-                        'Average (%)': f"{avg:.2f}"
-                    })
-            
-            if summary_data:
-                summary_df = pd.DataFrame(summary_data)
-                st.dataframe(summary_df, use_container_width=True, hide_index=True)
+            channels = [(name, f'{name} Calculated Average') for name in ['Y', 'M', 'C', 'K']]
+        
+        summary_data = [
+            {'Coverage Type': label, 'Average (%)': f"{averages[name]:.2f}"}
+            for name, label in channels if name in averages
+        ]
+        
+        if summary_data:
+            summary_df = pd.DataFrame(summary_data)
+            st.dataframe(summary_df, use_container_width=True, hide_index=True)
                 
     except Exception as e:
         st.error(f"Error calculating averages: {str(e)}")
 
+def display_diagnostics(instrumentation, last_batch):
+    """Per-stage timings of the last import and of the whole session, slowest files and a JSON export"""
+    with st.expander("Diagnostics", expanded=False):
+        if last_batch and last_batch['batches']:
+            batch = last_batch['batches'][0]
+            peak = f", peak {batch['peak_bytes'] / 1e6:.1f} MB traced" if batch['peak_bytes'] is not None else ""
+            st.markdown(f"**Last import:** {batch['file_count']} files, {batch['bytes'] / 1e6:.1f} MB "
+                        f"in {batch['seconds']:.2f} s{peak}")
+            st.dataframe(pd.DataFrame(stage_rows(last_batch)), use_container_width=True, hide_index=True)
+            slowest = sorted(batch['files'], key=lambda timing: timing['seconds'], reverse=True)[:10]
+            if slowest:
+                st.markdown("**Slowest files**")
+                st.dataframe(pd.DataFrame([
+                    {'File': timing['filename'], 'KB': round(timing['bytes'] / 1024, 1),
+                     'ms': round(timing['seconds'] * 1000, 2),
+                     **{stage: round(seconds * 1000, 2) for stage, seconds in timing['stages'].items()}}
+                    for timing in slowest
+                ]), use_container_width=True, hide_index=True)
+        
+        report = instrumentation.report(include_files=False)
+        st.markdown(f"**Session:** {len(report['batches'])} batches (imports and exports)")
+        st.dataframe(pd.DataFrame(stage_rows(report)), use_container_width=True, hide_index=True)
+        # Serialized again only once new batches were recorded
+        json_key = (id(instrumentation), len(instrumentation.batches))
+        if st.session_state.get('diagnostics_json_key') != json_key:
+            st.session_state.diagnostics_json = instrumentation.to_json()
+            st.session_state.diagnostics_json_key = json_key
+        st.download_button("Download diagnostics (JSON)", st.session_state.diagnostics_json, "coverage_diagnostics.json",
+                           "application/json", key="dl_diagnostics")
+
 # Header
 st.title("Coverage Data Extractor")
 st.markdown("Upload multiple text files to extract coverage data (supports both single and multi-column formats)")
 
 # File upload
 uploaded_files = st.file_uploader("Choose multiple text files", type=['txt', 'log', 'dat'], accept_multiple_files=True)
-if uploaded_files and st.button("Process Files", type="primary"):
-    with st.spinner("Processing files..."):
-        processor = FileProcessor()
-        st.session_state.processor = processor
-        st.session_state.results = processor.process_uploaded_files(uploaded_files)
-        st.rerun()
+diag_col1, diag_col2 = st.columns(2)
+with diag_col1:
+    collect_diagnostics = st.checkbox("Collect diagnostics", key="collect_diagnostics")
+with diag_col2:
+    trace_memory = st.checkbox("Trace memory (slower)", key="trace_memory", disabled=not collect_diagnostics)
+if uploaded_files and st.button("Process Files", type="primary", disabled=import_running()):
+    # Keep the loaded files: new uploads are added, re-uploads replace by name, unchanged files are skipped
+    if st.session_state.processor is None:
+        st.session_state.processor = FileProcessor(parse_cache=get_parse_cache(), memory_budget=memory_budget(),
+                                                   spill_dir=os.environ.get('COVERAGE_SPILL_DIR'))
+    processor = st.session_state.processor
+    if not collect_diagnostics:
+        processor.instrumentation = None
+    elif processor.instrumentation is None or processor.instrumentation.trace_memory != trace_memory:
+        processor.instrumentation = Instrumentation(trace_memory=trace_memory)
+    # Parse on a background thread; reruns show progress and the files merged so far
+    st.session_state.ingest_job = IngestJob(processor, uploaded_files).start()
+    st.rerun()
 
-# Display results
-if st.session_state.results:
-    results = st.session_state.results
+# Background import: progress, partial results and cancel
+job = st.session_state.ingest_job
+if job is not None:
+    if job.running:
+        progress_col, cancel_col = st.columns([5, 1])
+        with progress_col:
+            st.progress(job.fraction, text=f"{'Cancelling' if job.cancelled else 'Processing'}: {job.done} of {job.total} files "
+                                           f"({job.added} added, {len(job.failed_files)} failed, {job.unchanged} unchanged) "
+                                           f"in {job.elapsed:.0f} s")
+        with cancel_col:
+            if st.button("Cancel", disabled=job.cancelled):
+                job.cancel()
+        st.session_state.results = job.partial_result()
+    else:
+        results = job.partial_result()
+        if job.error is not None:
+            results = {**results, 'error': str(job.error)}
+        st.session_state.results = results
+        st.session_state.ingest_job = None
+
+def display_results(results, processor):
+    """Summary, failed files, diagnostics, loaded files and the format tabs"""
+    # Current totals (files may have been removed since the last batch)
+    summary = processor.excel_generator.get_summary()
     
     # Results summary
     col1, col2, col3 = st.columns(3)
-    with col1: st.metric("Files Processed", results['processed_count'])
-    with col2: st.metric("Total Machines", results['summary']['total_machines'])
-    with col3: st.metric("Total Sections", results['summary']['total_sections'])
+    with col1: st.metric("Files Processed", summary['total_files_processed'], delta=f"+{results['processed_count']} new")
+    with col2: st.metric("Total Machines", summary['total_machines'])
+    with col3: st.metric("Total Sections", summary['total_sections'])
+    st.caption(f"Last batch: {results['processed_count']} added, {results.get('replaced_count', 0)} replaced, "
+               f"{results.get('unchanged_count', 0)} unchanged (data version {processor.excel_generator.data_version})")
+    
+    if results.get('cancelled'):
+        st.warning("Processing was cancelled; the files processed before that stay loaded")
+    if results.get('error'):
+        st.error(f"Processing stopped: {results['error']}")
+    
+    if processor.parse_cache is not None:
+        cache_stats = processor.parse_cache.stats()
+        st.caption(f"Parse cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+                   f"({cache_stats['hit_rate']:.0%} hit rate), {cache_stats['entries']} reports cached")
     
     # Display failed files
     if results['failed_files']:
@@ -223,14 +356,25 @@ if st.session_state.results:
             for failed_file in results['failed_files']:
                 st.error(failed_file)
     
-    if results['processed_count'] > 0:
+    if processor.instrumentation is not None:
+        display_diagnostics(processor.instrumentation, results.get('diagnostics'))
+    
+    # Remove loaded files by name
+    with st.expander("Loaded Files", expanded=False):
+        loaded_files = processor.excel_generator.memoized('loaded_files', processor.excel_generator.get_loaded_files)
+        remove_names = st.multiselect("Files to remove", loaded_files, key=f"remove_files_{processor.excel_generator.data_version}")
+        if remove_names and st.button("Remove Selected Files", disabled=import_running()):
+            removed = processor.remove_files(remove_names)
+            st.session_state.results = {**results, 'summary': removed['summary']}
+            st.rerun()
+    
+    if summary['total_sections'] > 0:
         # Group data by format
-        format_groups = {}
-        for row in st.session_state.processor.excel_generator.all_data:
-            format_type = row.get('Format_Type', '4-column')
-            if format_type not in format_groups:
-                format_groups[format_type] = []
-            format_groups[format_type].append(row)
+        excel_generator = processor.excel_generator
+        format_groups = excel_generator.memoized('format_groups', lambda: {
+            format_type: excel_generator.apply_filters(format_filter=format_type)
+            for format_type in excel_generator.get_unique_formats()
+        })
         
         # Always create tabs - dedicated tab for single coverage
         tab_names = []
@@ -238,13 +382,13 @@ if st.session_state.results:
         
         # Add Mono tab if 1-column data exists
         if '1-column' in format_groups:
-            single_count = len(set(row['Device_ID'] for row in format_groups['1-column']))
+            single_count = len(format_devices_of(excel_generator, '1-column', format_groups['1-column']))
             tab_names.append(f"📊 Mono ({single_count} devices)")
             tab_keys.append('mono')
         
         # Add Multi Coverage tab if 4-column data exists
         if '4-column' in format_groups:
-            multi_count = len(set(row['Device_ID'] for row in format_groups['4-column']))
+            multi_count = len(format_devices_of(excel_generator, '4-column', format_groups['4-column']))
             tab_names.append(f"📈 Multi Coverage ({multi_count} devices)")
             tab_keys.append('multi')
         
@@ -280,11 +424,16 @@ if st.session_state.results:
                 render_format_tab('4-column', format_groups['4-column'], 'multi_only')
     
     # Reset button
-    if st.button("Process New Files", type="secondary"):
+    if st.button("Clear All Files", type="secondary", disabled=import_running()):
         st.session_state.processor = None
         st.session_state.results = None
         st.rerun()
 
+# Display results (under the processor lock: a background import may be adding files)
+if st.session_state.results:
+    with st.session_state.processor.lock:
+        display_results(st.session_state.results, st.session_state.processor)
+
 # Instructions
 if not st.session_state.results:
     st.markdown("---")
@@ -298,4 +447,9 @@ if not st.session_state.results:
         1. Select multiple text files (not folders)
         2. Click Process to extract data
         3. Use format-specific tabs to work with data
-        """)
\ No newline at end of file
+        """)
+
+# Poll a running import: rerun shortly to show its progress and the files merged so far
+if import_running():
+    time.sleep(IMPORT_POLL_SECONDS)
+    st.rerun()
@@ -0,0 +1,146 @@
+import gzip
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import zipfile
+from typing import BinaryIO, Iterable, Iterator, Tuple, Union
+
+REPORT_EXTENSIONS = ('.txt', '.log', '.dat')
+TAR_EXTENSIONS = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+# Nested zips need random access; members up to this size are spooled in RAM, larger ones on disk
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+LINE_BUFFER_BYTES = 64 * 1024
+MAX_NESTING_DEPTH = 8
+
+
+def archive_kind(name: str) -> str:
+    """Classify a path as 'report', 'zip', 'tar', 'gzip' or '' (ignored)"""
+    lowered = name.lower()
+    if lowered.endswith(REPORT_EXTENSIONS):
+        return 'report'
+    if lowered.endswith('.zip'):
+        return 'zip'
+    if lowered.endswith(TAR_EXTENSIONS):
+        return 'tar'
+    if lowered.endswith('.gz'):
+        return 'gzip'
+    return ''
+
+
+def iter_local_files(paths: Iterable[str]) -> Iterator[Tuple[str, str, str]]:
+    """Walk files and directory trees, yielding (name, path, archive_kind) in sorted order
+
+    Files found in a directory are named by the directory's base name and
+    their path relative to it ('reports/2024/a.txt'), with '/' separators,
+    so the same relative path under two trees gives two names; files given
+    directly keep their base name and are yielded whatever their extension
+    (unknown ones are tried as archives).
+    """
+    for path in paths:
+        if not os.path.isdir(path):
+            yield os.path.basename(path), path, archive_kind(path)
+            continue
+        root_name = os.path.basename(os.path.abspath(path))
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                kind = archive_kind(name)
+                if kind:
+                    full_path = os.path.join(root, name)
+                    yield f"{root_name}/{os.path.relpath(full_path, path).replace(os.sep, '/')}", full_path, kind
+
+
+def iter_text_lines(stream: BinaryIO) -> Iterator[str]:
+    """Yield decoded lines without newlines, matching content.split('\\n') on the whole file
+
+    Each line is decoded on its own with the utf-8 then latin-1 fallback, so a
+    stray non-utf-8 byte only changes the decoding of its own line.
+    """
+    ends_with_newline = True
+    for raw in stream:
+        ends_with_newline = raw.endswith(b'\n')
+        if ends_with_newline:
+            raw = raw[:-1]
+        try:
+            yield raw.decode('utf-8')
+        except UnicodeDecodeError:
+            yield raw.decode('latin-1')
+    if ends_with_newline:
+        yield ''
+
+
+def _spool(stream: BinaryIO) -> BinaryIO:
+    spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    shutil.copyfileobj(stream, spooled, LINE_BUFFER_BYTES)
+    spooled.seek(0)
+    return spooled
+
+
+def iter_report_streams(fileobj: BinaryIO, name: str, prefix: str = '',
+                        depth: int = 0) -> Iterator[Tuple[str, Union[BinaryIO, Exception]]]:
+    """Walk an archive (zip, tar, gz, nested) and yield (report path, buffered binary stream)
+
+    Each stream is only valid until the next item is requested. Members of
+    nested archives are reported as 'inner.zip/report.txt'. A nested archive
+    that cannot be read is yielded as (path, exception) in place of a stream.
+    """
+    kind = archive_kind(name)
+
+    if kind == 'report':
+        yield prefix + name, io.BufferedReader(fileobj, LINE_BUFFER_BYTES) if isinstance(fileobj, io.RawIOBase) else fileobj
+        return
+
+    if depth > MAX_NESTING_DEPTH:
+        yield prefix + name, ValueError(f"archive nesting deeper than {MAX_NESTING_DEPTH} levels")
+        return
+
+    if kind == 'zip' or (depth == 0 and not kind):
+        if depth == 0:
+            yield from _iter_zip(fileobj, '', depth)
+        else:
+            # Seeking inside a compressed member restarts decompression, so spool it first
+            with _spool(fileobj) as spooled:
+                yield from _iter_zip(spooled, prefix + name + '/', depth)
+    elif kind == 'tar':
+        yield from _iter_tar(fileobj, prefix + name + '/' if depth else '', depth)
+    elif kind == 'gzip':
+        inner_name = name[:-3]
+        with gzip.GzipFile(fileobj=fileobj, mode='rb') as inner:
+            yield from iter_report_streams(io.BufferedReader(inner, LINE_BUFFER_BYTES), inner_name, prefix, depth + 1)
+
+
+def _iter_zip(fileobj: BinaryIO, prefix: str, depth: int):
+    with zipfile.ZipFile(fileobj, 'r') as zip_ref:
+        for file_info in zip_ref.filelist:
+            if file_info.is_dir() or not archive_kind(file_info.filename):
+                continue
+            yield from _iter_member(lambda: zip_ref.open(file_info), file_info.filename, prefix, depth)
+
+
+def _iter_tar(fileobj: BinaryIO, prefix: str, depth: int):
+    # Stream mode ('r|*') never seeks, so the archive is read once front to back
+    with tarfile.open(fileobj=fileobj, mode='r|*') as tar_ref:
+        for member in tar_ref:
+            if not member.isfile() or not archive_kind(member.name):
+                continue
+            yield from _iter_member(lambda: tar_ref.extractfile(member), member.name, prefix, depth)
+
+
+def _iter_member(open_member, member_name: str, prefix: str, depth: int):
+    try:
+        member = open_member()
+    except Exception as e:
+        yield prefix + member_name, e
+        return
+
+    with member:
+        if archive_kind(member_name) == 'report':
+            yield prefix + member_name, io.BufferedReader(member, LINE_BUFFER_BYTES)
+            return
+        try:
+            yield from iter_report_streams(member, member_name, prefix, depth + 1)
+        except Exception as e:
+            yield prefix + member_name, e
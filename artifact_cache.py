@@ -0,0 +1,101 @@
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable
+
+
+class ArtifactCache:
+    """LRU cache of generated byte artifacts, bounded by entry count and total bytes"""
+
+    def __init__(self, max_entries: int = 32, max_bytes: int = 256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get_or_build(self, key: Hashable, build: Callable[[], bytes]) -> bytes:
+        """Return the cached artifact for key, building and storing it on a miss"""
+        artifact = self._entries.get(key)
+        if artifact is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return artifact
+
+        self.misses += 1
+        artifact = build()
+        if len(artifact) <= self.max_bytes:
+            self._entries[key] = artifact
+            self.total_bytes += len(artifact)
+            self._evict()
+        return artifact
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+            _, artifact = self._entries.popitem(last=False)
+            self.total_bytes -= len(artifact)
+            self.evictions += 1
+
+    def clear(self):
+        """Drop every entry; the hit/miss counters are kept"""
+        self._entries.clear()
+        self.total_bytes = 0
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.total_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+
+class VersionedMemo:
+    """LRU memo of values derived from one data version, bounded by entry count
+
+    For cheap-to-hold but costly-to-rebuild results (filter option lists,
+    views, previews, pivots). The first lookup under a new version drops
+    every entry, so a value is never served for data it was not built from.
+    """
+
+    def __init__(self, max_entries: int = 16):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_or_build(self, version: Hashable, key: Hashable, build: Callable[[], object]):
+        """Return the value memoized for key under version, building and storing it on a miss"""
+        if version != self.version:
+            self._entries.clear()
+            self.version = version
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+        self.misses += 1
+        value = self._entries[key] = build()
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+        self.version = None
+
+    def stats(self) -> Dict:
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
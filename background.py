@@ -0,0 +1,98 @@
+import threading
+import time
+from typing import Dict, List, Optional
+from file_processor import FileProcessor
+
+
+class IngestJob:
+    """An upload import running on a background thread, with progress counters and cancellation
+
+    The thread runs FileProcessor.process_uploaded_files with the job as its
+    progress object, so the counters move as each file is merged and files
+    become visible in the processor's collection one by one (read it under
+    processor.lock while the job runs). cancel() stops the import after the
+    files already being extracted; what was merged until then stays loaded.
+    The job never calls Streamlit, so the app can poll it from any rerun.
+    """
+
+    def __init__(self, processor: FileProcessor, uploaded_files: List):
+        self.processor = processor
+        self.uploaded_files = list(uploaded_files)
+        self.total = len(self.uploaded_files)
+        self.done = 0
+        self.added = 0
+        self.unchanged = 0
+        self.failed_files = []
+        self.current_file = None
+        self.result = None
+        self.error = None
+        self.started = None
+        self.finished = None
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='ingest-job', daemon=True)
+
+    def start(self) -> 'IngestJob':
+        self.started = time.time()
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            self.result = self.processor.process_uploaded_files(self.uploaded_files, progress=self)
+        except Exception as e:
+            self.error = e
+        finally:
+            # Release the uploaded bytes
+            self.uploaded_files = []
+            self.finished = time.time()
+
+    def file_done(self, filename: str, status: str, failure: Optional[str] = None):
+        """Called by FileProcessor for every file: status is 'added', 'failed' or 'unchanged'"""
+        self.current_file = filename
+        if status == 'added':
+            self.added += 1
+        elif status == 'unchanged':
+            self.unchanged += 1
+        else:
+            self.failed_files.append(failure or filename)
+        self.done += 1
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive()
+
+    @property
+    def fraction(self) -> float:
+        return min(1.0, self.done / self.total) if self.total else 1.0
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the import finished (or timeout seconds passed); returns whether it finished"""
+        self._thread.join(timeout)
+        return not self.running
+
+    def partial_result(self) -> Dict:
+        """Results so far in the shape of process_uploaded_files' return value (the final one once done)"""
+        if self.result is not None:
+            return self.result
+        with self.processor.lock:
+            summary = self.processor.excel_generator.get_summary()
+        return {
+            'processed_count': self.added,
+            'failed_files': list(self.failed_files),
+            'unchanged_count': self.unchanged,
+            'replaced_count': 0,
+            'summary': summary
+        }
@@ -0,0 +1,233 @@
+"""End-to-end latency and memory of the Streamlit app's reruns, driven headless by AppTest
+
+For every session size (devices, with --reports reports each from corpus.py)
+app.py is loaded in streamlit.testing's AppTest and these interactions are
+scripted, each timed as the AppTest run that follows it:
+
+  process         the uploads go through IngestJob as after "Process Files";
+                  runs until the import is done and the results are shown
+  rerun           a rerun with nothing changed (median of --reruns)
+  switch_tab      a device picked in the Mono tab (AppTest renders every tab
+                  on each run, so a tab is switched to by using it)
+  device_filter   a device picked in the Multi Coverage tab
+  date_filter     one of that device's report dates picked as well
+  preview_on      "Show Preview" checked
+  preview_rows    the preview row count changed
+  preview_off     "Show Preview" unchecked
+
+The sequence is timed on --repeat fresh sessions, keeping each
+interaction's best time, then run again on a fresh session under
+tracemalloc for each interaction's peak allocation and retained growth
+(tracemalloc slows allocation-heavy code, so timings never come from the
+traced run). --json saves the results; --baseline compares with saved
+results and exits 1 when an interaction gets slower, or its peak memory
+grows, by more than --tolerance.
+
+Usage: python benchmarks/bench_app_rerun.py [--devices 10 1000 10000] [--json out.json] [--baseline base.json]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from streamlit.testing.v1 import AppTest
+
+from background import IngestJob
+from bench_parse_cache import Upload
+from corpus import CorpusSpec, generate_reports
+from file_processor import FileProcessor
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INTERACTIONS = ('process', 'rerun', 'switch_tab', 'device_filter', 'date_filter',
+                'preview_on', 'preview_rows', 'preview_off')
+# Latency growth below this is not a regression (a base rerun takes ~0.15 s and single runs jitter by ~0.1 s)
+MIN_COMPARED_SECONDS = 0.1
+# Peak memory below this is not compared against the baseline (noise)
+MIN_COMPARED_PEAK_MB = 1.0
+
+
+class Session:
+    """An AppTest of app.py and the uploads it imports"""
+
+    def __init__(self, uploads, timeout: float):
+        self.uploads = uploads
+        self.app = AppTest.from_file(os.path.join(APP_DIR, 'app.py'), default_timeout=timeout)
+        self.app.run()
+
+    def run(self):
+        self.app.run()
+        if self.app.exception:
+            raise RuntimeError(f"app raised: {self.app.exception[0].value}")
+
+    def tab_key(self, format_key: str) -> str:
+        """Widget key suffix of a format tab ('multi', or 'multi_only' when it is the only format)"""
+        keys = {widget.key for widget in self.app.checkbox}
+        return format_key if f"prev_{format_key}" in keys else f"{format_key}_only"
+
+    def process(self):
+        processor = FileProcessor()
+        self.app.session_state.processor = processor
+        self.app.session_state.ingest_job = IngestJob(processor, self.uploads).start()
+        # The app polls the import with st.rerun() until it is done
+        self.run()
+        while self.app.session_state.ingest_job is not None:
+            self.run()
+
+    def pick_device(self, format_key: str):
+        tab = self.tab_key(format_key)
+        if self.app.selectbox(key=f"dev_{tab}") is None:
+            return
+        devices = self.app.selectbox(key=f"dev_{tab}").options
+        self.app.selectbox(key=f"dev_{tab}").set_value(devices[min(1, len(devices) - 1)])
+        self.run()
+
+    def pick_date(self):
+        tab = self.tab_key('multi')
+        device = self.app.selectbox(key=f"dev_{tab}").value
+        generator = self.app.session_state.processor.excel_generator
+        # One of the device's dates when it has any (some reports carry none), else the tab's first date
+        dates = generator.get_unique_dates(generator.apply_filters(None if device == 'All' else device))
+        options = self.app.selectbox(key=f"date_{tab}").options[1:]
+        choices = [date for date in dates if date in options] or options
+        if choices:
+            self.app.selectbox(key=f"date_{tab}").set_value(choices[0])
+        self.run()
+
+    def set_preview(self, shown: bool):
+        self.app.checkbox(key=f"prev_{self.tab_key('multi')}").set_value(shown)
+        self.run()
+
+    def set_preview_rows(self):
+        self.app.number_input(key=f"rows_{self.tab_key('multi')}").set_value(50)
+        self.run()
+
+
+def scripted(session: Session, reruns: int):
+    """(interaction, function) pairs in order; the rerun step repeats reruns times"""
+    return [
+        ('process', session.process),
+        ('rerun', lambda: [session.run() for _ in range(reruns)]),
+        ('switch_tab', lambda: session.pick_device('mono')),
+        ('device_filter', lambda: session.pick_device('multi')),
+        ('date_filter', session.pick_date),
+        ('preview_on', lambda: session.set_preview(True)),
+        ('preview_rows', session.set_preview_rows),
+        ('preview_off', lambda: session.set_preview(False)),
+    ]
+
+
+def timed_session(uploads, reruns: int, timeout: float):
+    session = Session(uploads, timeout)
+    seconds = {}
+    for name, interaction in scripted(session, reruns):
+        if name == 'rerun':
+            times = []
+            for _ in range(reruns):
+                start = time.perf_counter()
+                session.run()
+                times.append(time.perf_counter() - start)
+            seconds[name] = statistics.median(times)
+            continue
+        start = time.perf_counter()
+        interaction()
+        seconds[name] = time.perf_counter() - start
+    return seconds
+
+
+def traced_session(uploads, timeout: float):
+    """Peak and retained MB of each interaction"""
+    session = Session(uploads, timeout)
+    memory = {}
+    tracemalloc.start()
+    try:
+        for name, interaction in scripted(session, 1):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            interaction()
+            current, peak = tracemalloc.get_traced_memory()
+            memory[name] = ((peak - before) / 1e6, (current - before) / 1e6)
+    finally:
+        tracemalloc.stop()
+    return memory
+
+
+def run_benchmark(sizes, reports: int, reruns: int, repeat: int, seed: int, memory: bool, timeout: float):
+    results = []
+    for devices in sizes:
+        files = devices * reports
+        uploads = [Upload(name, raw) for name, raw in generate_reports(CorpusSpec(files, devices=devices, seed=seed))]
+        print(f"{devices} devices, {files} files ({sum(len(upload.getvalue()) for upload in uploads) / 1e6:.1f} MB)")
+        sessions = [timed_session(uploads, reruns, timeout) for _ in range(repeat)]
+        seconds = {name: min(session[name] for session in sessions) for name in INTERACTIONS}
+        traced = traced_session(uploads, timeout) if memory else {}
+        for name in INTERACTIONS:
+            peak, retained = traced.get(name, (None, None))
+            result = {'devices': devices, 'files': files, 'interaction': name, 'seconds': seconds[name],
+                      'peak_mb': peak, 'retained_mb': retained}
+            results.append(result)
+            memory_text = f"peak {peak:8.1f} MB  retained {retained:+8.1f} MB" if memory else ''
+            print(f"  {name:14s} {seconds[name] * 1000:10.1f} ms  {memory_text}")
+    return results
+
+
+def compare(results, baseline, tolerance: float):
+    """Human-readable regressions of results against baseline results"""
+    previous = {(result['devices'], result['interaction']): result for result in baseline}
+    regressions = []
+    for result in results:
+        base = previous.get((result['devices'], result['interaction']))
+        if base is None:
+            continue
+        label = f"{result['interaction']} @ {result['devices']} devices"
+        if (result['seconds'] > base['seconds'] * (1 + tolerance)
+                and result['seconds'] - base['seconds'] >= MIN_COMPARED_SECONDS):
+            regressions.append(f"{label}: {result['seconds'] * 1000:.1f} ms vs baseline {base['seconds'] * 1000:.1f} ms")
+        if (result['peak_mb'] is not None and base['peak_mb'] is not None
+                and max(result['peak_mb'], base['peak_mb']) >= MIN_COMPARED_PEAK_MB
+                and result['peak_mb'] > base['peak_mb'] * (1 + tolerance)):
+            regressions.append(f"{label}: peak {result['peak_mb']:.1f} MB vs baseline {base['peak_mb']:.1f} MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--devices', type=int, nargs='+', default=[10, 1000, 10_000])
+    parser.add_argument('--reports', type=int, default=2, help="reports per device")
+    parser.add_argument('--reruns', type=int, default=5, help="unchanged reruns timed for 'rerun'")
+    parser.add_argument('--repeat', type=int, default=3, help="timed sessions per size (best time is kept)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=3600, help="seconds allowed for one AppTest run")
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc session")
+    parser.add_argument('--json', help="write the results to this file")
+    parser.add_argument('--baseline', help="results file of an earlier run to compare with")
+    parser.add_argument('--tolerance', type=float, default=0.3,
+                        help="allowed relative latency / peak memory growth (default 0.3)")
+    args = parser.parse_args()
+
+    # app.py loads its background image relative to the working directory
+    os.chdir(APP_DIR)
+    results = run_benchmark(args.devices, args.reports, args.reruns, args.repeat, args.seed, not args.no_memory, args.timeout)
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(), 'results': results},
+                      file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file)['results'], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""Peak memory and time: FileProcessor.process_zip_file vs the streaming process_archive
+
+Usage: python benchmarks/bench_archive_ingest.py [--member-mb 50] [--members 4]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_text_extractor import make_report
+from file_processor import FileProcessor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--member-mb', type=float, default=50)
+    parser.add_argument('--members', type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bundle.zip')
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for i in range(args.members):
+                content = make_report(args.member_mb, i % 2 == 0, seed=i)
+                archive.writestr(f"report_{i}.txt", content.replace("A9VE0T1000157", f"A9VE0T{1000000 + i:07d}"))
+        print(f"{args.members} members of {args.member_mb:.0f} MB, {os.path.getsize(path) / 1e6:.1f} MB zipped")
+
+        for method in ('process_zip_file', 'process_archive'):
+            processor = FileProcessor()
+            start = time.perf_counter()
+            getattr(processor, method)(path)
+            elapsed = time.perf_counter() - start
+            tracemalloc.start()
+            getattr(FileProcessor(), method)(path)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{method:17s}: {elapsed:6.2f} s  peak {peak / 1e6:8.1f} MB  "
+                  f"rows={processor.excel_generator.get_summary()['total_sections']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Per-report time: decode-then-parse vs the byte-level TextExtractor.process_bytes path
+
+Each size is run with an ASCII report and with a latin-1 one (a non-utf-8
+byte in the trailing noise, which makes the old path fail utf-8 and decode
+again). Local files compare read()+decode+parse with process_path (mmap).
+
+Usage: python benchmarks/bench_byte_parsing.py [--size-kb 4 256 4096] [--repeat 20]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_text_extractor import make_report, timed
+from file_processor import read_file_with_fallback_encoding
+from text_extractor import TextExtractor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size-kb', type=float, nargs='+', default=[4, 256, 4096])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    extractor = TextExtractor()
+    with tempfile.TemporaryDirectory() as directory:
+        for size_kb in args.size_kb:
+            for encoding in ('ascii', 'latin-1'):
+                content = make_report(size_kb / 1024, four_column=True)
+                if encoding == 'latin-1':
+                    content += "\nstatus=d\xe9faut"
+                raw = content.encode(encoding)
+                path = os.path.join(directory, 'report.txt')
+                with open(path, 'wb') as file:
+                    file.write(raw)
+
+                def decode_then_parse():
+                    return extractor.process_file(read_file_with_fallback_encoding(raw), 'report.txt')
+
+                def read_decode_parse():
+                    with open(path, 'rb') as file:
+                        return extractor.process_file(read_file_with_fallback_encoding(file.read()), 'report.txt')
+
+                expected = decode_then_parse()
+                assert extractor.process_bytes(raw, 'report.txt') == expected
+                assert extractor.process_path(path) == expected
+
+                t_decode = timed(decode_then_parse, args.repeat)
+                t_bytes = timed(lambda: extractor.process_bytes(raw, 'report.txt'), args.repeat)
+                t_read = timed(read_decode_parse, args.repeat)
+                t_mmap = timed(lambda: extractor.process_path(path), args.repeat)
+                print(f"{size_kb:7.0f} KB {encoding:7s}: decode+parse {t_decode * 1e6:9.1f} us | "
+                      f"process_bytes {t_bytes * 1e6:9.1f} us (x{t_decode / t_bytes:.1f}) | "
+                      f"file read+decode+parse {t_read * 1e6:9.1f} us | "
+                      f"process_path {t_mmap * 1e6:9.1f} us (x{t_read / t_mmap:.1f})")
+
+
+if __name__ == '__main__':
+    main()
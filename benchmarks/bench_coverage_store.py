@@ -0,0 +1,84 @@
+"""Memory of 1M coverage rows: legacy list of row dicts vs the columnar CoverageStore
+
+Usage: python benchmarks/bench_coverage_store.py [--rows 1000000] [--sections 41]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from excel_generator import ExcelGenerator
+
+
+def make_files(rows: int, sections: int):
+    """Yield (device_id, report_date, filename, format_type, rows) per synthetic file"""
+    section_rows = [(f"{i * 5}K-{i * 5 + 5}K", 1.5 + i, 2.5, 3.5, 4.5 + i) for i in range(sections)]
+    for i in range(rows // sections):
+        device_id = f"A9VE0T{1000000 + i % 5000:07d}"
+        report_date = f"{1 + i % 28}/{1 + i % 12:02d}/2025 {i % 24:02d}:{i % 60:02d}"
+        yield device_id, report_date, f"report_{i:07d}.txt", '4-column' if i % 2 else '1-column', section_rows
+
+
+def measure(label: str, build):
+    # Time without tracemalloc (it slows allocation-heavy code), then measure a second build
+    start = time.perf_counter()
+    build()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    result = build()
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{label:22s}: {current / 1e6:8.1f} MB retained  {elapsed:6.2f} s to build")
+    return result
+
+
+def build_dicts(rows: int, sections: int):
+    all_data = []
+    for device_id, report_date, filename, format_type, section_rows in make_files(rows, sections):
+        for section, y, m, c, k in section_rows:
+            all_data.append({
+                'Device_ID': device_id, 'Date': report_date, 'Filename': filename, 'Format_Type': format_type,
+                'Section': section, 'Coverage_Y': y, 'Coverage_M': m, 'Coverage_C': c, 'Coverage_K': k
+            })
+    return all_data
+
+
+def build_store(rows: int, sections: int):
+    generator = ExcelGenerator()
+    for file_args in make_files(rows, sections):
+        generator.add_coverage_rows(*file_args)
+    return generator
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--sections', type=int, default=41)
+    args = parser.parse_args()
+
+    all_data = measure('list of dicts', lambda: build_dicts(args.rows, args.sections))
+    start = time.perf_counter()
+    legacy = [row for row in all_data if '/03/' in str(row['Date'])]
+    print(f"{'':22s}  date filter {time.perf_counter() - start:6.3f} s ({len(legacy)} rows)")
+    del all_data, legacy
+
+    generator = measure('CoverageStore', lambda: build_store(args.rows, args.sections))
+    start = time.perf_counter()
+    view = generator.apply_filters(date_range=(date(2025, 3, 1), date(2025, 3, 31)))
+    print(f"{'':22s}  date range  {time.perf_counter() - start:6.3f} s ({len(view)} rows)")
+    device = generator.get_unique_devices()[7]
+    start = time.perf_counter()
+    for _ in range(100):
+        device_view = generator.apply_filters(device, '8/08/2025')
+    print(f"{'':22s}  device+date {(time.perf_counter() - start) / 100 * 1e3:6.3f} ms ({len(device_view)} rows)")
+    start = time.perf_counter()
+    frame = view.to_frame()
+    print(f"{'':22s}  DataFrame view {time.perf_counter() - start:6.3f} s, {frame.memory_usage(deep=True).sum() / 1e6:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Peak memory and time of the per-device workbook: pandas ExcelWriter vs write-only streaming
+
+Also times ZIP bundles of one workbook per device and per 100 devices,
+built with --workers processes (tracemalloc only sees the parent process).
+
+Usage: python benchmarks/bench_excel_export.py [--devices 100 400] [--sections 41] [--workers 0]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from excel_generator import ExcelGenerator
+
+
+def build(devices: int, sections: int) -> ExcelGenerator:
+    generator = ExcelGenerator()
+    for i in range(devices):
+        rows = [(f"{s * 5}K-{s * 5 + 5}K", 1.5 + s, 2.5 + i % 7, 3.5, 4.5 + s) for s in range(sections)]
+        generator.add_coverage_rows(f"A9VE0T{1000000 + i:07d}", "30/11/2024 14:56", f"report_{i}.txt",
+                                    '4-column' if i % 2 else '1-column', rows)
+    return generator
+
+
+def measure(func):
+    # Time without tracemalloc (it slows openpyxl several-fold), then trace a second run
+    start = time.perf_counter()
+    size = func()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--devices', type=int, nargs='+', default=[100, 400])
+    parser.add_argument('--sections', type=int, default=41)
+    parser.add_argument('--workers', type=int, default=0, help="bundle processes; 0 uses every core")
+    args = parser.parse_args()
+
+    for devices in args.devices:
+        generator = build(devices, args.sections)
+        view = generator.apply_filters()
+
+        def streamed():
+            with generator.stream_excel_with_device_headers(view) as output:
+                return output.seek(0, os.SEEK_END)
+
+        def bundle(devices_per_workbook):
+            output = io.BytesIO()
+            generator.write_device_workbooks(output, view, devices_per_workbook, args.workers)
+            return len(output.getvalue())
+
+        for label, func in (('ExcelWriter', lambda: len(generator.generate_excel_with_device_headers(view))),
+                            ('write-only', streamed),
+                            ('ZIP x1', lambda: bundle(1)),
+                            ('ZIP x100', lambda: bundle(100))):
+            elapsed, peak, size = measure(func)
+            print(f"{devices:6d} devices {label:12s}: {elapsed:6.2f} s  peak {peak / 1e6:7.1f} MB  "
+                  f"output {size / 1e6:6.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
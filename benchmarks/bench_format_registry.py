@@ -0,0 +1,69 @@
+"""Scan time as report formats are registered: one signature pattern vs checking each format in turn
+
+Extra formats get distinct signatures and table headers that never occur in
+the reports, so the results stay those of the built-in formats while every
+search has more alternatives to rule out. The per-format baseline is what a
+chain of `signature in content` checks (one full search per format) costs.
+
+Usage: python benchmarks/bench_format_registry.py [--formats 2 10 50] [--files 2000] [--size-mb 4]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_text_extractor import make_report, timed
+from corpus import CorpusSpec, generate_reports
+from report_formats import CHANNELS, REPORT_FORMATS, FormatRegistry, ReportFormat
+from text_extractor import TextExtractor
+
+
+def registry_with(extra: int) -> FormatRegistry:
+    """The built-in formats plus extra synthetic six-value layouts"""
+    registry = FormatRegistry()
+    registry.register(REPORT_FORMATS.fallback, fallback=True)
+    for report_format in REPORT_FORMATS:
+        if report_format is not REPORT_FORMATS.fallback:
+            registry.register(report_format)
+    for index in range(extra):
+        columns = tuple((f"Ink{channel}{index}(%)", channel) for channel in CHANNELS) + (
+            (f"InkLc{index}(%)", None), (f"InkLm{index}(%)", None))
+        registry.register(ReportFormat(
+            f"tray-{index}", f"InkY{index}(%)", columns,
+            signature=f"Tray {index} ink usage  " + "  ".join(label for label, _ in columns)))
+    return registry
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--formats', type=int, nargs='+', default=[2, 10, 50])
+    parser.add_argument('--files', type=int, default=2000)
+    parser.add_argument('--size-mb', type=float, default=4.0)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = [raw for _, raw in generate_reports(CorpusSpec(args.files))]
+    # No signature occurs in a 1-column report, so detection searches all of it
+    large = make_report(args.size_mb, False).encode('latin-1')
+    reference = [TextExtractor().scan_bytes(raw) for raw in corpus]
+
+    for count in args.formats:
+        registry = registry_with(max(0, count - len(REPORT_FORMATS)))
+        extractor = TextExtractor(registry)
+        assert [extractor.scan_bytes(raw) for raw in corpus] == reference
+        signatures = [report_format.signature.encode('latin-1') for report_format in registry
+                      if report_format.signature is not None]
+
+        corpus_seconds = timed(lambda: [extractor.scan_bytes(raw) for raw in corpus], args.repeat) / len(corpus)
+        large_seconds = timed(lambda: extractor.scan_bytes(large), args.repeat)
+        detect_seconds = timed(lambda: registry.detect(large), args.repeat)
+        chain_seconds = timed(lambda: [signature in large for signature in signatures], args.repeat)
+        print(f"{len(registry):3d} formats: corpus {corpus_seconds * 1e6:7.1f} us/file | "
+              f"{args.size_mb:g} MB report {large_seconds * 1000:7.2f} ms | detection {detect_seconds * 1000:7.2f} ms "
+              f"(per-format checks {chain_seconds * 1000:7.2f} ms)")
+
+
+if __name__ == '__main__':
+    main()
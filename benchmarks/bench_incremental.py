@@ -0,0 +1,61 @@
+"""Adding, replacing and removing a few reports in a loaded session vs reprocessing everything
+
+A session is loaded with --files reports. Re-submitting the whole upload
+list plus --changed new reports (what the app's uploader sends on the next
+"Process Files") is timed on a fresh FileProcessor and on the loaded one,
+followed by replacing and removing --changed reports.
+
+Usage: python benchmarks/bench_incremental.py [--files 5000] [--changed 10] [--size-kb 4]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_parse_cache import Upload, make_uploads
+from file_processor import FileProcessor
+
+
+def timed_call(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=5000)
+    parser.add_argument('--changed', type=int, default=10)
+    parser.add_argument('--size-kb', type=float, default=4)
+    args = parser.parse_args()
+
+    uploads = make_uploads(args.files + args.changed, args.size_kb)
+    loaded, added = uploads[:args.files], uploads[args.files:]
+
+    t_full, full = timed_call(FileProcessor().process_uploaded_files, uploads)
+
+    processor = FileProcessor()
+    t_load, _ = timed_call(processor.process_uploaded_files, loaded)
+    t_add, result = timed_call(processor.process_uploaded_files, uploads)
+    assert result['summary'] == full['summary'] and result['unchanged_count'] == args.files
+
+    # Same names, content of other reports
+    replacements = [Upload(upload.name, other.getvalue())
+                    for upload, other in zip(uploads[:args.changed], reversed(uploads))]
+    t_replace, result = timed_call(processor.process_uploaded_files, replacements)
+    assert result['replaced_count'] == args.changed
+    t_remove, result = timed_call(processor.remove_files, [upload.name for upload in added])
+    assert result['removed_count'] == args.changed
+
+    print(f"initial load of {args.files} files: {t_load:.2f} s")
+    print(f"+{args.changed} files (all {len(uploads)} re-submitted): reprocess everything {t_full:.2f} s | "
+          f"incremental {t_add:.3f} s (x{t_full / t_add:.0f})")
+    print(f"replace {args.changed} files by name: {t_replace * 1e3:.1f} ms | "
+          f"remove {args.changed} files: {t_remove * 1e3:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
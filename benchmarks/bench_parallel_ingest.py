@@ -0,0 +1,51 @@
+"""Scaling of FileProcessor.process_zip_file with the process-pool worker count
+
+Usage: python benchmarks/bench_parallel_ingest.py [--files 2000] [--size-kb 64] [--workers 1 2 4 8]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_text_extractor import make_report
+from file_processor import FileProcessor
+
+
+def make_zip(files: int, size_kb: float) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for i in range(files):
+            content = make_report(size_kb / 1024, i % 2 == 0, seed=i)
+            content = content.replace("A9VE0T1000157", f"A9VE0T{1000000 + i:07d}")
+            archive.writestr(f"reports/report_{i:06d}.txt", content)
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=2000)
+    parser.add_argument('--size-kb', type=float, default=64)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    payload = make_zip(args.files, args.size_kb)
+    print(f"{args.files} files, {len(payload) / 1e6:.1f} MB zipped, {os.cpu_count()} CPUs")
+
+    baseline = None
+    for workers in args.workers:
+        processor = FileProcessor(workers=workers)
+        start = time.perf_counter()
+        result = processor.process_zip_file(io.BytesIO(payload))
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"workers={workers:3d}: {elapsed:7.2f} s  {args.files / elapsed:8.0f} files/s  "
+              f"speedup x{baseline / elapsed:.2f}  processed={result['processed_count']} "
+              f"failed={len(result['failed_files'])}")
+
+
+if __name__ == '__main__':
+    main()
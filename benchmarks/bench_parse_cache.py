@@ -0,0 +1,79 @@
+"""Re-import time with and without the persistent parse cache
+
+A cache is warmed with the first 90% of the files, then the full batch is
+imported again (the overlap case of operators re-uploading batches) and
+compared with an import without a cache.
+
+Usage: python benchmarks/bench_parse_cache.py [--files 10000] [--seen 0.9] [--size-kb 4]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_text_extractor import make_report
+from file_processor import FileProcessor
+from parse_cache import ParseCache
+
+
+class Upload:
+    """Minimal stand-in for Streamlit's UploadedFile"""
+
+    def __init__(self, name: str, data: bytes):
+        self.name = name
+        self._data = data
+
+    def getvalue(self) -> bytes:
+        return self._data
+
+
+def make_uploads(count: int, size_kb: float):
+    template = make_report(size_kb / 1024, four_column=True)
+    return [
+        Upload(f"report_{i}.txt",
+               template.replace('A9VE0T1000157', f"A9VE0T{1000000 + i:07d}").replace('job=', f"file={i} job=", 1).encode())
+        for i in range(count)
+    ]
+
+
+def timed_import(uploads, parse_cache=None):
+    processor = FileProcessor(parse_cache=parse_cache)
+    start = time.perf_counter()
+    result = processor.process_uploaded_files(uploads)
+    return time.perf_counter() - start, result['processed_count']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=10000)
+    parser.add_argument('--seen', type=float, default=0.9)
+    parser.add_argument('--size-kb', type=float, default=4)
+    args = parser.parse_args()
+
+    uploads = make_uploads(args.files, args.size_kb)
+    seen = uploads[:int(args.files * args.seen)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = ParseCache(os.path.join(directory, 'parse_cache.sqlite'))
+        t_warm, _ = timed_import(seen, cache)
+        warm_stats = cache.stats()
+        cache.hits = cache.misses = 0
+
+        t_plain, plain_count = timed_import(uploads)
+        t_cached, cached_count = timed_import(uploads, cache)
+        assert plain_count == cached_count
+        stats = cache.stats()
+        cache.close()
+
+    print(f"warm-up: {len(seen)} files in {t_warm:.2f} s (cold cache, {warm_stats['misses']} misses)")
+    print(f"re-import of {args.files} files ({args.seen:.0%} seen): no cache {t_plain:.2f} s | "
+          f"parse cache {t_cached:.2f} s ({t_cached / t_plain:.0%} of the time, "
+          f"hit rate {stats['hit_rate']:.0%}, {stats['bytes'] / 1e6:.1f} MB cached)")
+
+
+if __name__ == '__main__':
+    main()
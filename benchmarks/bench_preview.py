@@ -0,0 +1,54 @@
+"""Latency of the per-device preview: xlsx round-trip vs the in-memory preview model
+
+The round-trip is what the app used to do on every rerun with the preview
+open: build the workbook, then read_excel and iterrows every sheet.
+
+Usage: python benchmarks/bench_preview.py [--devices 100 500] [--sections 41] [--rows 20]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_excel_export import build
+
+
+def round_trip(generator, view, max_rows: int) -> int:
+    excel_file = io.BytesIO(generator.generate_excel_with_device_headers(view))
+    shown = 0
+    for sheet_name in pd.ExcelFile(excel_file).sheet_names:
+        df = pd.read_excel(excel_file, sheet_name=sheet_name, header=None)
+        data_rows = [row for _, row in df.iloc[6:].iterrows() if str(row.iloc[0]).lower().strip() != 'total']
+        shown += len(data_rows[:max_rows])
+    return shown
+
+
+def in_memory(generator, view, max_rows: int) -> int:
+    return sum(len(preview['rows']) for preview in generator.get_device_previews(view, max_rows))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--devices', type=int, nargs='+', default=[100, 500])
+    parser.add_argument('--sections', type=int, default=41)
+    parser.add_argument('--rows', type=int, default=20)
+    args = parser.parse_args()
+
+    for devices in args.devices:
+        generator = build(devices, args.sections)
+        view = generator.apply_filters(format_filter='4-column')
+        for label, func in (('xlsx round-trip', round_trip), ('in-memory', in_memory)):
+            start = time.perf_counter()
+            shown = func(generator, view, args.rows)
+            elapsed = time.perf_counter() - start
+            print(f"{devices:6d} devices {label:16s}: {elapsed * 1000:9.1f} ms  ({shown} rows shown)")
+
+
+if __name__ == '__main__':
+    main()
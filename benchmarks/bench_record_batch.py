@@ -0,0 +1,98 @@
+"""Per-row memory and pickling cost of a scan result: CoverageBatch vs row dicts and row tuples
+
+Row dicts are the coverage_data shape of TextExtractor.process_file (what
+scans returned before record batches); row tuples are the (Section, Y, M,
+C, K) lists pool workers used to send back. Retained bytes and allocated
+blocks are measured while every report's result is held; the large-report
+peak is tracemalloc's while one report with --rows section rows is scanned.
+
+Usage: python benchmarks/bench_record_batch.py [--files 2000] [--rows 200000]
+"""
+import argparse
+import gc
+import os
+import pickle
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import CorpusSpec, generate_reports
+from text_extractor import TextExtractor
+
+
+def long_report(rows: int) -> bytes:
+    """A 4-column report whose table has rows section rows"""
+    lines = [
+        "Serial Number: A9VE0T1000157",
+        "Printed: 30/11/2024 14:56",
+        "Section    Coverage Y(%)    Coverage M(%)    Coverage C(%)    Coverage K(%)",
+        "Total    1.50    2.50    3.50    4.50",
+    ]
+    lines.extend(f"{i * 5}K-{i * 5 + 5}K    {i % 97}.25    {i % 13}.50    {i % 7}.75    {i % 11}.00" for i in range(rows))
+    lines.append("=" * 60)
+    return "\n".join(lines).encode('latin-1')
+
+
+def held(build):
+    """(retained bytes, allocated blocks) of build()'s result"""
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    result = build()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return retained, sys.getallocatedblocks() - blocks, result
+
+
+def peak(func) -> float:
+    """tracemalloc peak of func() in MB"""
+    gc.collect()
+    tracemalloc.start()
+    func()
+    result = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=2000)
+    parser.add_argument('--rows', type=int, default=200_000)
+    args = parser.parse_args()
+
+    extractor = TextExtractor()
+    corpus = [raw for _, raw in generate_reports(CorpusSpec(args.files))]
+    batches = [extractor.scan_batch(raw) for raw in corpus]
+    rows = sum(len(batch) for batch in batches)
+    print(f"{args.files} reports, {rows} rows")
+
+    shapes = [
+        ('row dicts', lambda: [batch.coverage_data() for batch in batches]),
+        ('row tuples', lambda: [list(batch.rows()) for batch in batches]),
+        ('CoverageBatch', lambda: [extractor.scan_batch(raw) for raw in corpus]),
+    ]
+    for name, build in shapes:
+        retained, blocks, results = held(build)
+        start = time.perf_counter()
+        pickled = [pickle.dumps(result, pickle.HIGHEST_PROTOCOL) for result in results]
+        dumped = time.perf_counter()
+        for data in pickled:
+            pickle.loads(data)
+        loaded = time.perf_counter()
+        print(f"  {name:14s} {retained / rows:6.1f} B/row held  {blocks / rows:5.2f} blocks/row  "
+              f"pickle {sum(map(len, pickled)) / rows:5.1f} B/row  "
+              f"dumps+loads {(loaded - start) * 1e6 / args.files:6.1f} us/report "
+              f"({(dumped - start) * 1e6 / args.files:.1f} + {(loaded - dumped) * 1e6 / args.files:.1f})")
+        del results, pickled
+
+    raw = long_report(args.rows)
+    print(f"one report with {args.rows} rows ({len(raw) / 1e6:.1f} MB)")
+    print(f"  scan to row dicts     peak {peak(lambda: extractor.scan_bytes(raw)):7.1f} MB")
+    print(f"  scan to CoverageBatch peak {peak(lambda: extractor.scan_batch(raw)):7.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
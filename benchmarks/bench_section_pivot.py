@@ -0,0 +1,79 @@
+"""Fleet section pivot: build_section_pivot vs pandas pivot_table over the row frame
+
+The pandas baseline builds the row DataFrame and one pivot_table per
+channel, then sorts the section columns numerically and adds the fleet rows.
+
+Usage: python benchmarks/bench_section_pivot.py [--devices 1000 10000] [--reports 2] [--sections 40]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from excel_generator import ExcelGenerator
+from section_pivot import DEFAULT_PERCENTILES, pivot_sheet_rows, section_order
+
+
+def build(devices: int, reports: int, sections: int, seed: int) -> ExcelGenerator:
+    rng = np.random.default_rng(seed)
+    generator = ExcelGenerator()
+    labels = ['Total'] + [f"{s * 5}K-{s * 5 + 5}K" for s in range(sections)]
+    for report in range(reports):
+        values = rng.uniform(0, 20, size=(devices, len(labels), 4)).round(2).tolist()
+        for device in range(devices):
+            # Every tenth device is a mono (1-column) printer
+            format_type = '1-column' if device % 10 == 0 else '4-column'
+            rows = [(label, *row) for label, row in zip(labels, values[device])]
+            generator.add_coverage_rows(f"A9VE0T{device:07d}", f"{1 + report:02d}/01/2025 10:00",
+                                        f"report_{device}_{report}.txt", format_type, rows)
+    return generator
+
+
+def pandas_pivot(generator: ExcelGenerator):
+    frame = generator.apply_filters().to_frame()
+    frame = frame[frame['Section'].astype(str) != 'Total']
+    four_column = frame[frame['Format_Type'] == '4-column']
+    pivots = {}
+    for channel in 'YMCK':
+        source = frame if channel == 'Y' else four_column
+        pivot = source.pivot_table(index='Device_ID', columns='Section', values=f"Coverage_{channel}",
+                                   aggfunc='mean', observed=True, sort=False)
+        columns = list(pivot.columns)
+        pivot = pivot[[columns[i] for i in section_order(columns)]]
+        summary = [pivot.mean(), *(pivot.quantile(p / 100) for p in DEFAULT_PERCENTILES), pivot.count()]
+        pivots[channel] = (pivot, summary)
+    return pivots
+
+
+def timed(func, repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--devices', type=int, nargs='+', default=[1000, 10_000])
+    parser.add_argument('--reports', type=int, default=2)
+    parser.add_argument('--sections', type=int, default=40)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    for devices in args.devices:
+        generator = build(devices, args.reports, args.sections, args.seed)
+        pivot = generator.get_section_pivot()
+        print(f"{devices} devices, {len(generator.store)} rows -> {len(pivot)} x {len(pivot.sections)} per channel")
+        print(f"  build_section_pivot  {timed(generator.get_section_pivot) * 1000:9.1f} ms")
+        print(f"  + sheet rows         {timed(lambda: pivot_sheet_rows(generator.get_section_pivot())) * 1000:9.1f} ms")
+        print(f"  pandas pivot_table   {timed(lambda: pandas_pivot(generator)) * 1000:9.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Peak memory and time of building, querying and exporting a store, in RAM vs spilled past a memory budget
+
+Peaks are tracemalloc's (NumPy buffers included; pages of the memory-mapped
+spill files are not allocations and are not counted), measured relative to
+what the store already holds, and times include tracing overhead.
+
+Usage: python benchmarks/bench_spill.py [--rows 1000000] [--sections 41] [--budgets 0 16] [--export]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from excel_generator import ExcelGenerator
+
+
+def make_files(rows: int, sections: int):
+    """Yield (device_id, date, filename, format_type, rows) per synthetic file"""
+    for i in range(rows // sections):
+        section_rows = [(f"{s * 5}K-{s * 5 + 5}K", 1.5 + s, 2.5 + i % 7, 3.5, 4.5 + s) for s in range(sections)]
+        device_id = f"A9VE0T{1000000 + i % 5000:07d}"
+        date = f"{1 + i % 28}/{1 + i % 12:02d}/2025 {i % 24:02d}:{i % 60:02d}"
+        yield device_id, date, f"report_{i:07d}.txt", '4-column', section_rows
+
+
+def traced(func):
+    """(seconds, peak MB above the starting allocation, result)"""
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    return elapsed, peak / 1e6, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--sections', type=int, default=41)
+    parser.add_argument('--budgets', type=float, nargs='+', default=[0, 16],
+                        help="memory budgets in MB; 0 keeps every row in RAM")
+    parser.add_argument('--export', action='store_true',
+                        help="also export the full workbook (slow: openpyxl's per-sheet state dominates its peak)")
+    args = parser.parse_args()
+
+    for budget in args.budgets:
+        def build():
+            built = ExcelGenerator(int(budget * 1024 * 1024) if budget else None)
+            for file_args in make_files(args.rows, args.sections):
+                built.add_coverage_rows(*file_args)
+            return built
+
+        label = f"budget {budget:g} MB" if budget else "in RAM"
+        elapsed, peak, generator = traced(build)
+        store = generator.store
+        print(f"{label}: {len(store)} rows, {store.spilled_bytes / 1e6:.1f} MB spilled")
+        print(f"  {'build':22s} {elapsed:7.2f} s  peak {peak:8.1f} MB")
+
+        device = generator.get_unique_devices()[0]
+        queries = [
+            ('summary (all)', lambda: generator.get_summary()),
+            ('stats (fold)', lambda: generator.get_coverage_stats('device')),
+            ('summary (latest)', lambda: generator.get_summary(generator.apply_filters(latest_only=True))),
+            ('one device workbook', lambda: generator.generate_excel_with_device_headers(
+                generator.apply_filters(device_filter=device))),
+            ('remove 10% of files', lambda: generator.remove_files(generator.get_loaded_files()[::10])),
+        ]
+        if args.export:
+            def export():
+                with tempfile.TemporaryFile() as output:
+                    generator.write_excel_with_device_headers(output)
+            queries.append(('full workbook', export))
+        for name, query in queries:
+            elapsed, peak, _ = traced(query)
+            print(f"  {name:22s} {elapsed:7.2f} s  peak {peak:8.1f} MB")
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
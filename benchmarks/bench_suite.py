@@ -0,0 +1,210 @@
+"""Throughput and peak memory of the main pipeline stages on synthetic corpora
+
+For every corpus size (see corpus.py) these stages are measured:
+
+  process_file        decode + TextExtractor.process_file per report
+  process_zip_file    FileProcessor.process_zip_file on an in-memory zip
+  add_machine_data    ExcelGenerator.add_machine_data per report
+  apply_filters       device, date and device+date ExcelGenerator.apply_filters queries
+  generate_excel      ExcelGenerator.generate_excel_with_device_headers of all rows
+
+Each stage is timed on its own, then run again under tracemalloc for its
+peak allocation (tracemalloc slows allocation-heavy code, so timings never
+come from the traced run). --json saves the results; --baseline compares
+with saved results and exits 1 when a stage's throughput drops, or its peak
+memory grows, by more than --tolerance.
+
+Usage: python benchmarks/bench_suite.py [--sizes 100 10000 100000] [--json out.json] [--baseline base.json]
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import CorpusSpec, generate_reports
+from excel_generator import ExcelGenerator
+from file_processor import FileProcessor, read_file_with_fallback_encoding
+from text_extractor import TextExtractor
+
+# Reports extracted per untimed batch when feeding add_machine_data
+ADD_BATCH = 1000
+FILTER_QUERIES = 200
+# Peak memory below this is not compared against the baseline (noise)
+MIN_COMPARED_PEAK_MB = 1.0
+
+
+class Context:
+    """A corpus and what earlier stages built from it"""
+
+    def __init__(self, reports):
+        self.reports = reports
+        self.archive = None
+        self.generator = None
+
+
+def stage_process_file(context: Context):
+    extractor = TextExtractor()
+    start = time.perf_counter()
+    for filename, raw in context.reports:
+        extractor.process_file(read_file_with_fallback_encoding(raw), filename)
+    return time.perf_counter() - start, len(context.reports), 'files'
+
+
+def stage_process_zip_file(context: Context):
+    if context.archive is None:
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for filename, raw in context.reports:
+                archive.writestr(filename, raw)
+        context.archive = buffer.getvalue()
+    processor = FileProcessor()
+    start = time.perf_counter()
+    result = processor.process_zip_file(io.BytesIO(context.archive))
+    elapsed = time.perf_counter() - start
+    assert result['processed_count'] == len(context.reports), result['failed_files'][:5]
+    return elapsed, len(context.reports), 'files'
+
+
+def stage_add_machine_data(context: Context):
+    extractor = TextExtractor()
+    generator = ExcelGenerator()
+    elapsed = 0.0
+    for batch_start in range(0, len(context.reports), ADD_BATCH):
+        batch = [
+            extractor.process_file(read_file_with_fallback_encoding(raw), filename)
+            for filename, raw in context.reports[batch_start:batch_start + ADD_BATCH]
+        ]
+        start = time.perf_counter()
+        for machine_data in batch:
+            generator.add_machine_data(machine_data)
+        elapsed += time.perf_counter() - start
+    context.generator = generator
+    return elapsed, len(context.reports), 'files'
+
+
+def stage_apply_filters(context: Context):
+    generator = context.generator
+    rng = random.Random(0)
+    devices = generator.get_unique_devices()
+    dates = generator.get_unique_dates()
+    queries = []
+    for _ in range(FILTER_QUERIES):
+        queries.append((rng.choice(devices), None))
+        queries.append((None, rng.choice(dates)))
+        queries.append((rng.choice(devices), rng.choice(dates)))
+    start = time.perf_counter()
+    for device_filter, date_filter in queries:
+        len(generator.apply_filters(device_filter, date_filter))
+    return time.perf_counter() - start, len(queries), 'queries'
+
+
+def stage_generate_excel(context: Context):
+    generator = context.generator
+    start = time.perf_counter()
+    generator.generate_excel_with_device_headers()
+    return time.perf_counter() - start, len(generator.store), 'rows'
+
+
+# Order matters: add_machine_data builds the generator the next two stages use
+STAGES = [
+    ('process_file', stage_process_file),
+    ('add_machine_data', stage_add_machine_data),
+    ('apply_filters', stage_apply_filters),
+    ('generate_excel', stage_generate_excel),
+    ('process_zip_file', stage_process_zip_file),
+]
+
+
+def peak_memory(stage, context: Context) -> int:
+    tracemalloc.start()
+    try:
+        stage(context)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_suite(sizes, stages, seed: int, memory: bool):
+    results = []
+    for files in sizes:
+        start = time.perf_counter()
+        context = Context(list(generate_reports(CorpusSpec(files, seed=seed))))
+        megabytes = sum(len(raw) for _, raw in context.reports) / 1e6
+        print(f"{files} files ({megabytes:.1f} MB) generated in {time.perf_counter() - start:.1f} s")
+        for name, stage in STAGES:
+            if name not in stages:
+                # Still build what later stages need
+                if name == 'add_machine_data' and ({'apply_filters', 'generate_excel'} & set(stages)):
+                    stage(context)
+                continue
+            elapsed, units, unit = stage(context)
+            peak = peak_memory(stage, context) if memory else None
+            result = {
+                'files': files, 'stage': name, 'seconds': elapsed, 'units': units, 'unit': unit,
+                'throughput': units / elapsed if elapsed else float('inf'),
+                'peak_mb': peak / 1e6 if peak is not None else None
+            }
+            results.append(result)
+            peak_text = f"peak {result['peak_mb']:8.1f} MB" if memory else ''
+            print(f"  {name:18s} {elapsed:8.3f} s  {result['throughput']:12,.0f} {unit}/s  {peak_text}")
+    return results
+
+
+def compare(results, baseline, tolerance: float):
+    """Human-readable regressions of results against baseline results"""
+    previous = {(result['files'], result['stage']): result for result in baseline}
+    regressions = []
+    for result in results:
+        base = previous.get((result['files'], result['stage']))
+        if base is None:
+            continue
+        label = f"{result['stage']} @ {result['files']} files"
+        if result['throughput'] < base['throughput'] * (1 - tolerance):
+            regressions.append(f"{label}: throughput {result['throughput']:,.0f} {result['unit']}/s "
+                               f"vs baseline {base['throughput']:,.0f}")
+        if (result['peak_mb'] is not None and base['peak_mb'] is not None
+                and max(result['peak_mb'], base['peak_mb']) >= MIN_COMPARED_PEAK_MB
+                and result['peak_mb'] > base['peak_mb'] * (1 + tolerance)):
+            regressions.append(f"{label}: peak {result['peak_mb']:.1f} MB vs baseline {base['peak_mb']:.1f} MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 10_000, 100_000])
+    parser.add_argument('--stages', nargs='+', choices=[name for name, _ in STAGES], default=[name for name, _ in STAGES])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc runs")
+    parser.add_argument('--json', help="write the results to this file")
+    parser.add_argument('--baseline', help="results file of an earlier run to compare with")
+    parser.add_argument('--tolerance', type=float, default=0.3,
+                        help="allowed relative throughput drop / peak memory growth (default 0.3)")
+    args = parser.parse_args()
+
+    results = run_suite(args.sizes, args.stages, args.seed, not args.no_memory)
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(), 'results': results},
+                      file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file)['results'], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
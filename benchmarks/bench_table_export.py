@@ -0,0 +1,76 @@
+"""Export and re-read time of the per-device workbook vs CSV / Parquet / Feather tables
+
+Each export is written to memory and then loaded back with pandas, which is
+what downstream analytics does with it (pd.read_excel of every sheet for the
+workbook). Parquet and Feather are skipped when pyarrow is not installed.
+
+Usage: python benchmarks/bench_table_export.py [--files 1000 10000] [--layouts device tidy] [--skip-xlsx-read]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import CorpusSpec, generate_reports
+from excel_generator import TABLE_LAYOUTS, ExcelGenerator, available_table_formats
+from file_processor import read_file_with_fallback_encoding
+from text_extractor import TextExtractor
+
+READERS = {'csv': pd.read_csv, 'parquet': pd.read_parquet, 'feather': pd.read_feather}
+
+
+def build(files: int, seed: int) -> ExcelGenerator:
+    extractor = TextExtractor()
+    generator = ExcelGenerator()
+    for filename, raw in generate_reports(CorpusSpec(files, seed=seed)):
+        generator.add_machine_data(extractor.process_file(read_file_with_fallback_encoding(raw), filename))
+    return generator
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def report(label: str, write_seconds: float, read_seconds, size: int):
+    read_text = f"read {read_seconds:7.2f} s" if read_seconds is not None else "read       -  "
+    print(f"  {label:18s} write {write_seconds:7.2f} s  {read_text}  output {size / 1e6:7.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, nargs='+', default=[1000, 10_000])
+    parser.add_argument('--layouts', nargs='+', choices=TABLE_LAYOUTS, default=list(TABLE_LAYOUTS))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--skip-xlsx-read', action='store_true', help="do not time pd.read_excel (slow)")
+    args = parser.parse_args()
+
+    for files in args.files:
+        generator = build(files, args.seed)
+        view = generator.apply_filters()
+        print(f"{files} files: {len(generator.get_unique_devices())} devices, {len(generator.store)} rows")
+
+        write_seconds, workbook = timed(lambda: generator.generate_excel_with_device_headers(view))
+        read_seconds = None
+        if not args.skip_xlsx_read:
+            read_seconds, _ = timed(lambda: pd.read_excel(io.BytesIO(workbook), sheet_name=None, header=None))
+        report('xlsx', write_seconds, read_seconds, len(workbook))
+
+        for layout in args.layouts:
+            for file_format in available_table_formats():
+                output = io.BytesIO()
+                write_seconds, _ = timed(lambda: generator.write_table(output, file_format, view, layout))
+                data = output.getvalue()
+                read_seconds, _ = timed(lambda: READERS[file_format](io.BytesIO(data)))
+                report(f"{file_format} ({layout})", write_seconds, read_seconds, len(data))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Throughput comparison: single-pass ReportScanner vs the multi-pass extract_* path
+
+Usage: python benchmarks/bench_text_extractor.py [--size-mb 4] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from text_extractor import TextExtractor
+
+
+def make_report(size_mb: float, four_column: bool, seed: int = 0) -> str:
+    """Build a coverage report padded with log noise up to roughly size_mb"""
+    rng = random.Random(seed)
+    lines = [
+        "Printer Coverage Report",
+        "Serial Number: A9VE0T1000157",
+        "Printed: 30/11/2024 14:56",
+        "",
+    ]
+    if four_column:
+        lines.append("Section    Coverage Y(%)    Coverage M(%)    Coverage C(%)    Coverage K(%)")
+    else:
+        lines.append("Section    Coverage(%)")
+    lines.append("-" * 60)
+    width = 4 if four_column else 1
+    lines.append("Total    " + "    ".join(f"{rng.uniform(0, 20):.2f}" for _ in range(width)))
+    for start in range(0, 200, 5):
+        values = "    ".join(f"{rng.uniform(0, 20):.2f}" for _ in range(width))
+        lines.append(f"{start}K-{start + 5}K    {values}")
+    lines.append("=" * 60)
+    lines.append("Coverage Page Data")
+
+    target = int(size_mb * 1024 * 1024)
+    size = sum(len(line) + 1 for line in lines)
+    while size < target:
+        line = f"{rng.randint(0, 10**9):010d} job={rng.randint(0, 9999)} pages={rng.randint(1, 500)} status=OK"
+        lines.append(line)
+        size += len(line) + 1
+    return "\n".join(lines)
+
+
+def multi_pass(extractor: TextExtractor, content: str, filename: str):
+    """The pre-scanner process_file: one pass per extract_* call"""
+    format_type = extractor.detect_format_type(content)
+    device_id = extractor.extract_device_id(content) or extractor.extract_device_id_from_filename(filename)
+    date = extractor.extract_date(content) or extractor.extract_date_from_filename(filename)
+    coverage_data = extractor.extract_coverage_data(content, format_type)
+    return format_type, device_id, date, coverage_data
+
+
+def timed(func, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size-mb', type=float, default=4.0)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    extractor = TextExtractor()
+    for four_column in (False, True):
+        content = make_report(args.size_mb, four_column)
+        result = extractor.process_file(content, 'report.txt')
+        legacy = multi_pass(extractor, content, 'report.txt')
+        assert (result['format_type'], result['device_id'], result['date'], result['coverage_data']) == legacy
+
+        mb = len(content) / (1024 * 1024)
+        t_multi = timed(lambda: multi_pass(extractor, content, 'report.txt'), args.repeat)
+        t_single = timed(lambda: extractor.process_file(content, 'report.txt'), args.repeat)
+        label = '4-column' if four_column else '1-column'
+        print(f"{label} {mb:.1f} MB: multi-pass {mb / t_multi:8.1f} MB/s | "
+              f"single-pass {mb / t_single:8.1f} MB/s | speedup x{t_multi / t_single:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Latest report per device, device history and time-range queries: ReportTimeline vs scanning rows
+
+The scan baseline is what the queries cost without the timeline: parse the
+Date strings of every row and group or filter the full row table in pandas.
+
+Usage: python benchmarks/bench_timeline.py [--files 10000 100000] [--queries 200]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from excel_generator import ExcelGenerator
+
+
+def build(files: int, seed: int) -> ExcelGenerator:
+    rng = random.Random(seed)
+    generator = ExcelGenerator()
+    devices = max(1, files // 20)
+    rows = [('Total', 1.0, 2.0, 3.0, 4.0)] + [(f"{s * 5}K-{s * 5 + 5}K", 1.0, 2.0, 3.0, 4.0) for s in range(20)]
+    for i in range(files):
+        date = f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(2022, 2025)} {rng.randint(0, 23):02d}:00"
+        generator.add_coverage_rows(f"A9VE0T{rng.randrange(devices):07d}", date, f"report_{i}.txt", '4-column', rows)
+    return generator
+
+
+def timed(func, repeat: int = 1) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    for files in args.files:
+        generator = build(files, args.seed)
+        devices = generator.get_unique_devices()
+        rng = random.Random(args.seed)
+        sample = [rng.choice(devices) for _ in range(args.queries)]
+        start, end = datetime(2024, 1, 1), datetime(2024, 6, 30, 23, 59)
+        print(f"{files} files, {len(devices)} devices, {len(generator.store)} rows")
+
+        def scan_frame() -> pd.DataFrame:
+            frame = generator.apply_filters().to_frame()
+            frame['Report_Time'] = pd.to_datetime(frame['Date'].astype(str), format='%d/%m/%Y %H:%M')
+            return frame
+
+        def scan_history(device_id: str) -> pd.DataFrame:
+            frame = scan_frame()
+            return frame[frame['Device_ID'] == device_id].sort_values('Report_Time')
+
+        def scan_range() -> pd.DataFrame:
+            frame = scan_frame()
+            return frame[frame['Report_Time'].between(start, end)]
+
+        timeline = generator.timeline
+        # The first query pays for the lazy build
+        build_seconds = timed(timeline.latest)
+        results = [
+            ('timeline build', build_seconds, None),
+            ('latest per device', timed(lambda: generator.apply_filters(latest_only=True), 20),
+             timed(lambda: scan_frame().sort_values('Report_Time').groupby('Device_ID', observed=True).tail(1))),
+            ('device history', timed(lambda: [generator.get_device_history(device) for device in sample]) / len(sample),
+             timed(lambda: scan_history(sample[0]))),
+            ('time range', timed(lambda: timeline.in_range(start, end), 20),
+             timed(scan_range)),
+        ]
+        for label, seconds, scan_seconds in results:
+            scan_text = f"  scan {scan_seconds * 1000:9.2f} ms" if scan_seconds is not None else ''
+            print(f"  {label:18s} {seconds * 1000:9.3f} ms{scan_text}")
+
+
+if __name__ == '__main__':
+    main()
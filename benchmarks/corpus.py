@@ -0,0 +1,176 @@
+"""Reproducible synthetic coverage report corpora
+
+Every report is generated from its own seed (spec seed + file index), so
+file i only depends on the seed and device count, not on the corpus size or
+on which range of files is generated. Each report is valid: TextExtractor
+finds a device ID and coverage rows in all of them (from the filename for
+the 'filename' device and date styles).
+
+Usage: python benchmarks/corpus.py OUTPUT_DIR [--files 1000] [--zip] [--seed 0]
+"""
+import argparse
+import io
+import os
+import random
+import string
+import sys
+import zipfile
+from typing import BinaryIO, Iterator, Optional, Sequence, Tuple
+
+# How the device ID appears; the first three match the DEVICE_ID_PATTERNS in priority order
+DEVICE_ID_STYLES = ('serial', 'numeric', 'short', 'filename')
+# dd/mm/yyyy hh:mm, d/mm/yyyy h:mm, date only, YYYY_MMDD_HHMM in the filename, or no date at all
+DATE_STYLES = ('full', 'short', 'date_only', 'filename', 'none')
+ENCODINGS = ('ascii', 'utf-8', 'latin-1', 'cp1252')
+NEWLINES = ('\n', '\r\n')
+
+# Non-ASCII noise for the non-ASCII encodings (every character exists in latin-1 and cp1252)
+ACCENTED_NOISE = ("Opérateur: Zoë Müller", "Entrée papier: bac n°2", "Qualité: élevée", "Größe: A4 · 80 g/m²")
+# Lines that look like coverage rows or headers but must be ignored
+NEAR_MISS_NOISE = ("5K-10K    n/a", "Coverage estimate only", "Section totals follow", "0K-5K", "Pages: 120 (4.5%)")
+
+
+class CorpusSpec:
+    """Parameters of a synthetic corpus; ranges are inclusive (low, high) pairs"""
+
+    def __init__(self, files: int = 1000, devices: Optional[int] = None, four_column_ratio: float = 0.5,
+                 sections: Tuple[int, int] = (10, 40), noise_lines: Tuple[int, int] = (0, 40),
+                 device_styles: Sequence[str] = DEVICE_ID_STYLES, date_styles: Sequence[str] = DATE_STYLES,
+                 encodings: Sequence[str] = ENCODINGS, newlines: Sequence[str] = NEWLINES, seed: int = 0):
+        self.files = files
+        # Several reports per device by default, as in a real fleet
+        self.devices = devices or max(1, files // 4)
+        self.four_column_ratio = four_column_ratio
+        self.sections = sections
+        self.noise_lines = noise_lines
+        self.device_styles = tuple(device_styles)
+        self.date_styles = tuple(date_styles)
+        self.encodings = tuple(encodings)
+        self.newlines = tuple(newlines)
+        self.seed = seed
+
+
+def device_id(spec: CorpusSpec, device: int) -> Tuple[str, str]:
+    """(style, ID) of device number device"""
+    rng = random.Random(f"{spec.seed}:device:{device}")
+    style = rng.choice(spec.device_styles)
+    if style == 'numeric':
+        return style, f"A{rng.randint(1, 99)}{rng.choice(string.ascii_uppercase)}{rng.randint(0, 10**10 - 1):010d}"
+    if style == 'short':
+        return style, f"A{rng.randint(10, 9999)}T{rng.randint(0, 10**7 - 1):07d}"
+    letters = ''.join(rng.choice(string.ascii_uppercase) for _ in range(rng.randint(1, 4)))
+    return style, f"A{rng.randint(1, 99)}{letters}{rng.randint(0, 99)}T{rng.randint(0, 10**7 - 1):07d}"
+
+
+def noise_line(rng: random.Random, accented: bool) -> str:
+    roll = rng.random()
+    if accented and roll < 0.1:
+        return rng.choice(ACCENTED_NOISE)
+    if roll < 0.2:
+        return rng.choice(NEAR_MISS_NOISE)
+    return f"{rng.randint(0, 10**9):010d} job={rng.randint(0, 9999)} pages={rng.randint(1, 500)} status=OK"
+
+
+def make_report(spec: CorpusSpec, index: int) -> Tuple[str, bytes]:
+    """(filename, raw bytes) of report number index"""
+    rng = random.Random(f"{spec.seed}:report:{index}")
+    style, device = device_id(spec, rng.randrange(spec.devices))
+    date_style = rng.choice(spec.date_styles)
+    encoding = rng.choice(spec.encodings)
+    newline = rng.choice(spec.newlines)
+    four_column = rng.random() < spec.four_column_ratio
+    accented = encoding != 'ascii'
+    year, month, day = rng.randint(2023, 2025), rng.randint(1, 12), rng.randint(1, 28)
+    hour, minute = rng.randint(0, 23), rng.randint(0, 59)
+
+    lines = ["Printer Coverage Report"]
+    if style != 'filename':
+        lines.append(f"Serial Number: {device}")
+    if date_style == 'full':
+        lines.append(f"Printed: {day:02d}/{month:02d}/{year} {hour:02d}:{minute:02d}")
+    elif date_style == 'short':
+        lines.append(f"Printed: {day}/{month:02d}/{year} {hour}:{minute:02d}")
+    elif date_style == 'date_only':
+        lines.append(f"Printed: {day:02d}/{month:02d}/{year}")
+    lines.extend(noise_line(rng, accented) for _ in range(rng.randint(*spec.noise_lines) // 2))
+
+    width = 4 if four_column else 1
+    if four_column:
+        lines.append("Section    Coverage Y(%)    Coverage M(%)    Coverage C(%)    Coverage K(%)")
+    else:
+        lines.append("Section    Coverage(%)")
+    lines.append("-" * 60)
+    lines.append("Total    " + "    ".join(f"{rng.uniform(0, 20):.2f}" for _ in range(width)))
+    for section in range(rng.randint(*spec.sections)):
+        values = "    ".join(f"{rng.uniform(0, 20):.2f}" for _ in range(width))
+        lines.append(f"{section * 5}K-{section * 5 + 5}K    {values}")
+    lines.append("=" * 60)
+    lines.append("Coverage Page Data")
+    lines.extend(noise_line(rng, accented) for _ in range(rng.randint(*spec.noise_lines) // 2))
+
+    parts = [device if style == 'filename' else 'report']
+    if date_style == 'filename':
+        parts.append(f"{year}_{month:02d}{day:02d}_{hour:02d}{minute:02d}")
+    parts.append(f"{index:07d}")
+    raw = newline.join(lines).encode(encoding)
+    if encoding == 'utf-8' and rng.random() < 0.5:
+        raw = b'\xef\xbb\xbf' + raw
+    return '_'.join(parts) + '.txt', raw
+
+
+def generate_reports(spec: CorpusSpec, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[str, bytes]]:
+    """Yield (filename, raw bytes) for reports start..stop (default: the whole corpus)"""
+    for index in range(start, spec.files if stop is None else stop):
+        yield make_report(spec, index)
+
+
+def write_zip(spec: CorpusSpec, output: BinaryIO, compression: int = zipfile.ZIP_DEFLATED):
+    """Write the corpus as a flat zip archive"""
+    with zipfile.ZipFile(output, 'w', compression) as archive:
+        for filename, raw in generate_reports(spec):
+            archive.writestr(filename, raw)
+
+
+def zip_bytes(spec: CorpusSpec) -> bytes:
+    buffer = io.BytesIO()
+    write_zip(spec, buffer)
+    return buffer.getvalue()
+
+
+def write_directory(spec: CorpusSpec, directory: str, per_directory: int = 1000):
+    """Write the corpus as files, per_directory reports per subdirectory"""
+    for index, (filename, raw) in enumerate(generate_reports(spec)):
+        subdirectory = os.path.join(directory, f"batch_{index // per_directory:04d}")
+        if index % per_directory == 0:
+            os.makedirs(subdirectory, exist_ok=True)
+        with open(os.path.join(subdirectory, filename), 'wb') as file:
+            file.write(raw)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('output', help="directory to write (or zip file with --zip)")
+    parser.add_argument('--files', type=int, default=1000)
+    parser.add_argument('--devices', type=int)
+    parser.add_argument('--four-column-ratio', type=float, default=0.5)
+    parser.add_argument('--sections', type=int, nargs=2, default=(10, 40), metavar=('MIN', 'MAX'))
+    parser.add_argument('--noise-lines', type=int, nargs=2, default=(0, 40), metavar=('MIN', 'MAX'))
+    parser.add_argument('--device-styles', nargs='+', choices=DEVICE_ID_STYLES, default=DEVICE_ID_STYLES)
+    parser.add_argument('--date-styles', nargs='+', choices=DATE_STYLES, default=DATE_STYLES)
+    parser.add_argument('--encodings', nargs='+', choices=ENCODINGS, default=ENCODINGS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--zip', action='store_true', help="write one zip archive instead of a directory tree")
+    args = parser.parse_args()
+
+    spec = CorpusSpec(args.files, args.devices, args.four_column_ratio, tuple(args.sections), tuple(args.noise_lines),
+                      args.device_styles, args.date_styles, args.encodings, seed=args.seed)
+    if args.zip:
+        with open(args.output, 'wb') as output:
+            write_zip(spec, output)
+    else:
+        write_directory(spec, args.output)
+    print(f"wrote {args.files} reports ({spec.devices} devices) to {args.output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""Headless batch import: parse report trees and archives, write the per-device workbook
+
+Usage: python cli.py REPORTS_DIR [MORE_PATHS ...] -o coverage.xlsx [--workers 0] [--csv coverage.csv]
+       [--bundle workbooks.zip] [--fleet-summary] [--diagnostics stages.json]
+"""
+import argparse
+import os
+import sys
+import time
+from typing import List, Optional
+
+from excel_generator import TABLE_LAYOUTS
+from file_processor import FileProcessor
+from instrumentation import Instrumentation, stage_rows
+from parse_cache import ParseCache
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('paths', nargs='+',
+                        help="report files, directories (walked recursively) or zip/tar/gz archives")
+    parser.add_argument('-o', '--output', default='coverage_data.xlsx', help="per-device workbook to write")
+    parser.add_argument('--bundle', metavar='ZIP',
+                        help="also write a ZIP with one workbook per device (see --devices-per-workbook)")
+    parser.add_argument('--devices-per-workbook', type=int, default=1, metavar='N',
+                        help="devices per workbook in the --bundle ZIP (default 1)")
+    parser.add_argument('--fleet-summary', action='store_true',
+                        help="start the workbook with a devices x sections pivot sheet with fleet mean/percentile rows")
+    parser.add_argument('--csv', help="also write every row as CSV")
+    parser.add_argument('--csv-layout', choices=TABLE_LAYOUTS, default='device',
+                        help="'device': one row per device section; 'tidy': one row per coverage value")
+    parser.add_argument('-w', '--workers', type=int, default=0,
+                        help="extraction processes; 0 uses every core, 1 stays in-process")
+    parser.add_argument('--parse-cache', help="SQLite parse cache file reused across runs")
+    parser.add_argument('--memory-budget', type=float, metavar='MB',
+                        help="keep at most MB of coverage rows in RAM and spill the rest to temp files")
+    parser.add_argument('--spill-dir', help="directory for the --memory-budget spill files (default: system temp)")
+    parser.add_argument('--device', help="only export this device ID")
+    parser.add_argument('--date', help="only export reports of this date ('30/11/2024' or '30/11/2024 14:56')")
+    parser.add_argument('--diagnostics', metavar='FILE',
+                        help="record per-stage timings, print them and write them to FILE as JSON")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="with --diagnostics, also record peak traced memory (slower)")
+    parser.add_argument('--latest', action='store_true',
+                        help="only export the latest report of each device (by report date)")
+    parser.add_argument('--show-failures', type=int, default=20, metavar='N',
+                        help="list the first N failed files (default 20)")
+    return parser
+
+
+def format_size(path: str) -> str:
+    return f"{os.path.getsize(path) / (1024 * 1024):.1f} MB"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    parse_cache = ParseCache(args.parse_cache) if args.parse_cache else None
+    instrumentation = Instrumentation(args.trace_memory) if args.diagnostics else None
+    memory_budget = int(args.memory_budget * 1024 * 1024) if args.memory_budget is not None else None
+    processor = FileProcessor(workers=args.workers, parse_cache=parse_cache, instrumentation=instrumentation,
+                              memory_budget=memory_budget, spill_dir=args.spill_dir)
+    timings = []
+
+    start = time.perf_counter()
+    results = processor.process_paths(args.paths)
+    timings.append(('ingest', time.perf_counter() - start, None))
+
+    if results['processed_count']:
+        start = time.perf_counter()
+        processor.write_excel_file(args.output, args.device, args.date, args.latest, args.fleet_summary)
+        timings.append(('workbook', time.perf_counter() - start, args.output))
+
+        if args.bundle:
+            start = time.perf_counter()
+            processor.write_device_workbooks(args.bundle, args.device, args.date, args.devices_per_workbook, args.latest)
+            timings.append(('bundle', time.perf_counter() - start, args.bundle))
+
+        if args.csv:
+            start = time.perf_counter()
+            filtered_data = processor.excel_generator.apply_filters(args.device, args.date, latest_only=args.latest)
+            with open(args.csv, 'wb') as output:
+                processor.excel_generator.write_table(output, 'csv', filtered_data, args.csv_layout)
+            timings.append(('csv', time.perf_counter() - start, args.csv))
+
+    failed_files = results['failed_files']
+    summary = results['summary']
+    print(f"Processed {results['processed_count']} files ({results.get('replaced_count', 0)} replaced, "
+          f"{results.get('unchanged_count', 0)} unchanged), {len(failed_files)} failed "
+          f"({summary['total_machines']} devices, {summary['total_sections']} sections)")
+    spilled_bytes = processor.excel_generator.store.spilled_bytes
+    if spilled_bytes:
+        print(f"  {spilled_bytes / (1024 * 1024):.1f} MB of coverage rows spilled to disk")
+    file_count = results['processed_count'] + len(failed_files)
+    for stage, elapsed, output in timings:
+        if output:
+            detail = f"-> {output} ({format_size(output)})"
+        else:
+            detail = f"({file_count / elapsed:.0f} files/s)" if elapsed else ''
+        print(f"  {stage:10s} {elapsed:8.2f} s  {detail}")
+    if parse_cache is not None:
+        cache_stats = parse_cache.stats()
+        print(f"  parse cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+              f"({cache_stats['hit_rate']:.0%} hit rate)")
+        parse_cache.close()
+    if instrumentation is not None:
+        print("  stage            seconds   share      MB/s")
+        for row in stage_rows(instrumentation.report(include_files=False)):
+            throughput = f"{row['MB/s']:9.1f}" if row['MB/s'] is not None else ''
+            print(f"    {row['Stage']:14s} {row['Seconds']:8.2f}  {row['Share (%)']:5.1f}%  {throughput}")
+        with open(args.diagnostics, 'w') as file:
+            file.write(instrumentation.to_json())
+
+    if failed_files and args.show_failures:
+        print(f"Failed files (first {min(args.show_failures, len(failed_files))}):", file=sys.stderr)
+        for failed_file in failed_files[:args.show_failures]:
+            print(f"  {failed_file}", file=sys.stderr)
+
+    if not results['processed_count']:
+        print("No coverage data found; no workbook written", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
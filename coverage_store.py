@@ -0,0 +1,545 @@
+import bisect
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from text_extractor import parse_report_date
+
+HEADER_COLUMNS = ('Device_ID', 'Date', 'Filename', 'Format_Type')
+CATEGORICAL_COLUMNS = HEADER_COLUMNS + ('Section',)
+VALUE_COLUMNS = ('Coverage_Y', 'Coverage_M', 'Coverage_C', 'Coverage_K')
+# Same key order as the row dicts ExcelGenerator used to keep in all_data
+COLUMNS = CATEGORICAL_COLUMNS + VALUE_COLUMNS
+EPOCH = datetime(1970, 1, 1)
+# Seconds value of dates that do not parse (datetime64's NaT, which sorts first)
+NO_TIMESTAMP = np.iinfo(np.int64).min
+# Columns stored per row (the header columns are stored per file) and their on-disk types
+ROW_COLUMNS = ('Section',) + VALUE_COLUMNS
+ROW_DTYPES = {'Section': np.uint32, **dict.fromkeys(VALUE_COLUMNS, np.float64)}
+ROW_BYTES = sum(np.dtype(dtype).itemsize for dtype in ROW_DTYPES.values())
+# Rows read per step when spilled rows are compacted or renumbered
+SPILL_CHUNK_ROWS = 256 * 1024
+
+
+def to_seconds(value: datetime) -> int:
+    """Naive datetime as whole seconds since the epoch"""
+    return (value - EPOCH) // timedelta(seconds=1)
+
+
+class Categories:
+    """Interned values of one categorical column; a row stores the value's code"""
+    __slots__ = ('values', 'codes')
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def code(self, value) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+    def __len__(self):
+        return len(self.values)
+
+
+class RowSpill:
+    """Row columns of a CoverageStore in anonymous temp files, read back through memory maps
+
+    Each column is appended to its own file as raw uint32 / float64 values.
+    The files have no name on disk, so the OS deletes them once they are
+    closed or the process exits.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.files = {name: tempfile.TemporaryFile(dir=directory) for name in ROW_COLUMNS}
+        self.rows = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self.rows * ROW_BYTES
+
+    def append(self, columns: Dict[str, object]):
+        """Append equal-length columns (arrays of any kind) for every row column"""
+        for name, file in self.files.items():
+            file.seek(0, os.SEEK_END)
+            file.write(np.ascontiguousarray(columns[name], dtype=ROW_DTYPES[name]))
+        self.rows += len(columns['Section'])
+
+    def column(self, name: str, mode: str = 'r') -> np.ndarray:
+        """Read-only memory map of a whole column (mode 'r+' maps it writable)"""
+        if not self.rows:
+            return np.zeros(0, dtype=ROW_DTYPES[name])
+        file = self.files[name]
+        file.flush()
+        return np.memmap(file, dtype=ROW_DTYPES[name], mode=mode, shape=(self.rows,))
+
+    def close(self):
+        # Maps handed out keep their own handle, so they stay readable
+        for file in self.files.values():
+            file.close()
+
+
+class CoverageStore:
+    """Columnar store of coverage rows
+
+    Rows are appended one file at a time, so every file owns a contiguous
+    span of rows. The file table keeps each span plus the file's interned
+    Device_ID, Date, Filename and Format_Type codes; per row only the Section
+    code (uint32) and Y/M/C/K (float64) are stored.
+
+    Secondary indexes map each header code to the ids of the files carrying
+    it and are kept up to date on append, as is a sorted list of parsed report
+    dates (each date string is parsed once, when it is interned), so filtered
+    selections cost time proportional to the result.
+    NumPy snapshots of the columns are cached until the next change, and
+    version increases with every change.
+
+    Files can be removed again (remove_files): the remaining rows are
+    compacted in one pass and categories no longer used are dropped, so row
+    positions, file ids and category codes all change. rebuild_version is
+    the version of the last removal; structures derived from the store at a
+    version at or after it only need the files appended since, older ones
+    must be rebuilt.
+
+    With a memory_budget (bytes), the row columns stop growing in RAM: once
+    the unspilled rows take more than the budget they are appended to a
+    RowSpill in spill_dir (default: the system temp directory), and the row
+    columns are served as memory maps of those files from then on, so the
+    OS pages them in and out as queries touch them. Per-file data
+    (file table, indexes, categories) always stays in RAM.
+    """
+
+    def __init__(self, memory_budget: Optional[int] = None, spill_dir: Optional[str] = None):
+        self.categories = {name: Categories() for name in CATEGORICAL_COLUMNS}
+        self.file_starts = array('Q')
+        self.file_stops = array('Q')
+        self.file_codes = {name: array('I') for name in HEADER_COLUMNS}
+        self.file_index = {name: {} for name in HEADER_COLUMNS}
+        # Parsed report dates, kept sorted: date_keys[i] is the datetime of Date code date_key_codes[i]
+        self.date_keys = []
+        self.date_key_codes = []
+        # Epoch seconds of every Date code, parsed once when the date is interned (NO_TIMESTAMP if unparseable)
+        self.date_seconds = array('q')
+        # Rows not spilled yet (all rows without a spill)
+        self.section_codes = array('I')
+        self.values = {name: array('d') for name in VALUE_COLUMNS}
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
+        self.spill = None
+        # SHA-256 of each file's raw bytes (None when unknown) and the files carrying each digest
+        self.file_digests = []
+        self.digest_index = {}
+        self._arrays = {}
+        # Bumped on every change so caches built from the store can tell they are stale
+        self.version = 0
+        self.rebuild_version = 0
+
+    def __len__(self):
+        return len(self.section_codes) + (self.spill.rows if self.spill is not None else 0)
+
+    @property
+    def file_count(self) -> int:
+        return len(self.file_starts)
+
+    @property
+    def spilled_bytes(self) -> int:
+        """Size of the row data moved to disk"""
+        return self.spill.nbytes if self.spill is not None else 0
+
+    def spill_rows(self):
+        """Move the rows held in RAM to the spill files (creating them on first use)"""
+        if self.spill is None:
+            self.spill = RowSpill(self.spill_dir)
+        if self.section_codes:
+            self.spill.append({'Section': self.section_codes, **self.values})
+            self.section_codes = array('I')
+            self.values = {name: array('d') for name in VALUE_COLUMNS}
+
+    def close(self):
+        """Delete the spill files; the store must not be used afterwards"""
+        if self.spill is not None:
+            self.spill.close()
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict]) -> 'CoverageStore':
+        """Build a store from row dicts in the legacy all_data shape"""
+        store = cls()
+        header = None
+        batch = []
+        for row in rows:
+            row_header = (row['Device_ID'], row['Date'], row['Filename'], row.get('Format_Type', '4-column'))
+            if row_header != header and batch:
+                store.append_file(*header, batch)
+                batch = []
+            header = row_header
+            batch.append((row['Section'], row['Coverage_Y'], row['Coverage_M'], row['Coverage_C'], row['Coverage_K']))
+        if batch:
+            store.append_file(*header, batch)
+        return store
+
+    def append_file(self, device_id: str, date: Optional[str], filename: str, format_type: str,
+                    rows: List[Tuple], digest: Optional[bytes] = None) -> range:
+        """Append (Section, Y, M, C, K) tuples sharing one file header; returns their row positions
+
+        digest is the content hash of the file's raw bytes, used by
+        files_with_digest.
+        """
+        if not rows:
+            return range(len(self), len(self))
+        sections, y, m, c, k = zip(*rows)
+        return self.append_columns(device_id, date, filename, format_type, sections,
+                                   [array('d', column) for column in (y, m, c, k)], digest)
+
+    def append_batch(self, batch, digest: Optional[bytes] = None) -> range:
+        """Append a record_batch.CoverageBatch whose header is complete; returns its row positions"""
+        header = batch.header
+        return self.append_columns(header.device_id, header.date, header.filename, header.format_type,
+                                   batch.sections, batch.columns(), digest)
+
+    def append_columns(self, device_id: str, date: Optional[str], filename: str, format_type: str,
+                       sections: Sequence[str], columns: List[array], digest: Optional[bytes] = None) -> range:
+        """Append one file's section labels and its Y/M/C/K array('d') columns; returns their row positions"""
+        start = len(self)
+        count = len(sections)
+        if not count:
+            return range(start, start)
+
+        file_id = self.file_count
+        self.file_starts.append(start)
+        self.file_stops.append(start + count)
+        for name, value in zip(HEADER_COLUMNS, (device_id, date, filename, format_type)):
+            categories = self.categories[name]
+            known = len(categories)
+            code = categories.code(value)
+            if name == 'Date' and code == known:
+                self._index_date(value, code)
+            self.file_codes[name].append(code)
+            self.file_index[name].setdefault(code, array('I')).append(file_id)
+        self.file_digests.append(digest)
+        if digest is not None:
+            self.digest_index.setdefault(digest, array('I')).append(file_id)
+
+        section_code = self.categories['Section'].code
+        self.section_codes.extend(array('I', [section_code(section) for section in sections]))
+        for name, column in zip(VALUE_COLUMNS, columns):
+            self.values[name].extend(column)
+        if self.memory_budget is not None and len(self.section_codes) * ROW_BYTES > self.memory_budget:
+            self.spill_rows()
+        self._arrays.clear()
+        self.version += 1
+        return range(start, start + count)
+
+    def files_with_filename(self, filename: str) -> List[int]:
+        """Ids of the files stored under a filename"""
+        code = self.categories['Filename'].codes.get(filename)
+        return [] if code is None else list(self.file_index['Filename'].get(code, ()))
+
+    def files_with_digest(self, digest: bytes) -> List[int]:
+        """Ids of the files whose raw bytes hash to digest"""
+        return list(self.digest_index.get(digest, ()))
+
+    def remove_files(self, file_ids: Iterable[int]) -> int:
+        """Drop whole files and compact the columns; returns the number of rows removed
+
+        Surviving files and categories keep their relative order, so
+        first-appearance ordering is unchanged.
+        """
+        keep = np.ones(self.file_count, dtype=bool)
+        keep[np.fromiter(file_ids, dtype=np.int64)] = False
+        if keep.all():
+            return 0
+
+        starts = self.file_column('start')
+        lengths = self.file_column('stop') - starts
+        removed = int(lengths[~keep].sum())
+        if self.spill is None:
+            keep_rows = np.repeat(keep, lengths)
+            for name in VALUE_COLUMNS:
+                self.values[name] = array('d', self.column(name)[keep_rows].tobytes())
+            section_codes = self.column('Section')[keep_rows]
+            remap = self._renumber('Section', np.bincount(section_codes, minlength=len(self.categories['Section'])) > 0)
+            self.section_codes = array('I', remap[section_codes].astype(np.uint32).tobytes())
+        else:
+            self._compact_spill(np.flatnonzero(keep))
+        lengths = lengths[keep]
+        stops = np.cumsum(lengths)
+        self.file_starts = array('Q', (stops - lengths).astype(np.uint64).tobytes())
+        self.file_stops = array('Q', stops.astype(np.uint64).tobytes())
+
+        # Renumber the header columns to the codes still in use
+        for name in HEADER_COLUMNS:
+            codes = self.file_column(name)[keep]
+            remap = self._renumber(name, np.bincount(codes, minlength=len(self.categories[name])) > 0)
+            self.file_codes[name] = array('I', remap[codes].astype(np.uint32).tobytes())
+
+        self.file_digests = [digest for digest, kept in zip(self.file_digests, keep.tolist()) if kept]
+        self._arrays.clear()
+        self._rebuild_indexes()
+        self.version += 1
+        self.rebuild_version = self.version
+        return removed
+
+    def _renumber(self, name: str, used: np.ndarray) -> np.ndarray:
+        """Keep only the used categories of a column; returns the old code -> new code map"""
+        categories = self.categories[name]
+        remaining = Categories()
+        remaining.values = [categories.values[code] for code in np.flatnonzero(used).tolist()]
+        remaining.codes = dict(zip(remaining.values, range(len(remaining.values))))
+        self.categories[name] = remaining
+        return np.cumsum(used, dtype=np.int64) - 1
+
+    def _compact_spill(self, kept_ids: np.ndarray):
+        """Copy the rows of the kept files to new spill files, a chunk of files at a time
+
+        The old files are only closed afterwards (never truncated), so maps
+        of them handed out before stay valid.
+        """
+        old = {name: self.column(name) for name in ROW_COLUMNS}
+        spill = RowSpill(self.spill_dir)
+        used = np.zeros(len(self.categories['Section']), dtype=bool)
+        for chunk in self.file_chunks(kept_ids, SPILL_CHUNK_ROWS):
+            rows = self.rows_for_files(chunk)
+            columns = {name: old[name][rows] for name in ROW_COLUMNS}
+            used[columns['Section']] = True
+            spill.append(columns)
+        remap = self._renumber('Section', used)
+        section_codes = spill.column('Section', 'r+')
+        for start in range(0, spill.rows, SPILL_CHUNK_ROWS):
+            block = section_codes[start:start + SPILL_CHUNK_ROWS]
+            block[:] = remap[block]
+        if spill.rows:
+            section_codes.flush()
+        self.spill.close()
+        self.spill = spill
+
+    def _rebuild_indexes(self):
+        for name in HEADER_COLUMNS:
+            codes = self.file_column(name)
+            # File ids grouped by code, ascending within each group
+            ids = array('I', np.argsort(codes, kind='stable').astype(np.uint32).tobytes())
+            bounds = np.cumsum(np.bincount(codes, minlength=len(self.categories[name]))).tolist()
+            self.file_index[name] = {code: ids[start:stop] for code, (start, stop) in enumerate(zip([0] + bounds, bounds))}
+        self.digest_index = {}
+        for file_id, digest in enumerate(self.file_digests):
+            if digest is not None:
+                self.digest_index.setdefault(digest, array('I')).append(file_id)
+        self.date_keys = []
+        self.date_key_codes = []
+        self.date_seconds = array('q')
+        for code, date in enumerate(self.categories['Date'].values):
+            self._index_date(date, code)
+
+    def _index_date(self, date: Optional[str], code: int):
+        # Called once per Date code, in code order
+        parsed = parse_report_date(date)
+        self.date_seconds.append(NO_TIMESTAMP if parsed is None else to_seconds(parsed))
+        if parsed is not None:
+            position = bisect.bisect_right(self.date_keys, parsed)
+            self.date_keys.insert(position, parsed)
+            self.date_key_codes.insert(position, code)
+
+    def _snapshot(self, key: str, source, dtype) -> np.ndarray:
+        cached = self._arrays.get(key)
+        if cached is None:
+            # Copy rather than share the buffer: an exported array.array cannot grow
+            cached = np.array(source, dtype=dtype)
+            self._arrays[key] = cached
+        return cached
+
+    def file_column(self, name: str) -> np.ndarray:
+        """Per-file header codes (or 'start'/'stop' row spans) as a cached NumPy array"""
+        if name == 'start':
+            return self._snapshot('file:start', self.file_starts, np.int64)
+        if name == 'stop':
+            return self._snapshot('file:stop', self.file_stops, np.int64)
+        return self._snapshot('file:' + name, self.file_codes[name], np.uint32)
+
+    def file_timestamps(self) -> np.ndarray:
+        """Report time of every file as int64 epoch seconds (NO_TIMESTAMP when the date does not parse)"""
+        cached = self._arrays.get('file:timestamp')
+        if cached is None:
+            seconds = self._snapshot('date:seconds', self.date_seconds, np.int64)
+            cached = seconds[self.file_column('Date')]
+            self._arrays['file:timestamp'] = cached
+        return cached
+
+    def column(self, name: str) -> np.ndarray:
+        """Per-row codes or values as a cached NumPy array (a memory map for spilled row columns)"""
+        if self.spill is not None and name in ROW_DTYPES:
+            cached = self._arrays.get(name)
+            if cached is None:
+                # Spill the rows still in RAM so the column is one contiguous map
+                self.spill_rows()
+                cached = self._arrays[name] = self.spill.column(name)
+            return cached
+        if name == 'Section':
+            return self._snapshot(name, self.section_codes, np.uint32)
+        if name in self.values:
+            return self._snapshot(name, self.values[name], np.float64)
+        cached = self._arrays.get(name)
+        if cached is None:
+            lengths = self.file_column('stop') - self.file_column('start')
+            cached = np.repeat(self.file_column(name), lengths)
+            self._arrays[name] = cached
+        return cached
+
+    def row_slice(self, name: str, start: int, stop: int) -> np.ndarray:
+        """Rows [start, stop) of a row column, read without snapshotting the whole column"""
+        if self.spill is not None:
+            return np.array(self.column(name)[start:stop])
+        source = self.section_codes if name == 'Section' else self.values[name]
+        return np.array(source[start:stop], dtype=ROW_DTYPES[name])
+
+    def decode(self, name: str, codes: np.ndarray) -> list:
+        """Map category codes back to their values"""
+        values = self.categories[name].values
+        return [values[code] for code in codes.tolist()]
+
+    def codes_where(self, name: str, predicate) -> List[int]:
+        """Codes of the categories of a column whose value satisfies predicate"""
+        return [code for code, value in enumerate(self.categories[name].values) if predicate(value)]
+
+    def date_codes(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[int]:
+        """Date codes whose parsed datetime lies in [start, end]; either bound may be None"""
+        low = 0 if start is None else bisect.bisect_left(self.date_keys, start)
+        high = len(self.date_keys) if end is None else bisect.bisect_right(self.date_keys, end)
+        return self.date_key_codes[low:high]
+
+    def select_files(self, criteria: Dict[str, Iterable[int]]) -> np.ndarray:
+        """Sorted ids of the files whose header code is among the given codes for every column
+
+        Only the smallest index entry is expanded; the other columns are
+        checked against the file table for those candidates.
+        """
+        criteria = {name: list(codes) for name, codes in criteria.items()}
+        index_sizes = {
+            name: sum(len(self.file_index[name].get(code, ())) for code in codes)
+            for name, codes in criteria.items()
+        }
+        smallest = min(index_sizes, key=index_sizes.get)
+        lists = [self.file_index[smallest][code] for code in criteria[smallest] if code in self.file_index[smallest]]
+        if not lists:
+            return np.zeros(0, dtype=np.int64)
+        file_ids = np.concatenate([np.array(ids, dtype=np.int64) for ids in lists])
+        if len(lists) > 1:
+            file_ids.sort()
+        for name, codes in criteria.items():
+            if name != smallest:
+                file_ids = file_ids[np.isin(self.file_column(name)[file_ids], codes)]
+        return file_ids
+
+    def rows_for_files(self, file_ids: np.ndarray) -> np.ndarray:
+        """Row positions of the given files, in file order"""
+        starts = self.file_column('start')[file_ids]
+        lengths = self.file_column('stop')[file_ids] - starts
+        offsets = np.cumsum(lengths) - lengths
+        return np.arange(int(lengths.sum()), dtype=np.int64) + np.repeat(starts - offsets, lengths)
+
+    def file_chunks(self, file_ids: np.ndarray, max_rows: int) -> List[np.ndarray]:
+        """Split file_ids into consecutive runs of about max_rows rows (at least one file each)"""
+        if not len(file_ids):
+            return []
+        lengths = (self.file_column('stop') - self.file_column('start'))[file_ids]
+        chunk_numbers = (np.cumsum(lengths) - lengths) // max_rows
+        return np.split(file_ids, np.flatnonzero(np.diff(chunk_numbers)) + 1)
+
+    def view(self, indices: Optional[np.ndarray] = None, file_ids: Optional[np.ndarray] = None) -> 'CoverageView':
+        return CoverageView(self, indices, file_ids)
+
+    def files_view(self, file_ids: np.ndarray) -> 'CoverageView':
+        """View over whole files"""
+        return CoverageView(self, file_ids=file_ids)
+
+
+class CoverageView:
+    """A selection of store rows; iterating yields row dicts in the legacy all_data shape
+
+    indices None (and no file_ids) means every row. file_ids is set when
+    the selection is made of whole files, which lets header-column queries
+    work on the file table; the row positions of such a view are only
+    computed when something needs them.
+    """
+
+    def __init__(self, store: CoverageStore, indices: Optional[np.ndarray] = None,
+                 file_ids: Optional[np.ndarray] = None):
+        self.store = store
+        self._indices = indices
+        self.file_ids = file_ids
+
+    @property
+    def indices(self) -> Optional[np.ndarray]:
+        if self._indices is None and self.file_ids is not None:
+            self._indices = self.store.rows_for_files(self.file_ids)
+        return self._indices
+
+    def files(self) -> Optional[np.ndarray]:
+        """Ids of the files making up the view, or None when it selects single rows"""
+        if self.file_ids is not None:
+            return self.file_ids
+        if self._indices is None:
+            return np.arange(self.store.file_count)
+        return None
+
+    def __len__(self):
+        if self._indices is None and self.file_ids is not None:
+            store = self.store
+            return int((store.file_column('stop')[self.file_ids] - store.file_column('start')[self.file_ids]).sum())
+        return len(self.store) if self.indices is None else len(self.indices)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def column(self, name: str) -> np.ndarray:
+        data = self.store.column(name)
+        return data if self.indices is None else data[self.indices]
+
+    def positions(self) -> np.ndarray:
+        return np.arange(len(self.store)) if self.indices is None else self.indices
+
+    def decoded(self, name: str) -> list:
+        return self.store.decode(name, self.column(name))
+
+    def unique(self, name: str) -> list:
+        """Distinct values of a categorical column present in this view"""
+        categories = self.store.categories[name]
+        if self._indices is None and self.file_ids is None:
+            # Every interned category has at least one row
+            return list(categories.values)
+        if name in HEADER_COLUMNS and self.file_ids is not None:
+            codes = self.store.file_column(name)[self.file_ids]
+        else:
+            codes = self.column(name)
+        present = np.flatnonzero(np.bincount(codes, minlength=len(categories)))
+        return self.store.decode(name, present)
+
+    def select(self, mask: np.ndarray) -> 'CoverageView':
+        return CoverageView(self.store, self.positions()[mask])
+
+    def __iter__(self) -> Iterator[Dict]:
+        columns = [self.decoded(name) for name in CATEGORICAL_COLUMNS]
+        columns += [self.column(name).tolist() for name in VALUE_COLUMNS]
+        for values in zip(*columns):
+            yield dict(zip(COLUMNS, values))
+
+    def to_frame(self) -> pd.DataFrame:
+        """DataFrame with categorical string columns and float64 coverage columns"""
+        data = {}
+        for name in CATEGORICAL_COLUMNS:
+            categories = self.store.categories[name].values
+            codes = self.column(name).astype(np.int64)
+            if None in self.store.categories[name].codes:
+                # pandas categories cannot hold None; use code -1 (missing) instead
+                none_code = self.store.categories[name].codes[None]
+                codes = np.where(codes == none_code, -1, codes - (codes > none_code))
+                categories = [value for value in categories if value is not None]
+            data[name] = pd.Categorical.from_codes(codes, categories=pd.Index(categories, dtype=object))
+        for name in VALUE_COLUMNS:
+            data[name] = self.column(name)
+        return pd.DataFrame(data, columns=list(COLUMNS))
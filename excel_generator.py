@@ -1,149 +1,782 @@
+import numpy as np
 import pandas as pd
-from typing import List, Dict
+from typing import BinaryIO, Hashable, Iterable, Iterator, List, Dict, Optional, Sequence, Tuple
+import csv
 import io
+import os
+import re
+import importlib.util
+import tempfile
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from openpyxl import Workbook
+from datetime import date, datetime, time
+from time import perf_counter
+from artifact_cache import ArtifactCache, VersionedMemo
+from record_batch import CoverageBatch, ReportHeader
+from running_stats import CHANNELS, FOLD_ROWS, CoverageAggregates, is_total_section, stored_channels
+from section_pivot import DEFAULT_PERCENTILES, SectionPivot, build_section_pivot, pivot_sheet_rows
+from report_formats import REPORT_FORMATS
+from coverage_store import NO_TIMESTAMP, VALUE_COLUMNS, CoverageStore, CoverageView
+from text_extractor import parse_report_date
+from timeseries import ReportTimeline
+
+
+def date_span(value) -> Optional[Tuple[datetime, datetime]]:
+    """Inclusive datetime span covered by a date filter value, or None if it is not a date
+
+    A datetime or 'dd/mm/yyyy hh:mm' string is a single instant; a date or
+    'dd/mm/yyyy' string covers the whole day.
+    """
+    if isinstance(value, datetime):
+        return value, value
+    if isinstance(value, date):
+        return datetime.combine(value, time.min), datetime.combine(value, time.max)
+    parsed = parse_report_date(value) if isinstance(value, str) else None
+    if parsed is None:
+        return None
+    if len(value.split()) > 1:
+        return parsed, parsed
+    return parsed, datetime.combine(parsed.date(), time.max)
+
+
+# Streamed workbooks stay in memory up to this size, then spill to a temp file
+EXCEL_SPOOL_MAX_BYTES = 16 * 1024 * 1024
+SHEET_NAME_INVALID = re.compile(r'[\[\]:*?/\\]')
+# Flat table exports: format -> (file extension, MIME type); parquet and feather need the optional pyarrow
+TABLE_FORMATS = {
+    'csv': ('csv', 'text/csv'),
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'feather': ('arrow', 'application/vnd.apache.arrow.file')
+}
+# 'device': one row per section with Y/M/C/K columns, grouped by device in workbook sheet order
+# 'tidy': one row per (section, channel) observation
+TABLE_LAYOUTS = ('device', 'tidy')
+# Device workbook bundles: manifest entry, and shards kept in flight per pool worker
+BUNDLE_MANIFEST = 'index.csv'
+BUNDLE_WINDOW_PER_WORKER = 4
+FILE_NAME_INVALID = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+FLEET_SUMMARY_SHEET = 'Fleet Summary'
+
+
+def available_table_formats() -> List[str]:
+    """Table export formats usable here (csv always, parquet and feather when pyarrow is installed)"""
+    if importlib.util.find_spec('pyarrow') is None:
+        return ['csv']
+    return list(TABLE_FORMATS)
+
+
+def output_position(output: BinaryIO) -> Optional[int]:
+    """Current offset of a binary output, or None for unseekable streams"""
+    try:
+        return output.tell()
+    except (AttributeError, OSError):
+        return None
+
+
+def unique_sheet_name(device_id: str, used_names: set) -> str:
+    """Excel-safe sheet name (31 chars, no []:*?/\\) not yet in used_names, which is updated"""
+    base = SHEET_NAME_INVALID.sub('_', str(device_id))[:31] or 'Sheet'
+    name = base
+    suffix = 1
+    while name.lower() in used_names:
+        suffix += 1
+        tag = f"~{suffix}"
+        name = base[:31 - len(tag)] + tag
+    used_names.add(name.lower())
+    return name
+
+
+def unique_file_name(stem: str, used_names: set, extension: str) -> str:
+    """Portable file name (stem up to 100 chars) not yet in used_names (case-insensitive), which is updated"""
+    base = FILE_NAME_INVALID.sub('_', str(stem)).strip(' .')[:100] or 'device'
+    name = base
+    suffix = 1
+    while name.lower() in used_names:
+        suffix += 1
+        name = f"{base}~{suffix}"
+    used_names.add(name.lower())
+    return name + extension
+
+
+def _build_bundle_workbook(groups: List[Tuple[str, Dict, List[Tuple]]]) -> Tuple[bytes, List[str]]:
+    """One workbook of a device bundle and its sheet names (runs in a pool worker)"""
+    output = io.BytesIO()
+    sheet_names = ExcelGenerator.write_device_groups(output, groups)
+    return output.getvalue(), sheet_names
+
 
 class ExcelGenerator:
-    def __init__(self):
-        self.all_data = []
+    def __init__(self, memory_budget: Optional[int] = None, spill_dir: Optional[str] = None):
+        """memory_budget (bytes) spills coverage rows past it to temp files in spill_dir (see CoverageStore)"""
+        self.store = CoverageStore(memory_budget, spill_dir)
+        # Running Y/M/C/K statistics per device, section and format, updated on every add
+        self.aggregates = CoverageAggregates(self.store)
+        # Reports sorted by (device, report time), for latest-report and history queries
+        self.timeline = ReportTimeline(self.store)
+        self.excel_cache = ArtifactCache()
+        self._excel_cache_version = self.store.version
+        # Filter options, views, previews and pivots of the current data version (see memoized)
+        self.derived = VersionedMemo()
+        # Optional instrumentation.Instrumentation; workbook exports are recorded as 'excel_export' batches
+        self.instrumentation = None
+    
+    @property
+    def data_version(self) -> int:
+        """Increases whenever files are added or removed, so derived artifacts can be invalidated"""
+        return self.store.version
+    
+    @property
+    def all_data(self) -> List[Dict]:
+        """All rows as dicts (materialized on every access; prefer apply_filters views)"""
+        return list(self.store.view())
+    
+    def _as_view(self, filtered_data=None) -> CoverageView:
+        """Accept None (all rows), a CoverageView or a legacy list of row dicts"""
+        if filtered_data is None:
+            return self.store.view()
+        if isinstance(filtered_data, CoverageView):
+            return filtered_data
+        return CoverageStore.from_rows(filtered_data).view()
     
     def add_machine_data(self, machine_data: Dict):
         """Add data from a single machine to the collection"""
-        device_id = machine_data['device_id']
-        date = machine_data['date']
-        filename = machine_data['filename']
-        format_type = machine_data.get('format_type', '4-column')
-        
-        for coverage_row in machine_data['coverage_data']:
-            row = {
-                'Device_ID': device_id,
-                'Date': date,
-                'Filename': filename,
-                'Format_Type': format_type,
-                'Section': coverage_row['Section'],
-                'Coverage_Y': coverage_row['Coverage_Y'],
-                'Coverage_M': coverage_row['Coverage_M'],
-                'Coverage_C': coverage_row['Coverage_C'],
-                'Coverage_K': coverage_row['Coverage_K']
-            }
-            self.all_data.append(row)
+        header = ReportHeader(
+            machine_data['device_id'],
+            machine_data['date'],
+            machine_data['filename'],
+            machine_data.get('format_type', '4-column')
+        )
+        self.add_batch(CoverageBatch.from_coverage_data(header, machine_data['coverage_data']))
+    
+    def add_batch(self, batch: CoverageBatch, digest: Optional[bytes] = None):
+        """Add one file's CoverageBatch (header complete: filename and fallbacks applied) to the collection"""
+        self.store.append_batch(batch, digest)
+        if self.aggregates.pending_rows >= FOLD_ROWS:
+            self.aggregates.fold()
+    
+    def add_coverage_rows(self, device_id: str, date: Optional[str], filename: str, format_type: str, rows: List[Tuple],
+                          digest: Optional[bytes] = None):
+        """Add (Section, Y, M, C, K) tuples for one file to the collection"""
+        self.store.append_file(device_id, date, filename, format_type, rows, digest)
+        if self.aggregates.pending_rows >= FOLD_ROWS:
+            self.aggregates.fold()
+    
+    def remove_files(self, filenames: Iterable[str] = (), digests: Iterable[bytes] = ()) -> int:
+        """Remove every file stored under one of the filenames or content digests; returns the file count"""
+        file_ids = set()
+        for filename in filenames:
+            file_ids.update(self.store.files_with_filename(filename))
+        for digest in digests:
+            file_ids.update(self.store.files_with_digest(digest))
+        self.remove_file_ids(file_ids)
+        return len(file_ids)
+    
+    def remove_file_ids(self, file_ids: Iterable[int]):
+        """Remove files by store file id in one compaction (ids are renumbered afterwards)"""
+        file_ids = list(file_ids)
+        if file_ids:
+            self.store.remove_files(file_ids)
+    
+    def get_loaded_files(self) -> List[str]:
+        """Filenames currently in the collection, in load order"""
+        return list(self.store.categories['Filename'].values)
     
-    def apply_filters(self, device_filter=None, date_filter=None):
-        """Apply filters to the data"""
-        filtered_data = self.all_data.copy()
+    def has_file(self, filename: str, digest: bytes) -> bool:
+        """Whether a file with this name and content digest is already in the collection"""
+        store = self.store
+        code = store.categories['Filename'].codes.get(filename)
+        if code is None:
+            return False
+        filename_codes = store.file_codes['Filename']
+        return any(filename_codes[file_id] == code for file_id in store.files_with_digest(digest))
+    
+    def apply_filters(self, device_filter=None, date_filter=None, format_filter=None, date_range=None,
+                      latest_only: bool = False) -> CoverageView:
+        """Apply filters to the data
+
+        date_filter selects one report date: a date string such as
+        '30/11/2024 14:56' (a date-only string or a date object selects the
+        whole day) or a datetime. date_range is an inclusive (start, end)
+        pair of the same kinds; either end may be None (or empty) for an
+        open range, and a bound that is not a date raises ValueError.
+        latest_only keeps only the latest of each device's matching reports.
+        """
+        store = self.store
+        criteria = {}
         
         if device_filter:
-            filtered_data = [row for row in filtered_data if row['Device_ID'] == device_filter]
+            criteria['Device_ID'] = self._codes_for('Device_ID', device_filter)
         
         if date_filter:
-            filtered_data = [row for row in filtered_data if date_filter in str(row['Date'])]
+            codes = set(self._codes_for('Date', date_filter))
+            span = date_span(date_filter)
+            if span:
+                codes.update(store.date_codes(*span))
+            criteria['Date'] = codes
+        
+        if date_range:
+            start, end = (self._range_bound(bound) for bound in date_range)
+            codes = set(store.date_codes(start[0] if start else None, end[1] if end else None))
+            criteria['Date'] = codes & criteria['Date'] if 'Date' in criteria else codes
+        
+        if format_filter:
+            criteria['Format_Type'] = self._codes_for('Format_Type', format_filter)
+        
+        if latest_only:
+            return store.files_view(self.timeline.latest(store.select_files(criteria) if criteria else None))
+        if not criteria:
+            return store.view()
+        return store.files_view(store.select_files(criteria))
+    
+    @staticmethod
+    def _range_bound(bound) -> Optional[Tuple[datetime, datetime]]:
+        """Span of a date_range bound; None or an empty bound leaves that end open"""
+        if bound is None or bound == '':
+            return None
+        span = date_span(bound)
+        if span is None:
+            raise ValueError(f"Invalid date range bound: {bound!r}")
+        return span
+    
+    def _codes_for(self, name: str, value) -> List[int]:
+        code = self.store.categories[name].codes.get(value)
+        return [] if code is None else [code]
+    
+    def _device_row_groups(self, filtered_data=None) -> Iterator[Tuple[str, Dict, np.ndarray]]:
+        """Yield (device_id, header, row positions) per device in first-appearance order
+        
+        Views made of whole files are grouped on the file table, so only one
+        device's row positions exist at a time (the rows of a spilled store
+        are then read device by device).
+        """
+        view = self._as_view(filtered_data)
+        if not view:
+            return
+        store = view.store
+        file_ids = view.files()
+        if file_ids is not None:
+            device_codes = store.file_column('Device_ID')[file_ids]
+            header_column = store.file_column
+        else:
+            positions = view.positions()
+            device_codes = view.column('Device_ID')
+            header_column = store.column
+        order = np.argsort(device_codes, kind='stable')
+        groups = np.split(order, np.flatnonzero(np.diff(device_codes[order])) + 1)
+        groups.sort(key=lambda group: group[0])
+        
+        for group in groups:
+            if file_ids is not None:
+                first = file_ids[group[:1]]
+                rows = store.rows_for_files(file_ids[group])
+            else:
+                rows = positions[group]
+                first = rows[:1]
+            header = {
+                'date': store.decode('Date', header_column('Date')[first])[0],
+                'filename': store.decode('Filename', header_column('Filename')[first])[0],
+                'format_type': store.decode('Format_Type', header_column('Format_Type')[first])[0]
+            }
+            yield store.decode('Device_ID', device_codes[group[:1]])[0], header, rows
+    
+    @staticmethod
+    def _section_tuples(store: CoverageStore, rows: np.ndarray) -> List[Tuple]:
+        return list(zip(
+            store.decode('Section', store.column('Section')[rows]),
+            store.column('Coverage_Y')[rows].tolist(),
+            store.column('Coverage_M')[rows].tolist(),
+            store.column('Coverage_C')[rows].tolist(),
+            store.column('Coverage_K')[rows].tolist()
+        ))
+    
+    def iter_device_groups(self, filtered_data=None) -> Iterator[Tuple[str, Dict, List[Tuple]]]:
+        """Yield (device_id, header, section rows) per device in first-appearance order
+
+        The header (date, filename, format_type) comes from the device's first
+        row; section rows are (Section, Y, M, C, K) tuples in row order.
+        """
+        view = self._as_view(filtered_data)
+        for device_id, header, rows in self._device_row_groups(view):
+            yield device_id, header, self._section_tuples(view.store, rows)
+    
+    def get_device_previews(self, filtered_data=None, max_rows: int = 20) -> List[Dict]:
+        """Per-device sheet previews built from the store, without generating a workbook
+
+        Each preview has the sheet_name used by the streamed workbook, the
+        six header rows, the device's Total row (the last one, if several
+        reports were merged), the first max_rows non-Total section rows,
+        section_count (the number of non-Total rows on the full sheet) and
+        the Y/M/C/K averages of the visible rows.
+        """
+        view = self._as_view(filtered_data)
+        store = view.store
+        total_codes = self._total_codes()
+        previews = []
+        used_names = set()
         
-        return filtered_data
+        for device_id, header, rows in self._device_row_groups(view):
+            is_total = np.isin(store.column('Section')[rows], total_codes)
+            section_rows = rows[~is_total]
+            total_rows = rows[is_total][-1:]
+            visible_rows = section_rows[:max_rows]
+            sheet_rows = self.device_sheet_rows(
+                device_id, header, self._section_tuples(store, np.concatenate([total_rows, visible_rows]))
+            )
+            previews.append({
+                'sheet_name': unique_sheet_name(device_id, used_names),
+                'device_id': device_id,
+                'format_type': header['format_type'],
+                'header_rows': sheet_rows[:6],
+                'total_row': sheet_rows[6] if len(total_rows) else None,
+                'rows': sheet_rows[6 + len(total_rows):],
+                'section_count': len(section_rows),
+                'averages': self._channel_means(store, visible_rows)
+            })
+        return previews
+    
+    def _total_codes(self) -> List[int]:
+        return self.store.codes_where('Section', is_total_section)
+    
+    @staticmethod
+    def _channel_means(store: CoverageStore, rows: np.ndarray) -> Dict[str, float]:
+        """Mean of each coverage channel over the given rows, skipping NaN and channels a row's format does not store"""
+        means = {}
+        stored = stored_channels(store, store.column('Format_Type')[rows].astype(np.int64))
+        for index, (channel, name) in enumerate(zip(CHANNELS, VALUE_COLUMNS)):
+            values = store.column(name)[rows][stored[:, index]]
+            values = values[~np.isnan(values)]
+            if len(values):
+                means[channel] = float(values.mean())
+        return means
+    
+    def get_averages(self, filtered_data=None) -> Dict[str, float]:
+        """Mean Y/M/C/K over the non-Total section rows of filtered data"""
+        if filtered_data is None:
+            stats = self.aggregates.get('format')
+            return {channel: mean for channel, mean, count in zip(CHANNELS, stats.mean, stats.count) if count}
+        view = self._as_view(filtered_data)
+        section_rows = view.positions()[~np.isin(view.column('Section'), self._total_codes())]
+        return self._channel_means(view.store, section_rows)
+    
+    def get_coverage_stats(self, scope: str, key=None) -> Dict[str, Dict[str, float]]:
+        """Running count/sum/mean/min/max/variance per channel for a device, section or format
+
+        scope is 'device', 'section' or 'format'; key None merges every key
+        of the scope. Unknown keys give an empty dict.
+        """
+        stats = self.aggregates.get(scope, key)
+        return stats.as_dict() if stats is not None else {}
+    
+    def get_section_pivot(self, filtered_data=None, percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> SectionPivot:
+        """Devices x sections mean coverage per channel, with fleet mean and percentile rows (see section_pivot)"""
+        return build_section_pivot(self._as_view(filtered_data), percentiles)
+    
+    @staticmethod
+    def device_sheet_rows(device_id: str, device_data: Dict, sections: List[Tuple]) -> List[List]:
+        """Header block plus section rows for one device sheet"""
+        # Determine the format type for this device
+        format_type = device_data.get('format_type', '4-column')
+        
+        # Create header information
+        header_info = [
+            ['Device ID:', device_id],
+            ['Date:', str(device_data['date']) if device_data['date'] else 'N/A'],
+            ['Filename:', device_data['filename']],
+            ['Format:', format_type],
+            [''],  # Empty row
+        ]
+        
+        # Add the format's column headers and the channels it stores
+        labels, positions = REPORT_FORMATS.sheet_columns(format_type)
+        header_info.append(['Section', *labels])
+        if len(positions) == len(CHANNELS):
+            section_data = [list(section) for section in sections]
+        else:
+            section_data = [[section[0], *(section[1 + i] for i in positions)] for section in sections]
+        
+        # Combine header and data
+        return header_info + section_data
     
     def generate_excel_with_device_headers(self, filtered_data=None) -> bytes:
         """Generate Excel file with individual device sheets only"""
-        data_to_use = filtered_data if filtered_data is not None else self.all_data
+        output = io.BytesIO()
+        self.write_excel_with_device_headers(output, filtered_data)
+        return output.getvalue()
+    
+    def write_excel_with_device_headers(self, output: BinaryIO, filtered_data=None, fleet_summary: bool = False):
+        """Write the per-device workbook to a binary file with openpyxl's write-only mode
+
+        Rows go from the store straight into worksheet streams, so memory
+        does not grow with the number of devices. Sheet names are made
+        unique instead of letting truncated device IDs overwrite each other.
+        fleet_summary puts a section pivot sheet (get_section_pivot) first.
+        """
+        instrumentation = self.instrumentation
+        if instrumentation is not None:
+            with instrumentation.batch('excel_export'):
+                return self._write_workbook(output, filtered_data, fleet_summary, instrumentation)
+        self._write_workbook(output, filtered_data, fleet_summary)
+    
+    def _write_workbook(self, output: BinaryIO, filtered_data=None, fleet_summary: bool = False, instrumentation=None):
+        view = self._as_view(filtered_data)
+        summary_rows = None
+        if fleet_summary and view:
+            start = perf_counter()
+            summary_rows = pivot_sheet_rows(self.get_section_pivot(view))
+            if instrumentation is not None:
+                instrumentation.record('excel_pivot', perf_counter() - start)
+        self.write_device_groups(output, self.iter_device_groups(view), instrumentation, summary_rows)
+    
+    def write_fleet_summary(self, output: BinaryIO, filtered_data=None, percentiles: Sequence[float] = DEFAULT_PERCENTILES):
+        """Write a workbook holding only the fleet section pivot sheet"""
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet(title=FLEET_SUMMARY_SHEET)
+        for row in pivot_sheet_rows(self.get_section_pivot(filtered_data, percentiles)):
+            worksheet.append(row)
+        workbook.save(output)
+    
+    @classmethod
+    def write_device_groups(cls, output: BinaryIO, groups: Iterable[Tuple[str, Dict, List[Tuple]]],
+                            instrumentation=None, summary_rows: Optional[List[List]] = None) -> List[str]:
+        """Write one sheet per iter_device_groups item to a workbook; returns the sheet names
+
+        summary_rows, if given, are written to a first sheet named FLEET_SUMMARY_SHEET.
+        """
+        workbook = Workbook(write_only=True)
+        used_names = set()
+        sheet_names = []
+        clock = perf_counter
+        if summary_rows is not None:
+            start = clock()
+            used_names.add(FLEET_SUMMARY_SHEET.lower())
+            worksheet = workbook.create_sheet(title=FLEET_SUMMARY_SHEET)
+            for row in summary_rows:
+                worksheet.append(row)
+            worksheet.close()
+            if instrumentation is not None:
+                instrumentation.record('excel_summary', clock() - start)
+        start = clock()
+        for device_id, device_data, sections in groups:
+            rows = cls.device_sheet_rows(device_id, device_data, sections)
+            if instrumentation is not None:
+                built = clock()
+                instrumentation.record('excel_rows', built - start)
+            sheet_names.append(unique_sheet_name(device_id, used_names))
+            worksheet = workbook.create_sheet(title=sheet_names[-1])
+            for row in rows:
+                worksheet.append(row)
+            # Flush the sheet to its temp file now so per-sheet writer state is released
+            worksheet.close()
+            if instrumentation is not None:
+                start = clock()
+                instrumentation.record('excel_write', start - built)
+        
+        if not used_names:
+            worksheet = workbook.create_sheet(title='No_Data')
+            worksheet.append(['Section', 'Coverage'])
+        
+        if instrumentation is not None:
+            start = clock()
+            position = output_position(output)
+        workbook.save(output)
+        if instrumentation is not None:
+            end = output_position(output)
+            size = end - position if end is not None and position is not None else 0
+            instrumentation.record('excel_save', clock() - start, size)
+        return sheet_names
+    
+    def stream_excel_with_device_headers(self, filtered_data=None, fleet_summary: bool = False) -> BinaryIO:
+        """Per-device workbook in a spooled temp file, rewound and ready to read"""
+        output = tempfile.SpooledTemporaryFile(max_size=EXCEL_SPOOL_MAX_BYTES)
+        self.write_excel_with_device_headers(output, filtered_data, fleet_summary)
+        output.seek(0)
+        return output
+    
+    def _cached_artifact(self, key: Tuple, build) -> bytes:
+        """Artifact cached under key plus the data version"""
+        version = self.data_version
+        if version != self._excel_cache_version:
+            # Entries for older versions can never hit again
+            self.excel_cache.clear()
+            self._excel_cache_version = version
+        return self.excel_cache.get_or_build(key + (version,), build)
+    
+    def memoized(self, key: Hashable, build):
+        """build() memoized under key until the data version changes
+
+        For results of the current data that are rebuilt on every UI rerun
+        (device and date lists, format views, previews); key must cover
+        every argument build depends on.
+        """
+        return self.derived.get_or_build(self.data_version, key, build)
+    
+    def get_excel_bytes(self, format_filter=None, device_filter=None, date_filter=None, latest_only: bool = False,
+                        fleet_summary: bool = False) -> bytes:
+        """Streamed per-device workbook for the filters, cached by (format, device, date, latest, summary, data version)"""
+        def build() -> bytes:
+            filtered_data = self.apply_filters(device_filter, date_filter, format_filter, latest_only=latest_only)
+            with self.stream_excel_with_device_headers(filtered_data, fleet_summary) as output:
+                return output.read()
+        
+        return self._cached_artifact((format_filter, device_filter, date_filter, latest_only, fleet_summary), build)
+    
+    def iter_excel_bytes(self, filtered_data=None, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """Per-device workbook as a sequence of byte chunks"""
+        with self.stream_excel_with_device_headers(filtered_data) as output:
+            while True:
+                chunk = output.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+    
+    def _device_ordered_positions(self, view: CoverageView) -> np.ndarray:
+        """Row positions of a view grouped by device, devices in first-appearance (sheet) order"""
+        positions = view.positions()
+        device_codes = view.column('Device_ID')
+        codes, first_rows = np.unique(device_codes, return_index=True)
+        first_seen = np.zeros(len(view.store.categories['Device_ID']), dtype=np.int64)
+        first_seen[codes] = first_rows
+        return positions[np.argsort(first_seen[device_codes], kind='stable')]
+    
+    def table_frame(self, filtered_data=None, layout: str = 'device') -> pd.DataFrame:
+        """Filtered rows as one flat DataFrame for CSV / Parquet / Feather export
+
+        The 'device' layout has the CoverageView.to_frame columns, one row per
+        section, grouped by device in workbook sheet order. The 'tidy' layout
+        has the categorical columns plus Channel (Y/M/C/K) and Coverage, one
+        row per value: reports contribute only the channels their format
+        stores (a 1-column report its single value, stored as Y) and NaN
+        values are left out.
+        """
+        if layout not in TABLE_LAYOUTS:
+            raise ValueError(f"Unknown table layout {layout!r}; expected one of: {', '.join(TABLE_LAYOUTS)}")
+        view = self._as_view(filtered_data)
+        store = view.store
+        positions = self._device_ordered_positions(view)
+        if layout == 'device':
+            return store.view(positions).to_frame()
+        
+        values = np.column_stack([store.column(name)[positions] for name in VALUE_COLUMNS])
+        keep = ~np.isnan(values)
+        format_codes = store.column('Format_Type')[positions]
+        for code, format_type in enumerate(store.categories['Format_Type'].values):
+            stored = REPORT_FORMATS.sheet_columns(format_type)[1]
+            if len(stored) < len(CHANNELS):
+                dropped = [i for i in range(len(CHANNELS)) if i not in stored]
+                keep[np.ix_(format_codes == code, dropped)] = False
+        # Row-major: each row's channels stay together, in Y/M/C/K order
+        rows, channels = np.nonzero(keep)
+        frame = store.view(positions[rows]).to_frame().drop(columns=list(VALUE_COLUMNS))
+        frame['Channel'] = pd.Categorical.from_codes(channels, categories=list(CHANNELS))
+        frame['Coverage'] = values[rows, channels]
+        return frame
+    
+    def write_table(self, output: BinaryIO, file_format: str = 'csv', filtered_data=None, layout: str = 'device'):
+        """Write filtered rows as CSV, Parquet or Arrow IPC (Feather) to a binary file (see table_frame)"""
+        if file_format not in TABLE_FORMATS:
+            raise ValueError(f"Unknown table format {file_format!r}; expected one of: {', '.join(TABLE_FORMATS)}")
+        if file_format not in available_table_formats():
+            raise ImportError(f"{file_format} export needs pyarrow (pip install pyarrow)")
+        if layout not in TABLE_LAYOUTS:
+            raise ValueError(f"Unknown table layout {layout!r}; expected one of: {', '.join(TABLE_LAYOUTS)}")
+        instrumentation = self.instrumentation
+        if instrumentation is not None:
+            with instrumentation.batch('table_export'):
+                return self._write_table(output, file_format, filtered_data, layout, instrumentation)
+        self._write_table(output, file_format, filtered_data, layout)
+    
+    def _write_table(self, output: BinaryIO, file_format: str, filtered_data=None, layout: str = 'device',
+                     instrumentation=None):
+        start = perf_counter()
+        frame = self.table_frame(filtered_data, layout)
+        if instrumentation is not None:
+            built = perf_counter()
+            instrumentation.record('table_frame', built - start)
+            position = output_position(output)
+        
+        if file_format == 'csv':
+            frame.to_csv(output, index=False, encoding='utf-8')
+        elif file_format == 'parquet':
+            frame.to_parquet(output, index=False)
+        else:
+            frame.to_feather(output)
         
-        if not data_to_use:
-            # Create empty DataFrame with basic structure
+        if instrumentation is not None:
+            end = output_position(output)
+            size = end - position if end is not None and position is not None else 0
+            instrumentation.record('table_write', perf_counter() - built, size)
+    
+    def get_table_bytes(self, file_format: str = 'csv', layout: str = 'device', format_filter=None,
+                        device_filter=None, date_filter=None, latest_only: bool = False) -> bytes:
+        """Table export for the filters, cached alongside the workbooks until the data changes"""
+        def build() -> bytes:
             output = io.BytesIO()
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                df = pd.DataFrame(columns=['Section', 'Coverage'])
-                df.to_excel(writer, sheet_name='No_Data', index=False)
+            filtered_data = self.apply_filters(device_filter, date_filter, format_filter, latest_only=latest_only)
+            self.write_table(output, file_format, filtered_data, layout)
             return output.getvalue()
         
-        # Group data by device ID for individual sheets
-        device_groups = {}
-        for row in data_to_use:
-            device_id = row['Device_ID']
-            if device_id not in device_groups:
-                device_groups[device_id] = {
-                    'date': row['Date'],
-                    'filename': row['Filename'],
-                    'format_type': row.get('Format_Type', '4-column'),
-                    'sections': []
-                }
-            device_groups[device_id]['sections'].append({
-                'Section': row['Section'],
-                'Coverage_Y': row['Coverage_Y'],
-                'Coverage_M': row['Coverage_M'],
-                'Coverage_C': row['Coverage_C'],
-                'Coverage_K': row['Coverage_K']
-            })
+        key = ('table', file_format, layout, format_filter, device_filter, date_filter, latest_only)
+        return self._cached_artifact(key, build)
+    
+    def get_device_workbook_bytes(self, device_id: str, format_filter=None, date_filter=None,
+                                  latest_only: bool = False) -> bytes:
+        """Workbook of one device, built from that device's rows only (cached like get_excel_bytes)"""
+        return self.get_excel_bytes(format_filter, device_id, date_filter, latest_only)
+    
+    def _iter_shards(self, filtered_data, devices_per_workbook: int) -> Iterator[List[Tuple[str, Dict, List[Tuple]]]]:
+        shard = []
+        for group in self.iter_device_groups(filtered_data):
+            shard.append(group)
+            if len(shard) == devices_per_workbook:
+                yield shard
+                shard = []
+        if shard:
+            yield shard
+    
+    @staticmethod
+    def _iter_bundle_workbooks(shards: Iterator[List], workers: int) -> Iterator[Tuple[List, bytes, List[str]]]:
+        """(shard, workbook bytes, sheet names) per shard, in order"""
+        if workers <= 1:
+            for shard in shards:
+                yield (shard,) + _build_bundle_workbook(shard)
+            return
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for shard in shards:
+                pending.append((shard, pool.submit(_build_bundle_workbook, shard)))
+                if len(pending) >= workers * BUNDLE_WINDOW_PER_WORKER:
+                    shard, future = pending.popleft()
+                    yield (shard,) + future.result()
+            while pending:
+                shard, future = pending.popleft()
+                yield (shard,) + future.result()
+    
+    def write_device_workbooks(self, output: BinaryIO, filtered_data=None, devices_per_workbook: int = 1,
+                               workers: int = 1) -> int:
+        """Write a ZIP of workbooks with devices_per_workbook devices each; returns the workbook count
+
+        Devices keep workbook sheet order. With one device per workbook each
+        file is named after its device (made portable and unique, so no
+        31-character sheet name truncation can merge two devices); shards are
+        named by device range, e.g. devices_00001-00100.xlsx. index.csv lists
+        the workbook, sheet name, device ID and section count of every device.
+        workers > 1 builds the workbooks in a process pool (0 uses every core)
+        with a few shards per worker in flight.
+        """
+        if devices_per_workbook < 1:
+            raise ValueError("devices_per_workbook must be at least 1")
+        workers = workers or os.cpu_count() or 1
+        instrumentation = self.instrumentation
+        batch = instrumentation.batch('excel_bundle') if instrumentation is not None else nullcontext()
+        manifest = [('Workbook', 'Sheet', 'Device_ID', 'Sections')]
+        used_names = set()
+        workbook_count = 0
+        device_count = 0
         
-        # Create Excel file
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            
-            # Create individual sheets for each device
-            for device_id, device_data in device_groups.items():
-                # Determine the format type for this device
-                format_type = device_data.get('format_type', '4-column')
-                
-                # Create header information
-                header_info = [
-                    ['Device ID:', device_id],
-                    ['Date:', str(device_data['date']) if device_data['date'] else 'N/A'],
-                    ['Filename:', device_data['filename']],
-                    ['Format:', format_type],
-                    [''],  # Empty row
-                ]
-                
-                # Add appropriate column headers and data based on format
-                if format_type == '1-column':
-                    header_info.append(['Section', 'Coverage(%)'])
-                    # Add section data for 1-column format
-                    section_data = []
-                    for section in device_data['sections']:
-                        section_data.append([
-                            section['Section'],
-                            section['Coverage_Y']  # Use Y column as the single coverage value
-                        ])
+        with batch, zipfile.ZipFile(output, 'w', zipfile.ZIP_STORED) as archive:
+            # Workbooks are deflated already, so they are stored as they are
+            shards = self._iter_shards(filtered_data, devices_per_workbook)
+            clock = perf_counter
+            start = clock()
+            for shard, workbook, sheet_names in self._iter_bundle_workbooks(shards, workers):
+                if instrumentation is not None:
+                    built = clock()
+                    instrumentation.record('bundle_build', built - start)
+                if devices_per_workbook == 1:
+                    name = unique_file_name(shard[0][0], used_names, '.xlsx')
                 else:
-                    header_info.append(['Section', 'Coverage Y(%)', 'Coverage M(%)', 'Coverage C(%)', 'Coverage K(%)'])
-                    # Add section data for 4-column format
-                    section_data = []
-                    for section in device_data['sections']:
-                        section_data.append([
-                            section['Section'],
-                            section['Coverage_Y'],
-                            section['Coverage_M'],
-                            section['Coverage_C'],
-                            section['Coverage_K']
-                        ])
-                
-                # Combine header and data
-                all_rows = header_info + section_data
-                
-                # Create DataFrame and write to sheet
-                sheet_df = pd.DataFrame(all_rows)
-                # Clean device ID for sheet name (Excel has 31 char limit and special char restrictions)
-                sheet_name = device_id.replace('/', '_').replace('\\', '_')[:31]
-                sheet_df.to_excel(writer, sheet_name=sheet_name, index=False, header=False)
+                    name = f"devices_{device_count + 1:05d}-{device_count + len(shard):05d}.xlsx"
+                archive.writestr(name, workbook)
+                for (device_id, _, sections), sheet_name in zip(shard, sheet_names):
+                    manifest.append((name, sheet_name, device_id, len(sections)))
+                workbook_count += 1
+                device_count += len(shard)
+                if instrumentation is not None:
+                    start = clock()
+                    instrumentation.record('bundle_zip', start - built, len(workbook))
+            
+            text = io.StringIO()
+            csv.writer(text).writerows(manifest)
+            archive.writestr(BUNDLE_MANIFEST, text.getvalue())
+        return workbook_count
+    
+    def get_bundle_bytes(self, devices_per_workbook: int = 1, format_filter=None, device_filter=None,
+                         date_filter=None, workers: int = 1, latest_only: bool = False) -> bytes:
+        """ZIP of per-device (or per-shard) workbooks for the filters, cached until the data changes"""
+        def build() -> bytes:
+            output = io.BytesIO()
+            filtered_data = self.apply_filters(device_filter, date_filter, format_filter, latest_only=latest_only)
+            self.write_device_workbooks(output, filtered_data, devices_per_workbook, workers)
+            return output.getvalue()
         
-        return output.getvalue()
+        key = ('bundle', devices_per_workbook, format_filter, device_filter, date_filter, latest_only)
+        return self._cached_artifact(key, build)
     
-    def get_unique_devices(self) -> List[str]:
+    def get_unique_devices(self, filtered_data=None) -> List[str]:
         """Get list of unique device IDs"""
-        return sorted(list(set(row['Device_ID'] for row in self.all_data if row['Device_ID'])))
+        return sorted(device for device in self._as_view(filtered_data).unique('Device_ID') if device)
+    
+    def get_unique_dates(self, filtered_data=None) -> List[str]:
+        """Get list of unique dates, oldest first (dates that do not parse last, alphabetically)"""
+        # One view: a list or DataFrame input builds its own store, whose codes must match the values
+        view = self._as_view(filtered_data)
+        codes = view.store.categories['Date'].codes
+        seconds = view.store.date_seconds
+        
+        def chronological(value) -> Tuple:
+            timestamp = seconds[codes[value]]
+            return timestamp == NO_TIMESTAMP, timestamp, str(value)
+        
+        dates = sorted((value for value in view.unique('Date') if value), key=chronological)
+        return list(dict.fromkeys(str(value) for value in dates))
     
-    def get_unique_dates(self) -> List[str]:
-        """Get list of unique dates"""
-        return sorted(list(set(str(row['Date']) for row in self.all_data if row['Date'])))
+    def get_device_history(self, device_id: str, start: Optional[datetime] = None,
+                           end: Optional[datetime] = None) -> pd.DataFrame:
+        """One row per report of a device, oldest first, optionally within [start, end]
+
+        Columns: Report_Time (datetime64, NaT when the date does not parse),
+        Date, Filename, Format_Type and Sections (row count of the report).
+        """
+        store = self.store
+        file_ids = self.timeline.device_history(device_id, start, end)
+        return pd.DataFrame({
+            'Report_Time': self.timeline.timestamps(file_ids),
+            'Date': store.decode('Date', store.file_column('Date')[file_ids]),
+            'Filename': store.decode('Filename', store.file_column('Filename')[file_ids]),
+            'Format_Type': store.decode('Format_Type', store.file_column('Format_Type')[file_ids]),
+            'Sections': store.file_column('stop')[file_ids] - store.file_column('start')[file_ids]
+        })
     
-    def get_unique_sections(self) -> List[str]:
+    def get_unique_sections(self, filtered_data=None) -> List[str]:
         """Get list of unique sections"""
-        return sorted(list(set(row['Section'] for row in self.all_data if row['Section'])))
+        return sorted(section for section in self._as_view(filtered_data).unique('Section') if section)
+    
+    def get_unique_formats(self, filtered_data=None) -> List[str]:
+        """Get list of format types present"""
+        return sorted(self._as_view(filtered_data).unique('Format_Type'))
     
     def get_summary(self, filtered_data=None) -> Dict:
         """Get summary of processed data"""
-        data_to_use = filtered_data if filtered_data is not None else self.all_data
+        if filtered_data is None:
+            # O(1): every interned device and filename has rows in the store
+            devices = self.store.categories['Device_ID'].codes
+            return {
+                'total_machines': len(devices) - ('' in devices) - (None in devices),
+                'total_sections': len(self.store),
+                'total_files_processed': len(self.store.categories['Filename'])
+            }
+        
+        data_to_use = self._as_view(filtered_data)
         
-        unique_devices = len(set(row['Device_ID'] for row in data_to_use if row['Device_ID']))
+        unique_devices = len([device for device in data_to_use.unique('Device_ID') if device])
         total_sections = len(data_to_use)
-        unique_files = len(set(row['Filename'] for row in data_to_use))
+        unique_files = len(data_to_use.unique('Filename'))
         
         return {
             'total_machines': unique_devices,
             'total_sections': total_sections,
             'total_files_processed': unique_files
-        }
\ No newline at end of file
+        }
@@ -1,33 +1,142 @@
 import zipfile
 import io
-from typing import List, Dict
+import os
+import threading
+import time
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from itertools import chain, islice
+from typing import BinaryIO, Iterable, Iterator, List, Dict, Optional, Set, Tuple
 from text_extractor import TextExtractor
+from record_batch import CoverageBatch
 from excel_generator import ExcelGenerator
+from archive_reader import REPORT_EXTENSIONS, iter_local_files, iter_report_streams, iter_text_lines
+from parse_cache import ParseCache, content_digest
+from instrumentation import FileTiming, Instrumentation
+
+NO_DATA_MESSAGE = "No device ID or coverage data found"
+DUPLICATE_NAME_MESSAGE = "another file with this name was already added in this batch; the first one was kept"
+
+# Files handed to the pool per round trip, and rounds kept in flight per worker
+WORKER_CHUNK_SIZE = 16
+WORKER_WINDOW_CHUNKS = 4
+
+
+def read_file_with_fallback_encoding(file_content_bytes) -> str:
+    """Read file content as utf-8, falling back to latin-1
+
+    latin-1 maps every byte, so it never fails; codecs tried after it could
+    never be reached. Extraction uses TextExtractor.process_bytes, which
+    gives the same result without decoding the whole file.
+    """
+    try:
+        return file_content_bytes.decode('utf-8')
+    except UnicodeDecodeError:
+        return file_content_bytes.decode('latin-1')
+
+
+class CachedParse:
+    """Stands in for a file's bytes when its scan came from the parse cache"""
+    __slots__ = ('payload',)
+
+    def __init__(self, payload: CoverageBatch):
+        self.payload = payload
+
+
+_worker_extractor = None
+
+
+def _init_worker(instrumented: bool = False):
+    global _worker_extractor
+    _worker_extractor = TextExtractor()
+    if instrumented:
+        _worker_extractor.instrumentation = Instrumentation()
+
+
+def _extract_worker(item: Tuple[str, bytes]) -> Tuple:
+    """Extract one file inside a pool worker (filename fallbacks are applied by the parent)
+
+    Returns (ok, CoverageBatch or error message), plus the file's stage times when instrumented.
+    """
+    filename, file_content_bytes = item
+    instrumentation = _worker_extractor.instrumentation
+    if instrumentation is not None:
+        instrumentation.current_file = FileTiming(filename)
+    try:
+        result = True, _worker_extractor.scan_batch(file_content_bytes)
+    except Exception as e:
+        result = False, str(e)
+    if instrumentation is not None:
+        return result + (instrumentation.current_file.stages,)
+    return result
+
+
+def _extract_chunk(items: List[Tuple[str, bytes]]) -> List[Tuple]:
+    """_extract_worker over consecutive files, so one pool task carries several of them"""
+    return [_extract_worker(item) for item in items]
+
 
 class FileProcessor:
-    def __init__(self):
+    def __init__(self, workers: int = 1, parse_cache: Optional[ParseCache] = None,
+                 instrumentation: Optional[Instrumentation] = None, memory_budget: Optional[int] = None,
+                 spill_dir: Optional[str] = None):
+        """workers > 1 fans extraction out to a process pool; 0 uses every core
+
+        With a parse_cache, files whose bytes were parsed before (by content
+        hash) skip extraction. With an instrumentation, per-stage timings of
+        every batch are recorded and returned as the results' 'diagnostics'.
+        With a memory_budget (bytes), coverage rows beyond it are spilled to
+        temp files in spill_dir (see CoverageStore).
+        """
         self.extractor = TextExtractor()
-        self.excel_generator = ExcelGenerator()
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
+        self.excel_generator = ExcelGenerator(memory_budget, spill_dir)
+        self.workers = workers or os.cpu_count() or 1
+        self.parse_cache = parse_cache
+        # Held around every change to the collection; readers hold it while a background import runs
+        self.lock = threading.RLock()
+        self.instrumentation = instrumentation
+    
+    @property
+    def instrumentation(self) -> Optional[Instrumentation]:
+        return self._instrumentation
+    
+    @instrumentation.setter
+    def instrumentation(self, instrumentation: Optional[Instrumentation]):
+        """Shared with the extractor and the ExcelGenerator; None turns recording off"""
+        self._instrumentation = instrumentation
+        self.extractor.instrumentation = instrumentation
+        self.excel_generator.instrumentation = instrumentation
+    
+    def _batch(self, name: str):
+        return self._instrumentation.batch(name) if self._instrumentation is not None else nullcontext()
+    
+    def _batch_result(self, processed_count: int, failed_files: List[str], counts: Dict, first_batch: int) -> Dict:
+        result = {
+            'processed_count': processed_count,
+            'failed_files': failed_files,
+            **counts,
+            'summary': self.excel_generator.get_summary()
+        }
+        if self._instrumentation is not None:
+            result['diagnostics'] = self._instrumentation.report(self._instrumentation.batches[first_batch:])
+        return result
+    
+    def _first_batch(self) -> int:
+        return len(self._instrumentation.batches) if self._instrumentation is not None else 0
     
     def read_file_with_fallback_encoding(self, file_content_bytes) -> str:
         """Read file content with multiple encoding attempts"""
-        encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1', 'windows-1252']
-        
-        for encoding in encodings:
-            try:
-                return file_content_bytes.decode(encoding)
-            except UnicodeDecodeError:
-                continue
-        
-        return file_content_bytes.decode('utf-8', errors='ignore')
+        return read_file_with_fallback_encoding(file_content_bytes)
     
     def process_single_file(self, uploaded_file) -> Dict:
         """Process a single uploaded file and return results"""
         try:
             file_content_bytes = uploaded_file.getvalue()
-            content = self.read_file_with_fallback_encoding(file_content_bytes)
             
-            machine_data = self.extractor.process_file(content, uploaded_file.name)
+            machine_data = self.extractor.process_bytes(file_content_bytes, uploaded_file.name)
             
             return {
                 'success': True,
@@ -42,76 +151,399 @@ class FileProcessor:
                 'error': str(e)
             }
     
-    def process_uploaded_files(self, uploaded_files) -> Dict:
-        """Process multiple uploaded files"""
-        processed_count = 0
-        failed_files = []
-        
-        for uploaded_file in uploaded_files:
+    def _extract_serial(self, items: Iterable[Tuple[str, object]]) -> Iterator[Tuple[str, bool, object, None]]:
+        for filename, file_content_bytes in items:
+            if isinstance(file_content_bytes, Exception):
+                yield filename, False, str(file_content_bytes), None
+                continue
+            if isinstance(file_content_bytes, CachedParse):
+                yield filename, True, file_content_bytes.payload, None
+                continue
             try:
-                file_content_bytes = uploaded_file.getvalue()
-                content = self.read_file_with_fallback_encoding(file_content_bytes)
-                
-                machine_data = self.extractor.process_file(content, uploaded_file.name)
-                
-                if machine_data['device_id'] and machine_data['coverage_data']:
-                    self.excel_generator.add_machine_data(machine_data)
-                    processed_count += 1
-                else:
-                    failed_files.append(f"{uploaded_file.name} (No device ID or coverage data found)")
-                    
+                yield filename, True, self.extractor.scan_batch(file_content_bytes), None
             except Exception as e:
-                failed_files.append(f"{uploaded_file.name} (Error: {str(e)})")
+                yield filename, False, str(e), None
+    
+    def _extract_parallel(self, items: Iterable[Tuple[str, object]]) -> Iterator[Tuple[str, bool, object, Optional[Dict]]]:
+        """Like _extract_serial; the last item holds the worker's stage times when instrumented
+
+        Chunks of files are submitted on a rolling window: once the oldest
+        chunk's results have been yielded, the next chunk is read and
+        submitted while the others are still being extracted, so workers
+        never wait for a window to drain and only a bounded number of raw
+        files is in flight. Results keep the input order.
+        """
+        window = self.workers * WORKER_WINDOW_CHUNKS
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(self._instrumentation is not None,)) as pool:
+            pending = deque()
+            for chunk in self._chunks(items):
+                # Read failures and cache hits stay in the parent
+                jobs = [item for item in chunk if not isinstance(item[1], (Exception, CachedParse))]
+                pending.append((chunk, pool.submit(_extract_chunk, jobs) if jobs else None))
+                if len(pending) >= window:
+                    yield from self._chunk_results(*pending.popleft())
+            while pending:
+                yield from self._chunk_results(*pending.popleft())
+    
+    def _chunks(self, items: Iterable[Tuple[str, object]]) -> Iterator[List[Tuple[str, object]]]:
+        """Consecutive items, WORKER_CHUNK_SIZE per chunk; an input under one window is split finer to reach every worker"""
+        items = iter(items)
+        head = list(islice(items, self.workers * WORKER_CHUNK_SIZE * WORKER_WINDOW_CHUNKS))
+        size = WORKER_CHUNK_SIZE
+        if len(head) < self.workers * WORKER_CHUNK_SIZE * WORKER_WINDOW_CHUNKS:
+            size = max(1, min(WORKER_CHUNK_SIZE, len(head) // (self.workers * 4)))
+        chunk = []
+        for item in chain(head, items):
+            chunk.append(item)
+            if len(chunk) == size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    
+    @staticmethod
+    def _chunk_results(chunk: List[Tuple[str, object]], future) -> Iterator[Tuple[str, bool, object, Optional[Dict]]]:
+        results = iter(future.result() if future is not None else ())
+        for filename, file_content_bytes in chunk:
+            if isinstance(file_content_bytes, Exception):
+                yield filename, False, str(file_content_bytes), None
+            elif isinstance(file_content_bytes, CachedParse):
+                yield filename, True, file_content_bytes.payload, None
+            else:
+                ok, payload, *stages = next(results)
+                yield filename, ok, payload, stages[0] if stages else None
+    
+    def _ingest(self, items: Iterable[Tuple[str, object]], failed_files: List[str], counts: Dict,
+                progress=None, merged_names: Optional[Set[str]] = None) -> int:
+        """Extract (filename, bytes) items and merge them into the ExcelGenerator in input order
+
+        A read error can be passed in place of the bytes so it is reported in
+        sequence. Files already loaded with the same name and content are
+        skipped; a file whose name is already loaded replaces the earlier one
+        once it has been extracted successfully (the earlier copy is removed
+        when the batch ends). Only files loaded before the batch are
+        replaced: a second file with a name already added by the batch is
+        reported as failed (merged_names holds those names, shared when one
+        batch spans several calls). counts receives the 'replaced_count'
+        and 'unchanged_count' of the batch.
+
+        progress (see background.IngestJob) gets file_done(filename, status,
+        failure) for every file, status being 'added', 'failed' or
+        'unchanged', and is polled for cancelled: once it is set no further
+        file is started, files already being extracted are still merged, and
+        counts gets 'cancelled'.
+        """
+        serial = self.workers <= 1
+        extract = self._extract_serial if serial else self._extract_parallel
+        cache = self.parse_cache
+        excel_generator = self.excel_generator
+        instrumentation = self._instrumentation
+        clock = time.perf_counter
+        # One entry per extracted item, in order: (content digest, whether to store the scan in the cache,
+        # FileTiming and per-file peak baseline when instrumented)
+        pending = deque()
+        seen_filenames = set()
+        merged_names = set() if merged_names is None else merged_names
+        counts.setdefault('unchanged_count', 0)
         
+        def prepare(items):
+            for filename, file_content_bytes, read_seconds in items:
+                if progress is not None and progress.cancelled:
+                    counts['cancelled'] = True
+                    return
+                digest, store_scan, timing, peak_baseline = None, False, None, None
+                if instrumentation is not None:
+                    nbytes = 0 if isinstance(file_content_bytes, Exception) else len(file_content_bytes)
+                    timing = instrumentation.begin_file(filename, nbytes)
+                    instrumentation.record('read', read_seconds, nbytes, timing)
+                    if serial:
+                        # Files overlap in the pool pipeline, so only serial runs get per-file peaks
+                        peak_baseline = instrumentation.file_peak_start()
+                    start = clock()
+                if not isinstance(file_content_bytes, Exception):
+                    digest = content_digest(file_content_bytes)
+                    if timing is not None:
+                        instrumentation.record('hash', clock() - start, nbytes, timing)
+                    # A name seen earlier in this batch may be about to replace the loaded copy
+                    if filename not in seen_filenames and excel_generator.has_file(filename, digest):
+                        counts['unchanged_count'] += 1
+                        if progress is not None:
+                            progress.file_done(filename, 'unchanged')
+                        continue
+                    if cache is not None:
+                        start = clock() if timing is not None else 0
+                        payload = cache.get(digest)
+                        if payload is not None:
+                            file_content_bytes = CachedParse(payload)
+                        else:
+                            store_scan = True
+                        if timing is not None:
+                            instrumentation.record('cache_lookup', clock() - start, 0, timing)
+                seen_filenames.add(filename)
+                pending.append((digest, store_scan, timing, peak_baseline))
+                if timing is not None:
+                    # In-process extraction records its decode/scan times here
+                    instrumentation.current_file = timing
+                yield filename, file_content_bytes
+        
+        processed_count = 0
+        replaced = []
+        with self._batch('ingest'):
+            try:
+                timed_items = self._timed_reads(items) if instrumentation is not None else (
+                    (filename, file_content_bytes, None) for filename, file_content_bytes in items)
+                for filename, ok, payload, worker_stages in extract(prepare(timed_items)):
+                    digest, store_scan, timing, peak_baseline = pending.popleft()
+                    if timing is not None:
+                        if worker_stages:
+                            instrumentation.record_stages(worker_stages, timing)
+                        start = clock()
+                    if ok and store_scan:
+                        cache.put(digest, payload)
+                        if timing is not None:
+                            stored = clock()
+                            instrumentation.record('cache_store', stored - start, 0, timing)
+                            start = stored
+                    with self.lock:
+                        added = self._merge_result(filename, ok, payload, failed_files, digest, replaced, merged_names)
+                    processed_count += added
+                    if progress is not None:
+                        progress.file_done(filename, 'added' if added else 'failed', None if added else failed_files[-1])
+                    if timing is not None:
+                        instrumentation.record('aggregate', clock() - start, 0, timing)
+                        instrumentation.file_peak_end(peak_baseline, timing)
+            finally:
+                if cache is not None:
+                    cache.commit()
+                with self.lock:
+                    self._remove_replaced(replaced, counts)
+        return processed_count
+    
+    @staticmethod
+    def _timed_reads(items: Iterable[Tuple[str, object]]) -> Iterator[Tuple[str, object, float]]:
+        """Add the time spent producing each item (reading the file) to it"""
+        iterator = iter(items)
+        while True:
+            start = time.perf_counter()
+            try:
+                filename, file_content_bytes = next(iterator)
+            except StopIteration:
+                return
+            yield filename, file_content_bytes, time.perf_counter() - start
+    
+    def _merge_result(self, filename: str, ok: bool, payload, failed_files: List[str],
+                      digest: Optional[bytes] = None, replaced: Optional[List[int]] = None,
+                      merged_names: Optional[Set[str]] = None) -> bool:
+        """Add one extraction result; ids of files it supersedes by name are collected in replaced
+
+        With merged_names (the names added so far by the batch, updated
+        here), a name the batch already added is a failure instead of a
+        replacement, so a batch never drops a file it counted as processed.
+        """
+        if not ok:
+            failed_files.append(f"{filename} (Error: {payload})")
+            return False
+        if merged_names is not None and filename in merged_names:
+            failed_files.append(f"{filename} (Error: {DUPLICATE_NAME_MESSAGE})")
+            return False
+        batch = self.extractor.complete_header(payload, filename)
+        if batch.header.device_id and len(batch):
+            if replaced is not None:
+                replaced.extend(self.excel_generator.store.files_with_filename(filename))
+            self.excel_generator.add_batch(batch, digest)
+            if merged_names is not None:
+                merged_names.add(filename)
+            return True
+        failed_files.append(f"{filename} ({NO_DATA_MESSAGE})")
+        return False
+    
+    def _remove_replaced(self, replaced: List[int], counts: Dict):
+        # One compaction per batch; the replacements were appended after every id collected here
+        replaced = set(replaced)
+        self.excel_generator.remove_file_ids(replaced)
+        counts['replaced_count'] = counts.get('replaced_count', 0) + len(replaced)
+    
+    def remove_files(self, filenames: Iterable[str] = (), digests: Iterable[bytes] = ()) -> Dict:
+        """Remove loaded files by filename and/or content digest (see content_digest)"""
+        with self.lock:
+            removed_count = self.excel_generator.remove_files(filenames, digests)
         return {
-            'processed_count': processed_count,
-            'failed_files': failed_files,
+            'removed_count': removed_count,
             'summary': self.excel_generator.get_summary()
         }
     
+    def clear(self):
+        """Drop every loaded file; the parse cache and instrumentation are kept"""
+        self.excel_generator.store.close()
+        self.excel_generator = ExcelGenerator(self.memory_budget, self.spill_dir)
+        self.excel_generator.instrumentation = self._instrumentation
+    
+    def process_uploaded_files(self, uploaded_files, progress=None) -> Dict:
+        """Process multiple uploaded files (progress: see _ingest)"""
+        failed_files = []
+        first_batch = self._first_batch()
+        
+        def read_uploads():
+            for uploaded_file in uploaded_files:
+                try:
+                    file_content_bytes = uploaded_file.getvalue()
+                except Exception as e:
+                    file_content_bytes = e
+                yield uploaded_file.name, file_content_bytes
+        
+        counts = {}
+        processed_count = self._ingest(read_uploads(), failed_files, counts, progress)
+        
+        return self._batch_result(processed_count, failed_files, counts, first_batch)
+    
     def process_zip_file(self, zip_file) -> Dict:
         """Process files from a zip archive"""
-        processed_count = 0
         failed_files = []
+        counts = {}
+        first_batch = self._first_batch()
         
         try:
             with zipfile.ZipFile(zip_file, 'r') as zip_ref:
-                for file_info in zip_ref.filelist:
-                    if not file_info.is_dir() and file_info.filename.lower().endswith(('.txt', '.log', '.dat')):
-                        try:
-                            with zip_ref.open(file_info.filename) as file:
-                                file_content_bytes = file.read()
-                                content = self.read_file_with_fallback_encoding(file_content_bytes)
-                            
-                            machine_data = self.extractor.process_file(content, file_info.filename)
-                            
-                            if machine_data['device_id'] and machine_data['coverage_data']:
-                                self.excel_generator.add_machine_data(machine_data)
-                                processed_count += 1
-                            else:
-                                failed_files.append(f"{file_info.filename} (No device ID or coverage data found)")
-                                
-                        except Exception as e:
-                            failed_files.append(f"{file_info.filename} (Error: {str(e)})")
+                def read_members():
+                    for file_info in zip_ref.filelist:
+                        if not file_info.is_dir() and file_info.filename.lower().endswith(REPORT_EXTENSIONS):
+                            try:
+                                with zip_ref.open(file_info.filename) as file:
+                                    file_content_bytes = file.read()
+                            except Exception as e:
+                                file_content_bytes = e
+                            yield file_info.filename, file_content_bytes
+                
+                processed_count = self._ingest(read_members(), failed_files, counts)
             
         except Exception as e:
             return {
                 'processed_count': 0,
                 'failed_files': [f"Zip file error: {str(e)}"],
+                **counts,
                 'summary': {'total_machines': 0, 'total_sections': 0, 'total_files_processed': 0}
             }
         
-        return {
-            'processed_count': processed_count,
-            'failed_files': failed_files,
-            'summary': self.excel_generator.get_summary()
-        }
+        return self._batch_result(processed_count, failed_files, counts, first_batch)
+    
+    def process_archive(self, archive_file, name: Optional[str] = None) -> Dict:
+        """Stream reports out of a zip, tar(.gz) or .gz bundle, including nested archives
+
+        archive_file may be a path or a binary file object. Members are read
+        through buffered line iterators and fed to the extractor line by
+        line, so memory is bounded by the largest coverage block rather than
+        by member or archive size. Extraction runs in-process. Members are
+        not hashed, so they replace loaded files by name only.
+        """
+        failed_files = []
+        counts = {}
+        first_batch = self._first_batch()
+        processed_count = self._ingest_archive(archive_file, name, failed_files, counts, set())
+        return self._batch_result(processed_count, failed_files, counts, first_batch)
+    
+    def _ingest_archive(self, archive_file, name: Optional[str], failed_files: List[str], counts: Dict,
+                        merged_names: Set[str], prefix: str = '') -> int:
+        """Merge the reports of one archive (see process_archive); members are named prefix + member path"""
+        processed_count = 0
+        replaced = []
+        instrumentation = self._instrumentation
+        if name is None:
+            name = archive_file if isinstance(archive_file, str) else getattr(archive_file, 'name', '')
+        
+        with self._batch('archive'):
+            try:
+                with (open(archive_file, 'rb') if isinstance(archive_file, str) else nullcontext(archive_file)) as fileobj:
+                    for filename, stream in iter_report_streams(fileobj, os.path.basename(name)):
+                        filename = prefix + filename
+                        if instrumentation is not None:
+                            # Members are read, decoded and scanned as one stream: all of it counts as 'scan'
+                            timing = instrumentation.begin_file(filename)
+                            start = time.perf_counter()
+                        if isinstance(stream, Exception):
+                            ok, payload = False, str(stream)
+                        else:
+                            try:
+                                ok, payload = True, self.extractor.scanner.scan_lines(iter_text_lines(stream))
+                            except Exception as e:
+                                ok, payload = False, str(e)
+                        if instrumentation is not None:
+                            scanned = time.perf_counter()
+                            instrumentation.record('scan', scanned - start, 0, timing)
+                        with self.lock:
+                            processed_count += self._merge_result(filename, ok, payload, failed_files,
+                                                                  replaced=replaced, merged_names=merged_names)
+                        if instrumentation is not None:
+                            instrumentation.record('aggregate', time.perf_counter() - scanned, 0, timing)
+            
+            except Exception as e:
+                failed_files.append(f"{name or 'archive'} (Archive error: {e})")
+            
+            with self.lock:
+                self._remove_replaced(replaced, counts)
+        return processed_count
+    
+    def process_paths(self, paths: Iterable[str]) -> Dict:
+        """Process report files, directory trees and archives on the local filesystem
+
+        Plain reports are read one at a time and go through the same serial
+        or pool extraction as uploads; archives found along the way are
+        streamed like process_archive afterwards, their members named
+        'archive name/member path'. The whole call is one batch: names are
+        unique within it (see iter_local_files), and a name that still
+        repeats is reported as failed rather than replacing the earlier file.
+        """
+        failed_files = []
+        archives = []
+        counts = {}
+        merged_names = set()
+        first_batch = self._first_batch()
+        
+        def read_reports():
+            for name, path, kind in iter_local_files(paths):
+                if kind != 'report':
+                    archives.append((name, path))
+                    continue
+                try:
+                    with open(path, 'rb') as file:
+                        file_content_bytes = file.read()
+                except Exception as e:
+                    file_content_bytes = e
+                yield name, file_content_bytes
+        
+        processed_count = self._ingest(read_reports(), failed_files, counts, merged_names=merged_names)
+        for name, path in archives:
+            if not os.path.isfile(path):
+                failed_files.append(f"{path} (Error: no such file or directory)")
+                continue
+            processed_count += self._ingest_archive(path, name, failed_files, counts, merged_names, f"{name}/")
+        
+        return self._batch_result(processed_count, failed_files, counts, first_batch)
     
     def generate_excel_file(self, device_filter=None, date_filter=None) -> bytes:
         """Generate the final Excel file with optional filters"""
         filtered_data = self.excel_generator.apply_filters(device_filter, date_filter)
         return self.excel_generator.generate_excel_with_device_headers(filtered_data)
     
+    def stream_excel_file(self, device_filter=None, date_filter=None) -> BinaryIO:
+        """Generate the final Excel file into a rewound spooled temp file"""
+        filtered_data = self.excel_generator.apply_filters(device_filter, date_filter)
+        return self.excel_generator.stream_excel_with_device_headers(filtered_data)
+    
+    def write_excel_file(self, output, device_filter=None, date_filter=None, latest_only: bool = False,
+                         fleet_summary: bool = False):
+        """Write the final Excel file to a path or binary file without holding it in memory"""
+        filtered_data = self.excel_generator.apply_filters(device_filter, date_filter, latest_only=latest_only)
+        with (open(output, 'wb') if isinstance(output, str) else nullcontext(output)) as fileobj:
+            self.excel_generator.write_excel_with_device_headers(fileobj, filtered_data, fleet_summary)
+    
+    def write_device_workbooks(self, output, device_filter=None, date_filter=None, devices_per_workbook: int = 1,
+                               latest_only: bool = False) -> int:
+        """Write a ZIP of per-device (or per-shard) workbooks to a path or binary file, built by the worker pool"""
+        filtered_data = self.excel_generator.apply_filters(device_filter, date_filter, latest_only=latest_only)
+        with (open(output, 'wb') if isinstance(output, str) else nullcontext(output)) as fileobj:
+            return self.excel_generator.write_device_workbooks(fileobj, filtered_data, devices_per_workbook, self.workers)
+    
     def get_filter_options(self) -> Dict:
         """Get available filter options"""
         return {
@@ -122,4 +554,9 @@ class FileProcessor:
     def get_filtered_summary(self, device_filter=None, date_filter=None) -> Dict:
         """Get summary of filtered data"""
         filtered_data = self.excel_generator.apply_filters(device_filter, date_filter)
-        return self.excel_generator.get_summary(filtered_data)
\ No newline at end of file
+        return self.excel_generator.get_summary(filtered_data)
+    
+    def get_preview(self, device_filter=None, date_filter=None, format_filter=None, max_rows: int = 20) -> List[Dict]:
+        """Get per-device sheet previews of filtered data without building a workbook"""
+        filtered_data = self.excel_generator.apply_filters(device_filter, date_filter, format_filter)
+        return self.excel_generator.get_device_previews(filtered_data, max_rows)
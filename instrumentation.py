@@ -0,0 +1,191 @@
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+# Pipeline stages, in the order they run for one file
+FILE_STAGES = ('read', 'hash', 'cache_lookup', 'decode', 'scan', 'aggregate', 'cache_store')
+EXPORT_STAGES = ('excel_pivot', 'excel_summary', 'excel_rows', 'excel_write', 'excel_save', 'bundle_build', 'bundle_zip', 'table_frame', 'table_write')
+
+
+class FileTiming:
+    """Per-stage wall time of one file, plus its size and peak traced allocation"""
+    __slots__ = ('filename', 'bytes', 'stages', 'peak_bytes')
+
+    def __init__(self, filename: str, nbytes: int = 0):
+        self.filename = filename
+        self.bytes = nbytes
+        self.stages = {}
+        self.peak_bytes = None
+
+    def add(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @property
+    def seconds(self) -> float:
+        return sum(self.stages.values())
+
+    def as_dict(self) -> Dict:
+        return {'filename': self.filename, 'bytes': self.bytes, 'seconds': self.seconds,
+                'stages': dict(self.stages), 'peak_bytes': self.peak_bytes}
+
+
+class BatchTiming:
+    """Stage totals of one batch (an import call or an export)"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.time()
+        self.seconds = 0.0
+        self.stages = {}
+        self.files = []
+        self.peak_bytes = None
+
+    def add(self, stage: str, seconds: float, nbytes: int = 0):
+        totals = self.stages.get(stage)
+        if totals is None:
+            totals = self.stages[stage] = {'seconds': 0.0, 'bytes': 0, 'calls': 0}
+        totals['seconds'] += seconds
+        totals['bytes'] += nbytes
+        totals['calls'] += 1
+
+    def as_dict(self, include_files: bool = True) -> Dict:
+        result = {
+            'name': self.name,
+            'started': self.started,
+            'seconds': self.seconds,
+            'file_count': len(self.files),
+            'bytes': sum(timing.bytes for timing in self.files),
+            'stages': {stage: dict(totals) for stage, totals in self.stages.items()},
+            'peak_bytes': self.peak_bytes
+        }
+        if include_files:
+            result['files'] = [timing.as_dict() for timing in self.files]
+        return result
+
+
+class Instrumentation:
+    """Opt-in recorder of per-stage wall time, bytes and peak allocations
+
+    FileProcessor, TextExtractor and ExcelGenerator take one through their
+    instrumentation attribute (None, the default, records nothing and costs
+    nothing). Time is recorded per file and summed per batch; stages are
+    listed in FILE_STAGES and EXPORT_STAGES. With trace_memory, tracemalloc
+    runs for the duration of each batch and the peak traced allocation is
+    kept per batch and, for in-process extraction, per file. Tracing slows
+    allocation-heavy code, so timings taken with it are inflated. Work done
+    in pool workers is timed there; its allocations are not traced.
+    """
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.batches = []
+        self.current_batch = None
+        # File whose stages TextExtractor records into (in-process extraction only)
+        self.current_file = None
+        self._started_tracing = False
+        # Absolute traced sizes: at the start of the current batch, and its peak before the last reset_peak()
+        self._batch_baseline = 0
+        self._batch_peak = 0
+
+    @contextmanager
+    def batch(self, name: str) -> Iterator[BatchTiming]:
+        """Record everything inside the block as one batch; nested batches fold into the outer one"""
+        if self.current_batch is not None:
+            yield self.current_batch
+            return
+        batch = BatchTiming(name)
+        self.current_batch = batch
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            self._batch_baseline = self._batch_peak = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield batch
+        finally:
+            batch.seconds = time.perf_counter() - start
+            if self.trace_memory:
+                peak = max(self._batch_peak, tracemalloc.get_traced_memory()[1])
+                batch.peak_bytes = max(0, peak - self._batch_baseline)
+                if self._started_tracing:
+                    tracemalloc.stop()
+                    self._started_tracing = False
+            self.current_batch = None
+            self.current_file = None
+            self.batches.append(batch)
+
+    def begin_file(self, filename: str, nbytes: int = 0) -> FileTiming:
+        timing = FileTiming(filename, nbytes)
+        self.current_batch.files.append(timing)
+        return timing
+
+    def record(self, stage: str, seconds: float, nbytes: int = 0, timing: Optional[FileTiming] = None):
+        """Add seconds to a stage of the current batch and of a file (default: current_file)"""
+        timing = timing or self.current_file
+        if timing is not None:
+            timing.add(stage, seconds)
+        if self.current_batch is not None:
+            self.current_batch.add(stage, seconds, nbytes)
+
+    def record_stages(self, stages: Dict[str, float], timing: FileTiming):
+        """Add stage times measured elsewhere (in a pool worker) to a file"""
+        for stage, seconds in stages.items():
+            self.record(stage, seconds, timing.bytes if stage in ('decode', 'scan') else 0, timing)
+
+    def file_peak_start(self) -> Optional[int]:
+        """Start a per-file peak measurement; pass the result to file_peak_end"""
+        if not self.trace_memory or not tracemalloc.is_tracing():
+            return None
+        # Keep the batch peak reached so far before resetting it for this file
+        self._batch_peak = max(self._batch_peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        return tracemalloc.get_traced_memory()[0]
+
+    def file_peak_end(self, baseline: Optional[int], timing: FileTiming):
+        if baseline is not None:
+            timing.peak_bytes = max(0, tracemalloc.get_traced_memory()[1] - baseline)
+
+    def report(self, batches: Optional[List[BatchTiming]] = None, include_files: bool = True) -> Dict:
+        """Batches (default: all so far) and their stage totals as plain JSON-ready data"""
+        batches = self.batches if batches is None else batches
+        totals = {}
+        for batch in batches:
+            for stage, stage_totals in batch.stages.items():
+                merged = totals.setdefault(stage, {'seconds': 0.0, 'bytes': 0, 'calls': 0})
+                for key, value in stage_totals.items():
+                    merged[key] += value
+        return {
+            'trace_memory': self.trace_memory,
+            'stages': totals,
+            'batches': [batch.as_dict(include_files) for batch in batches]
+        }
+
+    def to_json(self, batches: Optional[List[BatchTiming]] = None, indent: Optional[int] = 2) -> str:
+        return json.dumps(self.report(batches), indent=indent)
+
+    def clear(self):
+        self.batches = []
+
+
+def stage_rows(report: Dict) -> List[Dict]:
+    """One display row per stage of a report: seconds, share of the time, MB and MB/s"""
+    stages = report['stages']
+    total = sum(totals['seconds'] for totals in stages.values()) or 1.0
+    order = {stage: index for index, stage in enumerate(FILE_STAGES + EXPORT_STAGES)}
+    rows = []
+    for stage in sorted(stages, key=lambda name: order.get(name, len(order))):
+        totals = stages[stage]
+        megabytes = totals['bytes'] / 1e6
+        rows.append({
+            'Stage': stage,
+            'Seconds': round(totals['seconds'], 4),
+            'Share (%)': round(100 * totals['seconds'] / total, 1),
+            'Calls': totals['calls'],
+            'MB': round(megabytes, 2),
+            'MB/s': round(megabytes / totals['seconds'], 1) if totals['seconds'] and megabytes else None
+        })
+    return rows
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from array import array
+from typing import Dict, Optional, Tuple
+
+from record_batch import CoverageBatch, ReportHeader
+from text_extractor import EXTRACTOR_VERSION
+
+# Puts are committed in batches of this many (and on commit()); a crash loses at most one batch
+COMMIT_EVERY = 512
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS parses (
+    digest BLOB NOT NULL,
+    version INTEGER NOT NULL,
+    header TEXT NOT NULL,
+    coverage BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_used INTEGER NOT NULL,
+    PRIMARY KEY (digest, version)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS parses_last_used ON parses (last_used);
+"""
+
+
+def default_cache_path() -> str:
+    return os.path.join(tempfile.gettempdir(), 'coverage_parse_cache.sqlite')
+
+
+def content_digest(data) -> bytes:
+    """SHA-256 of raw report bytes (bytes, bytearray, memoryview or mmap)"""
+    return hashlib.sha256(data).digest()
+
+
+def encode_scan(batch: CoverageBatch) -> Tuple[str, bytes]:
+    """A content-only CoverageBatch as a JSON header (device_id, date, format_type, sections) plus its values"""
+    header = batch.header
+    return (json.dumps([header.device_id, header.date, header.format_type, batch.sections], separators=(',', ':')),
+            batch.values.tobytes())
+
+
+def decode_scan(header: str, coverage: bytes) -> CoverageBatch:
+    device_id, date, format_type, sections = json.loads(header)
+    values = array('d')
+    values.frombytes(coverage)
+    return CoverageBatch(ReportHeader(device_id, date, None, format_type), sections, values)
+
+
+class ParseCache:
+    """Persistent extraction results keyed by (SHA-256 of the raw bytes, extractor version)
+
+    Values are the content-only CoverageBatch scans FileProcessor merges,
+    before the filename fallbacks, stored in a SQLite file so they survive restarts
+    (see encode_scan). Entries are evicted least recently used once the stored
+    payloads exceed max_bytes. Size accounting, hits, misses and evictions
+    are kept per instance, so use one instance per cache file.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_bytes: int = 256 * 1024 * 1024,
+                 version: int = EXTRACTOR_VERSION):
+        self.path = path or default_cache_path()
+        self.max_bytes = max_bytes
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._pending_writes = 0
+        # Recency updates from hits, written with the next commit
+        self._touched = []
+        # Streamlit runs reruns on different threads; every access holds the lock
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        # Entries written by older extractor versions can never be hit again
+        self._conn.execute('DELETE FROM parses WHERE version != ?', (version,))
+        self.total_bytes, self._clock = self._conn.execute(
+            'SELECT COALESCE(SUM(size), 0), COALESCE(MAX(last_used), 0) FROM parses').fetchone()
+        self._evict()
+        self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM parses').fetchone()[0]
+
+    def __contains__(self, digest: bytes) -> bool:
+        with self._lock:
+            return self._conn.execute('SELECT 1 FROM parses WHERE digest = ? AND version = ?',
+                                      (digest, self.version)).fetchone() is not None
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    def get(self, digest: bytes) -> Optional[CoverageBatch]:
+        """Cached CoverageBatch for a content digest, or None"""
+        with self._lock:
+            row = self._conn.execute('SELECT header, coverage FROM parses WHERE digest = ? AND version = ?',
+                                     (digest, self.version)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touched.append((self._tick(), digest, self.version))
+            self._note_write()
+        return decode_scan(*row)
+
+    def put(self, digest: bytes, batch: CoverageBatch):
+        """Store a content-only CoverageBatch (TextExtractor.scan_batch)"""
+        header, coverage = encode_scan(batch)
+        size = len(header) + len(coverage)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._conn.execute('SELECT size FROM parses WHERE digest = ? AND version = ?',
+                                          (digest, self.version)).fetchone()
+            self._conn.execute('INSERT OR REPLACE INTO parses VALUES (?, ?, ?, ?, ?, ?)',
+                               (digest, self.version, header, coverage, size, self._tick()))
+            self.total_bytes += size - (previous[0] if previous else 0)
+            self._evict()
+            self._note_write()
+
+    def _write_touched(self):
+        if self._touched:
+            self._conn.executemany('UPDATE parses SET last_used = ? WHERE digest = ? AND version = ?', self._touched)
+            self._touched = []
+
+    def _evict(self):
+        if self.total_bytes > self.max_bytes:
+            self._write_touched()
+        while self.total_bytes > self.max_bytes:
+            # Drop the least recently used tenth (at least one entry) per round
+            count = max(1, self._conn.execute('SELECT COUNT(*) FROM parses').fetchone()[0] // 10)
+            victims = self._conn.execute('SELECT digest, version, size FROM parses ORDER BY last_used LIMIT ?',
+                                         (count,)).fetchall()
+            self._conn.executemany('DELETE FROM parses WHERE digest = ? AND version = ?',
+                                   [(digest, version) for digest, version, _ in victims])
+            self.total_bytes -= sum(size for _, _, size in victims)
+            self.evictions += len(victims)
+
+    def _note_write(self):
+        self._pending_writes += 1
+        if self._pending_writes >= COMMIT_EVERY:
+            self._write_touched()
+            self._conn.commit()
+            self._pending_writes = 0
+
+    def commit(self):
+        """Make pending writes durable"""
+        with self._lock:
+            self._write_touched()
+            self._conn.commit()
+            self._pending_writes = 0
+
+    def clear(self):
+        """Drop every entry; the hit/miss counters are kept"""
+        with self._lock:
+            self._conn.execute('DELETE FROM parses')
+            self._conn.commit()
+            self._touched = []
+            self.total_bytes = 0
+            self._pending_writes = 0
+
+    def close(self):
+        with self._lock:
+            self._write_touched()
+            self._conn.commit()
+            self._conn.close()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self),
+            'bytes': self.total_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,118 @@
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from report_formats import CHANNELS
+
+TOTAL_SECTION = 'Total'
+
+
+class ReportHeader:
+    """Device, date, filename and format of one report
+
+    Scans fill in what the content yields (filename None, no filename
+    fallbacks); FileProcessor completes it before the rows are merged.
+    """
+    __slots__ = ('device_id', 'date', 'filename', 'format_type')
+
+    def __init__(self, device_id: Optional[str], date: Optional[str], filename: Optional[str], format_type: str):
+        self.device_id = device_id
+        self.date = date
+        self.filename = filename
+        self.format_type = format_type
+
+    def __reduce__(self):
+        return ReportHeader, (self.device_id, self.date, self.filename, self.format_type)
+
+    def __eq__(self, other):
+        if not isinstance(other, ReportHeader):
+            return NotImplemented
+        return (self.device_id, self.date, self.filename, self.format_type) == (
+            other.device_id, other.date, other.filename, other.format_type)
+
+    def __repr__(self):
+        return (f"ReportHeader(device_id={self.device_id!r}, date={self.date!r}, "
+                f"filename={self.filename!r}, format_type={self.format_type!r})")
+
+
+def unpickle_batch(device_id: Optional[str], date: Optional[str], filename: Optional[str], format_type: str,
+                   sections: List[str], values: bytes) -> 'CoverageBatch':
+    batch = CoverageBatch(ReportHeader(device_id, date, filename, format_type), sections)
+    batch.values.frombytes(values)
+    return batch
+
+
+class CoverageBatch:
+    """One report's coverage rows: section labels plus Y/M/C/K values in one array('d')
+
+    values is row-major, len(CHANNELS) floats per row, so a row costs its
+    section label and 32 bytes instead of a dict and four float objects. A
+    Total row, labelled 'Total', comes first when the report has one.
+    Batches pickle as the header fields, the label list and the raw value
+    bytes, so pool workers return them cheaply.
+    """
+    __slots__ = ('header', 'sections', 'values')
+
+    def __init__(self, header: ReportHeader, sections: Optional[List[str]] = None, values: Optional[array] = None):
+        self.header = header
+        self.sections = sections if sections is not None else []
+        self.values = values if values is not None else array('d')
+
+    @classmethod
+    def from_rows(cls, header: ReportHeader, rows: List[Tuple]) -> 'CoverageBatch':
+        """Batch of (Section, Y, M, C, K) tuples"""
+        return cls(header, [row[0] for row in rows], array('d', [value for row in rows for value in row[1:]]))
+
+    @classmethod
+    def from_coverage_data(cls, header: ReportHeader, coverage_data: List[Dict]) -> 'CoverageBatch':
+        """Batch of coverage_data row dicts (the inverse of coverage_data())"""
+        return cls(header, [row['Section'] for row in coverage_data], array('d', [
+            row[key] for row in coverage_data for key in ('Coverage_Y', 'Coverage_M', 'Coverage_C', 'Coverage_K')]))
+
+    def __reduce__(self):
+        header = self.header
+        return unpickle_batch, (header.device_id, header.date, header.filename, header.format_type,
+                                self.sections, self.values.tobytes())
+
+    def __len__(self):
+        return len(self.sections)
+
+    def __eq__(self, other):
+        if not isinstance(other, CoverageBatch):
+            return NotImplemented
+        return self.header == other.header and self.sections == other.sections and self.values == other.values
+
+    @property
+    def has_total(self) -> bool:
+        return bool(self.sections) and self.sections[0] == TOTAL_SECTION
+
+    def column(self, channel: str) -> array:
+        """Values of one channel (one of CHANNELS), as a new array('d')"""
+        return self.values[CHANNELS.index(channel)::len(CHANNELS)]
+
+    def columns(self) -> List[array]:
+        """Y, M, C and K value arrays"""
+        return [self.values[i::len(CHANNELS)] for i in range(len(CHANNELS))]
+
+    def to_numpy(self) -> np.ndarray:
+        """(rows, 4) float64 view of the values (no copy)"""
+        return np.frombuffer(self.values, dtype=np.float64).reshape(-1, len(CHANNELS))
+
+    def rows(self) -> Iterator[Tuple]:
+        """(Section, Y, M, C, K) tuples"""
+        return zip(self.sections, *self.columns())
+
+    def coverage_data(self) -> List[Dict]:
+        """Rows in the row-dict shape of TextExtractor.process_file's coverage_data"""
+        has_total = self.has_total
+        return [
+            {
+                'Section': section,
+                'Coverage_Y': y,
+                'Coverage_M': m,
+                'Coverage_C': c,
+                'Coverage_K': k,
+                'Is_Total': has_total and index == 0
+            }
+            for index, (section, y, m, c, k) in enumerate(self.rows())
+        ]
@@ -0,0 +1,207 @@
+import re
+from typing import Iterator, Optional, Tuple
+
+# Coverage channels of the store; every format maps its value columns onto these
+CHANNELS = ('Y', 'M', 'C', 'K')
+
+# Lines ending a coverage table (matched case-insensitively)
+END_MARKERS = ('coverage page data', '====', 'printer', 'custom')
+
+FOUR_COLUMN_HEADER = "Coverage Y(%)    Coverage M(%)    Coverage C(%)    Coverage K(%)"
+
+
+def is_latin1_text(token: str) -> bool:
+    try:
+        return bool(token.encode('latin-1'))
+    except UnicodeEncodeError:
+        return False
+
+
+def token_alternation(tokens) -> str:
+    """Regex source matching any of tokens, factored into a prefix tree
+
+    A flat 'a|b|c' alternation makes the regex engine try every token at
+    every position; branching on one character at a time keeps a search
+    at about one character test per position however many tokens there
+    are. Where one token is a prefix of another, the longer one matches.
+    """
+    tree = {}
+    for token in tokens:
+        node = tree
+        for char in token:
+            node = node.setdefault(char, {})
+        node[''] = None
+
+    def branch(node) -> str:
+        branches = [re.escape(char) + branch(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        source = branches[0] if len(branches) == 1 and '' not in node else '(?:' + '|'.join(branches) + ')'
+        return source + '?' if '' in node else source
+
+    return branch(tree)
+
+
+class ReportFormat:
+    """One coverage table layout: how it is detected, where its table starts and how its rows parse
+
+    name is the format_type stored with the report's rows. A report is read
+    with this format when signature occurs in it (only the registry's
+    fallback format has no signature). The table starts after a line
+    holding both 'Section' and header_token; each later line is a section
+    row (a section_pattern label) or a 'total' row followed by one value per
+    column, separated by whitespace, until a line with an end marker.
+    columns lists (sheet label, channel) per value column: the channel
+    (one of CHANNELS) the value is stored as, or None to drop the value.
+    Channels no column maps to are stored as 0.0.
+    """
+
+    def __init__(self, name: str, header_token: str, columns: Tuple[Tuple[str, Optional[str]], ...],
+                 signature: Optional[str] = None, label: Optional[str] = None,
+                 section_pattern: str = r'\d+K-\d+K', value_pattern: str = r'\d+\.?\d*',
+                 end_markers: Tuple[str, ...] = END_MARKERS):
+        channels = [channel for _, channel in columns if channel is not None]
+        if not columns or any(channel not in CHANNELS for channel in channels) or len(set(channels)) < len(channels):
+            raise ValueError(f"Format {name!r}: columns must map to distinct channels among {', '.join(CHANNELS)}")
+        for token in (header_token, signature):
+            if token is not None and (not is_latin1_text(token) or '\n' in token):
+                # Byte-level scans search the tokens in the raw bytes as latin-1, and within single lines
+                raise ValueError(f"Format {name!r}: header_token and signature must be non-empty latin-1 text on one line")
+        self.name = name
+        self.header_token = header_token
+        self.columns = tuple(columns)
+        self.signature = signature
+        self.label = label or name
+        self.end_markers = tuple(end_markers)
+        # Row grammar, applied to decoded lines for str and bytes input alike
+        values = r'\s+'.join([f'({value_pattern})'] * len(columns))
+        self.section_pattern = re.compile(f'^({section_pattern})\\s+' + values + '$')
+        self.total_pattern = re.compile(r'^total\s+' + values + '$', re.IGNORECASE)
+        # (value position, CHANNELS index) of the stored values
+        self.value_slots = tuple((position, CHANNELS.index(channel))
+                                 for position, (_, channel) in enumerate(columns) if channel is not None)
+        # Exactly Y, M, C, K in order: values are converted without the generic mapping
+        self.all_channels = tuple(channel for _, channel in columns) == CHANNELS
+
+    @property
+    def channels(self) -> Tuple[str, ...]:
+        """Stored channels, in column order"""
+        return tuple(channel for _, channel in self.columns if channel is not None)
+
+    @property
+    def column_labels(self) -> Tuple[str, ...]:
+        """Sheet headers of the stored channels"""
+        return tuple(label for label, channel in self.columns if channel is not None)
+
+    def parse_values(self, values: Tuple[str, ...]) -> Tuple[float, ...]:
+        """Y, M, C, K floats of a row's matched value strings (0.0 for channels no column maps to)"""
+        if self.all_channels:
+            y, m, c, k = values
+            return float(y), float(m), float(c), float(k)
+        row = [0.0] * len(CHANNELS)
+        for position, index in self.value_slots:
+            row[index] = float(values[position])
+        return tuple(row)
+
+
+class FormatRegistry:
+    """Report formats in registration order, detected with one pattern over every signature
+
+    The signatures are compiled into a single prefix-tree pattern, so
+    detection is one regex pass whose cost stays flat as formats are added;
+    the signature found earliest in a report wins (at the same position,
+    the longest one). Reports without any signature use the fallback format.
+
+    Formats must be registered at import time so process-pool workers see
+    them too. Registering one can change extraction results: bump
+    text_extractor.EXTRACTOR_VERSION (or pass ParseCache a new version) so
+    persisted parse caches are not reused.
+    """
+
+    def __init__(self):
+        self.formats = {}
+        self.fallback = None
+        self.signature_pattern = None
+        self.signature_byte_pattern = None
+        # Formats with a signature, by signature text (str and latin-1 bytes)
+        self._signed = {}
+        self._watch_patterns = {}
+
+    def register(self, report_format: ReportFormat, fallback: bool = False) -> ReportFormat:
+        """Add a format; exactly one, the fallback, has no signature"""
+        if report_format.name in self.formats:
+            raise ValueError(f"Format {report_format.name!r} is already registered")
+        if fallback and self.fallback is not None:
+            raise ValueError(f"Format {self.fallback.name!r} is already the fallback")
+        if fallback and report_format.signature is not None:
+            raise ValueError("The fallback format cannot have a signature")
+        if not fallback and report_format.signature is None:
+            raise ValueError(f"Format {report_format.name!r} needs a signature")
+        if report_format.signature in self._signed:
+            raise ValueError(f"Format {report_format.name!r}: signature {report_format.signature!r} is already registered")
+        self.formats[report_format.name] = report_format
+        if fallback:
+            self.fallback = report_format
+        signed = [known for known in self.formats.values() if known.signature is not None]
+        self._signed = {known.signature: known for known in signed}
+        self._signed.update((known.signature.encode('latin-1'), known) for known in signed)
+        if signed:
+            alternation = token_alternation(known.signature for known in signed)
+            self.signature_pattern = re.compile(alternation)
+            self.signature_byte_pattern = re.compile(alternation.encode('latin-1'))
+        self._watch_patterns.clear()
+        return report_format
+
+    def __iter__(self) -> Iterator[ReportFormat]:
+        return iter(self.formats.values())
+
+    def __len__(self):
+        return len(self.formats)
+
+    def get(self, name: str) -> Optional[ReportFormat]:
+        return self.formats.get(name)
+
+    def match_signature(self, text, pos: int = 0) -> Optional[ReportFormat]:
+        """The format whose signature occurs first in text (str, or bytes-like read as latin-1), if any"""
+        pattern = self.signature_pattern if isinstance(text, str) else self.signature_byte_pattern
+        match = pattern.search(text, pos) if pattern is not None else None
+        return None if match is None else self.signed_format(match)
+
+    def signed_format(self, match) -> ReportFormat:
+        """The format of a signature_pattern (or signature_byte_pattern) match"""
+        return self._signed[match.group()]
+
+    def detect(self, content) -> ReportFormat:
+        """The format a report is read with: the first signature found in it, or the fallback"""
+        return self.match_signature(content) or self.fallback
+
+    def watch_pattern(self, tokens: Tuple[str, ...], binary: bool = False):
+        """Compiled pattern finding any of tokens (a bytes pattern if binary), cached per token set"""
+        key = (tokens, binary)
+        pattern = self._watch_patterns.get(key)
+        if pattern is None:
+            tokens = list(dict.fromkeys(tokens))
+            # A token containing another one can only occur where the shorter one does
+            tokens = [token for token in tokens if not any(other != token and other in token for other in tokens)]
+            alternation = token_alternation(tokens)
+            pattern = re.compile(alternation.encode('latin-1') if binary else alternation)
+            self._watch_patterns[key] = pattern
+        return pattern
+
+    def sheet_columns(self, name: str) -> Tuple[Tuple[str, ...], Tuple[int, ...]]:
+        """Sheet headers and CHANNELS positions of the values of a format (all four for unknown names)"""
+        report_format = self.formats.get(name)
+        if report_format is None:
+            return tuple(f"Coverage {channel}(%)" for channel in CHANNELS), tuple(range(len(CHANNELS)))
+        return report_format.column_labels, tuple(CHANNELS.index(channel) for channel in report_format.channels)
+
+
+# The layouts found in the field; register new ones here (or from a module imported at startup)
+REPORT_FORMATS = FormatRegistry()
+REPORT_FORMATS.register(ReportFormat(
+    '1-column', 'Coverage(%)', (('Coverage(%)', 'Y'),), label='Mono'
+), fallback=True)
+REPORT_FORMATS.register(ReportFormat(
+    '4-column', 'Coverage Y(%)', tuple((f"Coverage {channel}(%)", channel) for channel in CHANNELS),
+    signature=FOUR_COLUMN_HEADER, label='Multi Coverage'
+))
@@ -0,0 +1,213 @@
+import bisect
+import math
+from typing import Dict, List, Optional
+
+import numpy as np
+from coverage_store import VALUE_COLUMNS
+from report_formats import CHANNELS, REPORT_FORMATS
+
+# add_coverage_rows folds pending rows into the aggregates once this many have accumulated
+FOLD_ROWS = 64 * 1024
+
+
+def is_total_section(section) -> bool:
+    """True for the Total row of a report (matched like the app preview does)"""
+    return section is not None and str(section).lower().strip() == 'total'
+
+
+def stored_channels(store, format_codes: np.ndarray) -> np.ndarray:
+    """(rows, 4) mask of the channels each row's format stores, given the rows' Format_Type codes
+
+    A format's other channels hold 0.0 placeholders (M/C/K of a 1-column
+    report), which are not coverage and must not be averaged in.
+    """
+    formats = store.categories['Format_Type'].values
+    table = np.zeros((len(formats), len(CHANNELS)), dtype=bool)
+    for code, format_type in enumerate(formats):
+        table[code, list(REPORT_FORMATS.sheet_columns(format_type)[1])] = True
+    return table[format_codes]
+
+
+class RunningStats:
+    """Count, mean, min, max and sum of squared deviations of Y/M/C/K for one key (count is per channel)"""
+    __slots__ = ('count', 'mean', 'm2', 'minimum', 'maximum')
+
+    def __init__(self, count: List[int], mean: List[float], m2: List[float], minimum: List[float], maximum: List[float]):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def variance(self, ddof: int = 0) -> List[float]:
+        """Per-channel variance (population by default, ddof=1 for the sample variance)"""
+        return [m2 / (count - ddof) if count > ddof else math.nan for count, m2 in zip(self.count, self.m2)]
+
+    def as_dict(self) -> Dict[str, Dict[str, float]]:
+        """{channel: {count, sum, mean, min, max, variance}}"""
+        variance = self.variance()
+        return {
+            channel: {
+                'count': self.count[i],
+                'sum': self.mean[i] * self.count[i],
+                'mean': self.mean[i] if self.count[i] else math.nan,
+                'min': self.minimum[i] if self.count[i] else math.nan,
+                'max': self.maximum[i] if self.count[i] else math.nan,
+                'variance': variance[i]
+            }
+            for i, channel in enumerate(CHANNELS)
+        }
+
+
+class GroupedStats:
+    """Running statistics of Y/M/C/K per integer key, one array row per key
+
+    Blocks of rows are folded in with Chan's parallel form of Welford's
+    online update: the block's per-key count, mean and squared deviations
+    come from np.bincount and are merged into the running values, so the
+    cost of a block is a few vectorized passes over it. Counts are kept per
+    channel, as rows only count for the channels they store.
+    """
+
+    def __init__(self):
+        self.count = np.zeros((0, len(CHANNELS)), dtype=np.int64)
+        self.mean = np.zeros((0, len(CHANNELS)))
+        self.m2 = np.zeros((0, len(CHANNELS)))
+        self.minimum = np.zeros((0, len(CHANNELS)))
+        self.maximum = np.zeros((0, len(CHANNELS)))
+
+    def _grow(self, size: int):
+        extra = size - len(self.count)
+        if extra <= 0:
+            return
+        channels = len(CHANNELS)
+        self.count = np.vstack([self.count, np.zeros((extra, channels), dtype=np.int64)])
+        self.mean = np.vstack([self.mean, np.zeros((extra, channels))])
+        self.m2 = np.vstack([self.m2, np.zeros((extra, channels))])
+        self.minimum = np.vstack([self.minimum, np.full((extra, channels), np.inf)])
+        self.maximum = np.vstack([self.maximum, np.full((extra, channels), -np.inf)])
+
+    def update(self, keys: np.ndarray, values: np.ndarray, valid: Optional[np.ndarray] = None):
+        """Fold in rows: keys has one int per row, values is (rows, 4)
+
+        valid is a (rows, 4) mask of the values to fold in (default: every
+        value that is not NaN).
+        """
+        if not len(keys):
+            return
+        if valid is None:
+            valid = ~np.isnan(values)
+        size = int(keys.max()) + 1
+        self._grow(size)
+
+        for i in range(len(CHANNELS)):
+            channel_keys = keys[valid[:, i]]
+            column = values[valid[:, i], i]
+            key_count = np.bincount(channel_keys, minlength=size)
+            present = np.flatnonzero(key_count)
+            if not len(present):
+                continue
+            block_count = key_count[present]
+            count = self.count[present, i]
+            total = count + block_count
+            key_mean = np.bincount(channel_keys, weights=column, minlength=size) / np.maximum(key_count, 1)
+            deviation = column - key_mean[channel_keys]
+            block_m2 = np.bincount(channel_keys, weights=deviation * deviation, minlength=size)[present]
+            delta = key_mean[present] - self.mean[present, i]
+            self.mean[present, i] += delta * block_count / total
+            self.m2[present, i] += block_m2 + delta * delta * count * block_count / total
+            np.minimum.at(self.minimum[:, i], channel_keys, column)
+            np.maximum.at(self.maximum[:, i], channel_keys, column)
+            self.count[present, i] = total
+
+    def get(self, key: int) -> Optional[RunningStats]:
+        if key >= len(self.count) or not self.count[key].any():
+            return None
+        return RunningStats(self.count[key].tolist(), self.mean[key].tolist(), self.m2[key].tolist(),
+                            self.minimum[key].tolist(), self.maximum[key].tolist())
+
+    def combined(self) -> RunningStats:
+        """Statistics of every key merged"""
+        count = self.count.sum(axis=0)
+        weights = self.count
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(count > 0, (self.mean * weights).sum(axis=0) / count, 0.0)
+        m2 = self.m2.sum(axis=0) + (weights * (self.mean - mean) ** 2).sum(axis=0)
+        # Keys without a value of a channel keep its inf/-inf starting bounds
+        minimum = self.minimum.min(axis=0) if len(self.count) else np.full(len(CHANNELS), np.inf)
+        maximum = self.maximum.max(axis=0) if len(self.count) else np.full(len(CHANNELS), -np.inf)
+        return RunningStats(count.tolist(), mean.tolist(), m2.tolist(), minimum.tolist(), maximum.tolist())
+
+
+class CoverageAggregates:
+    """Running Y/M/C/K statistics of a CoverageStore per device, per section and per format
+
+    Rows are folded in incrementally: each fold only reads the files added
+    since the previous one, straight from the store's buffers (or spill
+    files) a bounded block at a time, so a lookup is O(1) once the
+    aggregates are current. Device and format statistics cover section
+    rows only (the Total row already summarizes the others, and the app's
+    averages leave it out too); section statistics are keyed by section
+    name, Total included. Channels a format does not store are left out
+    (see stored_channels), so counts differ per channel. Removing files from the store renumbers its files
+    and codes, so the next fold after one starts over.
+    """
+
+    SCOPES = {'device': 'Device_ID', 'section': 'Section', 'format': 'Format_Type'}
+
+    def __init__(self, store):
+        self.store = store
+        self.reset()
+
+    def reset(self):
+        self.stats = {scope: GroupedStats() for scope in self.SCOPES}
+        self.folded_files = 0
+        self.folded_version = self.store.version
+
+    @property
+    def pending_rows(self) -> int:
+        store = self.store
+        if store.rebuild_version > self.folded_version:
+            return len(store)
+        if self.folded_files == store.file_count:
+            return 0
+        return len(store) - store.file_starts[self.folded_files]
+
+    def fold(self):
+        """Fold the files appended since the last fold into the running statistics"""
+        store = self.store
+        if store.rebuild_version > self.folded_version:
+            self.reset()
+        first, last = self.folded_files, store.file_count
+        self.folded_version = store.version
+        while first < last:
+            # About FOLD_ROWS rows per step, so refolding a whole (possibly spilled) store stays bounded
+            stop = bisect.bisect_right(store.file_stops, store.file_starts[first] + FOLD_ROWS, first, last)
+            self._fold_files(first, max(stop, first + 1))
+            first = self.folded_files
+
+    def _fold_files(self, first: int, last: int):
+        store = self.store
+        start, stop = store.file_starts[first], store.file_stops[last - 1]
+        lengths = np.array(store.file_stops[first:last], dtype=np.int64) - np.array(store.file_starts[first:last], dtype=np.int64)
+        values = np.column_stack([store.row_slice(name, start, stop) for name in VALUE_COLUMNS])
+        sections = store.row_slice('Section', start, stop).astype(np.int64)
+        is_section_row = ~np.isin(sections, store.codes_where('Section', is_total_section))
+        codes = {
+            scope: np.repeat(np.array(store.file_codes[column][first:last], dtype=np.int64), lengths)
+            for scope, column in self.SCOPES.items() if scope != 'section'
+        }
+        valid = stored_channels(store, codes['format']) & ~np.isnan(values)
+
+        self.stats['section'].update(sections, values, valid)
+        for scope in ('device', 'format'):
+            self.stats[scope].update(codes[scope][is_section_row], values[is_section_row], valid[is_section_row])
+        self.folded_files = last
+
+    def get(self, scope: str, key=None) -> Optional[RunningStats]:
+        """Stats of one key, or of every key of the scope merged when key is None"""
+        self.fold()
+        if key is None:
+            return self.stats[scope].combined()
+        code = self.store.categories[self.SCOPES[scope]].codes.get(key)
+        return None if code is None else self.stats[scope].get(code)
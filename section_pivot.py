@@ -0,0 +1,175 @@
+import warnings
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from coverage_store import VALUE_COLUMNS, CoverageView
+from report_formats import CHANNELS
+from running_stats import is_total_section, stored_channels
+
+# 'lowK-highK' section labels; the unit suffix is optional and case-insensitive
+SECTION_RANGE_PATTERN = r'^\s*(\d+(?:\.\d+)?)\s*([kKmM]?)\s*-\s*(\d+(?:\.\d+)?)\s*([kKmM]?)\s*$'
+UNIT_SCALES = {'': 1.0, 'K': 1e3, 'M': 1e6}
+DEFAULT_PERCENTILES = (10, 50, 90)
+
+
+def section_ranges(labels: Sequence[str]) -> np.ndarray:
+    """(len(labels), 2) float array of the [low, high] bound of each 'lowK-highK' label, NaN where not a range"""
+    if not len(labels):
+        return np.zeros((0, 2))
+    parts = pd.Series(labels, dtype=object).astype(str).str.extract(SECTION_RANGE_PATTERN)
+    ranges = np.empty((len(labels), 2))
+    for bound, (number, unit) in enumerate(((0, 1), (2, 3))):
+        scale = parts[unit].fillna('').str.upper().map(UNIT_SCALES).to_numpy(dtype=float)
+        ranges[:, bound] = parts[number].astype(float).to_numpy() * scale
+    return ranges
+
+
+def section_order(labels: Sequence[str]) -> np.ndarray:
+    """Indices sorting labels by numeric range (low, then high); other labels follow in their given order"""
+    ranges = section_ranges(labels)
+    # lexsort's last key is the primary one; NaN bounds sort after every number
+    return np.lexsort((np.arange(len(labels)), ranges[:, 1], ranges[:, 0]))
+
+
+def nan_percentiles(matrix: np.ndarray, percentiles: Sequence[float]) -> np.ndarray:
+    """(len(percentiles), columns) linearly interpolated percentiles of each column, ignoring NaN
+
+    Matches np.nanpercentile along axis 0, without its per-column loop for
+    columns holding NaN; all-NaN columns give NaN.
+    """
+    rows, columns = matrix.shape
+    result = np.full((len(percentiles), columns), np.nan)
+    if not rows:
+        return result
+    ordered = np.sort(matrix, axis=0)
+    valid = rows - np.isnan(matrix).sum(axis=0)
+    last = np.maximum(valid - 1, 0)
+    positions = last[None, :] * (np.asarray(percentiles, dtype=float)[:, None] / 100)
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.minimum(lower + 1, last[None, :])
+    low_values = np.take_along_axis(ordered, lower, axis=0)
+    high_values = np.take_along_axis(ordered, upper, axis=0)
+    fraction = positions - lower
+    with np.errstate(invalid='ignore'):
+        interpolated = low_values + (high_values - low_values) * fraction
+    # At a whole position the lower value is exact (avoids inf - inf)
+    interpolated = np.where(fraction == 0, low_values, interpolated)
+    present = valid > 0
+    result[:, present] = interpolated[:, present]
+    return result
+
+
+class SectionPivot:
+    """Devices x sections matrices of mean coverage per channel, with fleet summary rows
+
+    values[channel] is (len(devices), len(sections)): the mean of the
+    device's rows for that section (all of its reports in the view), NaN
+    where it has none or its format does not store the channel. Sections
+    are sorted by numeric range; Total rows are left out.
+    """
+
+    def __init__(self, devices: List[str], sections: List[str], ranges: np.ndarray, values: Dict[str, np.ndarray],
+                 counts: Dict[str, np.ndarray], percentiles: Sequence[float] = DEFAULT_PERCENTILES):
+        self.devices = devices
+        self.sections = sections
+        self.ranges = ranges
+        self.values = values
+        self.counts = counts
+        self.percentiles = tuple(percentiles)
+
+    def __len__(self):
+        return len(self.devices)
+
+    @property
+    def channels(self) -> List[str]:
+        """Channels with at least one value"""
+        return [channel for channel in CHANNELS if self.counts[channel].any()]
+
+    def summary_labels(self) -> List[str]:
+        return ['Fleet mean'] + [f"P{percentile:g}" for percentile in self.percentiles] + ['Devices']
+
+    def summary(self, channel: str) -> np.ndarray:
+        """(len(summary_labels()), len(sections)) fleet rows: mean over devices, percentiles, devices with a value"""
+        matrix = self.values[channel]
+        reporting = (~np.isnan(matrix)).sum(axis=0)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            mean = np.nansum(matrix, axis=0) / reporting
+        mean[reporting == 0] = np.nan
+        return np.vstack([mean, nan_percentiles(matrix, self.percentiles), reporting])
+
+    def frame(self, channel: str) -> pd.DataFrame:
+        """Fleet summary rows followed by one row per device, one column per section"""
+        data = np.vstack([self.summary(channel), self.values[channel]])
+        index = pd.Index(self.summary_labels() + self.devices, name='Device ID')
+        return pd.DataFrame(data, index=index, columns=pd.Index(self.sections, name='Section'))
+
+
+def build_section_pivot(view: CoverageView, percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> SectionPivot:
+    """Pivot a view's rows into per-channel devices x sections means, vectorized over the rows
+
+    Devices keep their first-appearance order (the workbook's sheet order).
+    Each row is mapped to a matrix cell by code lookups, and every
+    channel's sums and counts come from one np.bincount over the rows.
+    """
+    store = view.store
+    device_codes = view.column('Device_ID').astype(np.int64)
+    section_codes = view.column('Section').astype(np.int64)
+    labels = store.categories['Section'].values
+
+    # Sections present in the view, Total left out, in numeric order
+    present = np.bincount(section_codes, minlength=len(labels)) > 0
+    present[store.codes_where('Section', is_total_section)] = False
+    section_codes_used = np.flatnonzero(present)
+    order = section_order([labels[code] for code in section_codes_used])
+    section_codes_used = section_codes_used[order]
+    section_column = np.full(len(labels), -1, dtype=np.int64)
+    section_column[section_codes_used] = np.arange(len(section_codes_used))
+
+    keep = section_column[section_codes] >= 0
+    device_codes = device_codes[keep]
+    unique_devices, first_rows = np.unique(device_codes, return_index=True)
+    device_codes_used = unique_devices[np.argsort(first_rows, kind='stable')]
+    device_row = np.zeros(len(store.categories['Device_ID']), dtype=np.int64)
+    device_row[device_codes_used] = np.arange(len(device_codes_used))
+
+    shape = (len(device_codes_used), len(section_codes_used))
+    cells = device_row[device_codes] * shape[1] + section_column[section_codes[keep]]
+    # Channels a format does not store hold 0.0 placeholders, not coverage
+    stored = stored_channels(store, view.column('Format_Type')[keep].astype(np.int64))
+    values, counts = {}, {}
+    for index, (channel, name) in enumerate(zip(CHANNELS, VALUE_COLUMNS)):
+        column = view.column(name)[keep]
+        valid = stored[:, index] & ~np.isnan(column)
+        size = shape[0] * shape[1]
+        count = np.bincount(cells[valid], minlength=size)
+        total = np.bincount(cells[valid], weights=column[valid], minlength=size)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / count
+        mean[count == 0] = np.nan
+        values[channel] = mean.reshape(shape)
+        counts[channel] = count.reshape(shape)
+
+    return SectionPivot(
+        store.decode('Device_ID', device_codes_used),
+        store.decode('Section', section_codes_used),
+        section_ranges([labels[code] for code in section_codes_used]),
+        values, counts, percentiles
+    )
+
+
+def pivot_sheet_rows(pivot: SectionPivot, channels: Optional[Sequence[str]] = None) -> List[List]:
+    """Rows of a summary sheet: per channel, a title, the header, the fleet rows and one row per device"""
+    rows = []
+    labels = pivot.summary_labels()
+    for channel in channels or pivot.channels:
+        if rows:
+            rows.append([])
+        rows.append([f"Coverage {channel}(%) by section", f"{len(pivot)} devices"])
+        rows.append(['Device ID', *pivot.sections])
+        data = np.vstack([pivot.summary(channel), pivot.values[channel]])
+        # Empty cells instead of NaN, which Excel cannot store
+        cells = np.where(np.isnan(data), None, data.astype(object)).tolist()
+        rows.extend([label, *row] for label, row in zip(labels + pivot.devices, cells))
+    return rows
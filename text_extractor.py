@@ -1,236 +1,473 @@
+import mmap
+import os
 import re
+import time
+from array import array
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
+from record_batch import TOTAL_SECTION, CoverageBatch, ReportHeader
+from report_formats import REPORT_FORMATS, FormatRegistry, ReportFormat
+
+# Bump whenever a change can alter extraction results; persisted parse caches key on it
+EXTRACTOR_VERSION = 1
+
+# Device ID patterns, in priority order
+DEVICE_ID_PATTERNS = [
+    re.compile(r'A\d{1,2}[A-Z]{1,4}\d{1,2}T\d{7}'),  # A9VE0T1000157, A92W0T1000173
+    re.compile(r'A\d{1,2}[A-Z]{1,4}\d{9,12}'),       # A7V0041000334, A9JU041000442
+    re.compile(r'A\d{2,4}T\d{7}'),                   # A7990T1000233
+]
+
+# Date patterns, in priority order
+DATE_PATTERNS = [
+    re.compile(r'(\d{2}\/\d{2}\/\d{4})\s+(\d{2}:\d{2})'),  # 30/11/2024 14:56
+    re.compile(r'(\d{1,2}\/\d{1,2}\/\d{4})\s+(\d{1,2}:\d{2})'),  # 4/07/2025 20:48
+    re.compile(r'(\d{2}\/\d{2}\/\d{4})'),
+    re.compile(r'(\d{1,2}\/\d{1,2}\/\d{4})'),
+]
+DATE_SEARCH_LINES = 10
+
+# Filename pattern: YYYY_MMDD_HHMM
+FILENAME_DATE_PATTERN = re.compile(r'(\d{4})_(\d{2})(\d{2})_(\d{2})(\d{2})')
+
+# Extracted dates are day first: 30/11/2024 14:56, 4/07/2025 20:48, 30/11/2024
+REPORT_DATE_FORMATS = ('%d/%m/%Y %H:%M', '%d/%m/%Y')
+
+# Byte versions of the device ID patterns for searching undecoded content. In
+# latin-1 \d only matches ASCII digits, so they match exactly what the str
+# patterns match in the same bytes decoded as latin-1.
+DEVICE_ID_BYTE_PATTERNS = [re.compile(pattern.pattern.encode('ascii')) for pattern in DEVICE_ID_PATTERNS]
+# mmap has no isascii(); it is checked in slices of this size
+ASCII_CHECK_BYTES = 1024 * 1024
+
+
+class CoverageBlock:
+    """Line-at-a-time state machine that collects one coverage table"""
+    __slots__ = ('report_format', 'started', 'done', 'sections', 'values', 'total_first', 'total_values')
+
+    def __init__(self, report_format: ReportFormat):
+        self.report_format = report_format
+        self.started = False
+        self.done = False
+        self.sections = []
+        # Y/M/C/K per row, row-major (see record_batch.CoverageBatch)
+        self.values = array('d')
+        # Whether the Total row sits in row 0; a Total after section rows waits in total_values
+        self.total_first = False
+        self.total_values = None
+
+    def feed(self, line: str):
+        """Consume one raw line; sets done once an end marker is reached"""
+        report_format = self.report_format
+        # Start extraction ONLY after finding the exact header
+        if "Section" in line and report_format.header_token in line:
+            self.started = True
+            return
+
+        # Skip lines before coverage section
+        if not self.started:
+            return
+
+        line = line.strip()
+
+        # Skip separator lines and empty lines
+        if line.startswith('-') or len(line) < 3:
+            return
+
+        # Stop if we hit another section or end markers
+        lowered = line.lower()
+        if any(marker in lowered for marker in report_format.end_markers):
+            self.done = True
+            return
+
+        # Check for Total row
+        total_match = report_format.total_pattern.match(line)
+        if total_match:
+            values = report_format.parse_values(total_match.groups())
+            if self.total_first:
+                # A later Total row replaces the earlier one
+                self.values[:len(values)] = array('d', values)
+            elif not self.sections:
+                self.total_first = True
+                self.sections.append(TOTAL_SECTION)
+                self.values.extend(values)
+            else:
+                self.total_values = values
+            return
+
+        # Check for section data
+        section_match = report_format.section_pattern.match(line)
+        if section_match:
+            try:
+                values = report_format.parse_values(section_match.groups()[1:])
+            except ValueError:
+                return
+            self.sections.append(section_match.group(1))
+            self.values.extend(values)
+
+    def batch(self, device_id: Optional[str] = None, date: Optional[str] = None) -> CoverageBatch:
+        """Collected rows with the Total row first, if found"""
+        header = ReportHeader(device_id, date, None, self.report_format.name)
+        if self.total_values is None:
+            return CoverageBatch(header, self.sections, self.values)
+        return CoverageBatch(header, [TOTAL_SECTION] + self.sections, array('d', self.total_values) + self.values)
+
+    def coverage_data(self) -> List[Dict]:
+        """Collected rows as row dicts, with the Total row first, if found"""
+        return self.batch().coverage_data()
+
+
+class ScanState:
+    """Per-report state advanced one line at a time by ReportScanner
+
+    With report_format given (found up front), only its table is collected.
+    Otherwise every registered format's table is collected side by side
+    until a line holds a signature; from then on only that format's is.
+    detected is the CoverageBlock of the format in use once it is known.
+    """
+    __slots__ = ('formats', 'blocks', 'signature_search', 'detected', 'device_id', 'device_rank', 'date', 'line_no')
+
+    def __init__(self, formats: FormatRegistry, report_format: Optional[ReportFormat] = None):
+        self.formats = formats
+        if report_format is not None:
+            self.detected = CoverageBlock(report_format)
+            self.blocks = {report_format.name: self.detected}
+            self.signature_search = None
+        else:
+            self.detected = None
+            self.blocks = {name: CoverageBlock(known) for name, known in formats.formats.items()}
+            # One search per line finds any format's signature
+            self.signature_search = formats.signature_pattern.search if formats.signature_pattern is not None else None
+        self.device_id = None
+        self.device_rank = len(DEVICE_ID_PATTERNS)
+        self.date = None
+        self.line_no = 0
+
+    def feed(self, line: str):
+        """Consume one line (without its trailing newline)"""
+        if self.line_no < DATE_SEARCH_LINES and self.date is None:
+            self.date = match_date(line)
+        self.line_no += 1
+
+        for rank in range(self.device_rank):
+            match = DEVICE_ID_PATTERNS[rank].search(line)
+            if match:
+                self.device_id = match.group(0)
+                self.device_rank = rank
+                break
+
+        detected = self.detected
+        if detected is None and self.signature_search is not None:
+            match = self.signature_search(line)
+            if match:
+                detected = self.detected = self.blocks[self.formats.signed_format(match).name]
+        if detected is not None:
+            if not detected.done:
+                detected.feed(line)
+            return
+        for block in self.blocks.values():
+            if not block.done:
+                block.feed(line)
+
+    def pending_tokens(self) -> Optional[Tuple[str, ...]]:
+        """What later lines can still change, ignoring the device ID
+
+        None while lines must still be fed in full; () once nothing later
+        matters; otherwise the tokens whose later appearance could change
+        the result: the signatures of the formats with a signature, plus the
+        table headers of those whose table has not started.
+        """
+        if self.date is None and self.line_no < DATE_SEARCH_LINES:
+            return None
+        if self.detected is not None:
+            return () if self.detected.done else None
+        fallback = self.formats.fallback
+        if not self.blocks[fallback.name].done:
+            return None
+        tokens = []
+        for name, block in self.blocks.items():
+            if name == fallback.name:
+                continue
+            if block.started and not block.done:
+                return None
+            tokens.append(block.report_format.signature)
+            if not block.started:
+                tokens.append(block.report_format.header_token)
+        return tuple(tokens)
+
+    def result(self) -> CoverageBatch:
+        block = self.detected or self.blocks[self.formats.fallback.name]
+        return block.batch(self.device_id, self.date)
+
+
+class ReportScanner:
+    """Single-pass scanner for format, device ID, date and coverage rows"""
+
+    def __init__(self, formats: FormatRegistry = REPORT_FORMATS):
+        self.formats = formats
+
+    def scan(self, content) -> CoverageBatch:
+        """Walk the report once and return its rows, device ID, date and format as a CoverageBatch
+
+        The format is settled first by one C-level search for every
+        registered signature at once, so only its table is collected. The
+        walk stops as soon as that table has ended; the remainder is only
+        searched for a higher-priority device ID, so results match the
+        multi-pass extract_* methods exactly.
+
+        content may also be bytes, bytearray or mmap, read as latin-1: only
+        the lines the walk feeds are decoded; searches run on the raw bytes.
+        """
+        state = ScanState(self.formats, self.formats.detect(content))
+        binary = not isinstance(content, str)
+        newline_token = b'\n' if binary else '\n'
+        device_patterns = DEVICE_ID_BYTE_PATTERNS if binary else DEVICE_ID_PATTERNS
+        pos = 0
+        end = len(content)
+
+        while pos <= end:
+            newline = content.find(newline_token, pos)
+            if newline == -1:
+                newline = end
+            line = content[pos:newline]
+            state.feed(line.decode('latin-1') if binary else line)
+            pos = newline + 1
+
+            if pos > end or state.pending_tokens() is None:
+                continue
+
+            # The table has ended: resolve the device ID over the rest in one search, then stop
+            if state.device_rank:
+                for rank in range(state.device_rank):
+                    match = device_patterns[rank].search(content, pos)
+                    if match:
+                        state.device_id = match.group(0).decode('ascii') if binary else match.group(0)
+                        break
+            break
+
+        return state.result()
+
+    def scan_lines(self, lines: Iterable[str]) -> CoverageBatch:
+        """Same as scan, for reports arriving as an iterable of lines without newlines
+
+        Only the current line and the collected coverage rows are held in
+        memory, and the iterable is abandoned once nothing later can matter.
+        """
+        state = ScanState(self.formats)
+        lines = iter(lines)
+        for line in lines:
+            state.feed(line)
+            if state.device_rank:
+                continue
+            tokens = state.pending_tokens()
+            if tokens is None:
+                continue
+            if not tokens:
+                break
+            # Only a line containing one of the tokens can change anything now
+            pattern = self.formats.watch_pattern(tokens)
+            for line in lines:
+                if pattern.search(line):
+                    state.feed(line)
+                    break
+            else:
+                break
+
+        return state.result()
+
+
+def match_date(line: str) -> Optional[str]:
+    """Return the first DATE_PATTERNS match in a line"""
+    for pattern in DATE_PATTERNS:
+        match = pattern.search(line)
+        if match:
+            return f"{match.group(1)} {match.group(2)}" if len(match.groups()) == 2 else match.group(1)
+    return None
+
+
+def is_ascii(data) -> bool:
+    """bytes.isascii() for bytes, bytearray or mmap"""
+    if not isinstance(data, mmap.mmap):
+        return data.isascii()
+    return all(data[start:start + ASCII_CHECK_BYTES].isascii() for start in range(0, len(data), ASCII_CHECK_BYTES))
+
+
+def parse_report_date(date: Optional[str]) -> Optional[datetime]:
+    """Parse an extracted date string into a datetime, or None if it is not a valid date"""
+    if not date:
+        return None
+    for date_format in REPORT_DATE_FORMATS:
+        try:
+            return datetime.strptime(date, date_format)
+        except ValueError:
+            continue
+    return None
+
 
 class TextExtractor:
-    def __init__(self):
-        pass
+    def __init__(self, formats: FormatRegistry = REPORT_FORMATS):
+        self.formats = formats
+        self.scanner = ReportScanner(formats)
+        # Optional instrumentation.Instrumentation; records 'decode' and 'scan' times into its current file
+        self.instrumentation = None
     
     def extract_device_id(self, content: str) -> Optional[str]:
         """Extract device ID from text content"""
-        patterns = [
-            r'A\d{1,2}[A-Z]{1,4}\d{1,2}T\d{7}',  # A9VE0T1000157, A92W0T1000173
-            r'A\d{1,2}[A-Z]{1,4}\d{9,12}',       # A7V0041000334, A9JU041000442
-            r'A\d{2,4}T\d{7}',                   # A7990T1000233
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, content)
-            if matches:
-                return matches[0]
+        for pattern in DEVICE_ID_PATTERNS:
+            match = pattern.search(content)
+            if match:
+                return match.group(0)
         return None
     
     def extract_device_id_from_filename(self, filename: str) -> Optional[str]:
         """Extract device ID from filename"""
-        patterns = [
-            r'A\d{1,2}[A-Z]{1,4}\d{1,2}T\d{7}',
-            r'A\d{1,2}[A-Z]{1,4}\d{9,12}',
-            r'A\d{2,4}T\d{7}',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, filename)
+        for pattern in DEVICE_ID_PATTERNS:
+            match = pattern.search(filename)
             if match:
                 return match.group(0)
         return None
     
     def extract_date(self, content: str) -> Optional[str]:
         """Extract date from text content"""
-        lines = content.split('\n')[:10]  # Only first 10 lines
+        lines = content.split('\n', DATE_SEARCH_LINES)[:DATE_SEARCH_LINES]  # Only first 10 lines
         
         for line in lines:
-            # Date patterns
-            date_patterns = [
-                r'(\d{2}\/\d{2}\/\d{4})\s+(\d{2}:\d{2})',  # 30/11/2024 14:56
-                r'(\d{1,2}\/\d{1,2}\/\d{4})\s+(\d{1,2}:\d{2})',  # 4/07/2025 20:48
-                r'(\d{2}\/\d{2}\/\d{4})',
-                r'(\d{1,2}\/\d{1,2}\/\d{4})',
-            ]
-            
-            for pattern in date_patterns:
-                match = re.search(pattern, line)
-                if match:
-                    return f"{match.group(1)} {match.group(2)}" if len(match.groups()) == 2 else match.group(1)
+            date = match_date(line)
+            if date:
+                return date
+        return None
+
+    def extract_date_from_filename(self, filename: str) -> Optional[str]:
+        """Extract date from filename pattern: YYYY_MMDD_HHMM"""
+        filename_date_match = FILENAME_DATE_PATTERN.search(filename)
+        if filename_date_match:
+            year, month, day, hour, minute = filename_date_match.groups()
+            return f"{day}/{month}/{year} {hour}:{minute}"
         return None
     
     def detect_format_type(self, content: str) -> str:
-        """Detect if the file is 1-column or 4-column format"""
-        if "Coverage Y(%)    Coverage M(%)    Coverage C(%)    Coverage K(%)" in content:
-            return "4-column"
-        elif "Coverage(%)" in content and "Coverage Y(%)" not in content:
-            return "1-column"
-        return "1-column"
+        """Detect the report format (e.g. 1-column or 4-column) from its signature"""
+        return self.formats.detect(content).name
     
+    def _extract_block(self, content: str, report_format: ReportFormat) -> List[Dict]:
+        block = CoverageBlock(report_format)
+        for line in content.split('\n'):
+            block.feed(line)
+            if block.done:
+                break
+        return block.coverage_data()
+
     def extract_coverage_data_1_column(self, content: str) -> List[Dict]:
         """Extract coverage data from 1-column format - PRECISE extraction"""
-        coverage_data = []
-        total_row = None
-        
-        lines = content.split('\n')
-        in_coverage_section = False
-        
-        for line in lines:
-            line = line.strip()
-            
-            # Start extraction ONLY after finding the exact header
-            if "Section" in line and "Coverage(%)" in line:
-                in_coverage_section = True
-                continue
-            
-            # Skip lines before coverage section
-            if not in_coverage_section:
-                continue
-                
-            # Skip separator lines and empty lines
-            if line.startswith('-') or not line or len(line) < 3:
-                continue
-                
-            # Stop if we hit another section or end markers
-            if any(marker in line.lower() for marker in ['coverage page data', '====', 'printer', 'custom']):
-                break
-            
-            # PRECISELY match section-coverage pattern: Section_name    coverage_value
-            # Must be format: XXXXK-XXXXK followed by a decimal number
-            section_pattern = r'^(\d+K-\d+K)\s+(\d+\.?\d*)$'
-            total_pattern = r'^total\s+(\d+\.?\d*)$'
-            
-            # Check for Total row
-            total_match = re.match(total_pattern, line, re.IGNORECASE)
-            if total_match:
-                total_row = {
-                    'Section': 'Total',
-                    'Coverage_Y': float(total_match.group(1)),
-                    'Coverage_M': 0.0,
-                    'Coverage_C': 0.0,
-                    'Coverage_K': 0.0,
-                    'Is_Total': True
-                }
-                continue
-            
-            # Check for section data
-            section_match = re.match(section_pattern, line)
-            if section_match:
-                try:
-                    coverage_data.append({
-                        'Section': section_match.group(1),
-                        'Coverage_Y': float(section_match.group(2)),
-                        'Coverage_M': 0.0,
-                        'Coverage_C': 0.0,
-                        'Coverage_K': 0.0,
-                        'Is_Total': False
-                    })
-                except ValueError:
-                    continue
-        
-        # Add Total row at the beginning if found
-        if total_row:
-            coverage_data.insert(0, total_row)
-            
-        return coverage_data
+        return self._extract_block(content, self.formats.get('1-column'))
     
     def extract_coverage_data_4_column(self, content: str) -> List[Dict]:
         """Extract coverage data from 4-column format - PRECISE extraction"""
-        coverage_data = []
-        total_row = None
-        
-        lines = content.split('\n')
-        in_coverage_section = False
-        
-        for line in lines:
-            line = line.strip()
-            
-            # Start extraction ONLY after finding the exact header
-            if "Section" in line and "Coverage Y(%)" in line:
-                in_coverage_section = True
-                continue
-            
-            # Skip lines before coverage section
-            if not in_coverage_section:
-                continue
-                
-            # Skip separator lines and empty lines
-            if line.startswith('-') or not line or len(line) < 3:
-                continue
-                
-            # Stop if we hit another section
-            if any(marker in line.lower() for marker in ['coverage page data', '====', 'printer', 'custom']):
-                break
-            
-            # PRECISELY match patterns
-            section_pattern = r'^(\d+K-\d+K)\s+(\d+\.?\d*)\s+(\d+\.?\d*)\s+(\d+\.?\d*)\s+(\d+\.?\d*)$'
-            total_pattern = r'^total\s+(\d+\.?\d*)\s+(\d+\.?\d*)\s+(\d+\.?\d*)\s+(\d+\.?\d*)$'
-            
-            # Check for Total row
-            total_match = re.match(total_pattern, line, re.IGNORECASE)
-            if total_match:
-                total_row = {
-                    'Section': 'Total',
-                    'Coverage_Y': float(total_match.group(1)),
-                    'Coverage_M': float(total_match.group(2)),
-                    'Coverage_C': float(total_match.group(3)),
-                    'Coverage_K': float(total_match.group(4)),
-                    'Is_Total': True
-                }
-                continue
-            
-            # Check for section data
-            section_match = re.match(section_pattern, line)
-            if section_match:
-                try:
-                    coverage_data.append({
-                        'Section': section_match.group(1),
-                        'Coverage_Y': float(section_match.group(2)),
-                        'Coverage_M': float(section_match.group(3)),
-                        'Coverage_C': float(section_match.group(4)),
-                        'Coverage_K': float(section_match.group(5)),
-                        'Is_Total': False
-                    })
-                except ValueError:
-                    continue
-        
-        # Add Total row at the beginning if found
-        if total_row:
-            coverage_data.insert(0, total_row)
-            
-        return coverage_data
+        return self._extract_block(content, self.formats.get('4-column'))
     
     def extract_coverage_data(self, content: str, format_type: str) -> List[Dict]:
         """Extract coverage data based on detected format"""
-        if format_type == "1-column":
-            return self.extract_coverage_data_1_column(content)
-        else:
-            return self.extract_coverage_data_4_column(content)
+        return self._extract_block(content, self.formats.get(format_type) or self.formats.fallback)
     
     def process_file(self, file_content: str, filename: str) -> Dict:
         """Process a single file and extract all required data"""
-        format_type = self.detect_format_type(file_content)
-        
-        # Extract device ID
-        device_id = self.extract_device_id(file_content) or self.extract_device_id_from_filename(filename)
-        
-        # Extract date
-        date = self.extract_date(file_content)
+        if self.instrumentation is None:
+            return self._build_result(filename, self.scanner.scan(file_content))
+        start = time.perf_counter()
+        batch = self.scanner.scan(file_content)
+        self.instrumentation.record('scan', time.perf_counter() - start, len(file_content))
+        return self._build_result(filename, batch)
+    
+    def process_bytes(self, data, filename: str) -> Dict:
+        """Process raw report bytes (bytes, bytearray, memoryview or mmap) without decoding the file
+
+        The result equals process_file on the content decoded as utf-8 with
+        the latin-1 fallback. ASCII and non-utf-8 reports are scanned as
+        latin-1 bytes, decoding only the lines the scan walks; only reports
+        holding valid non-ASCII utf-8 are decoded in full.
+        """
+        return self._build_result(filename, self.scan_batch(data))
+    
+    def scan_bytes(self, data) -> Tuple[str, Optional[str], Optional[str], List[Dict]]:
+        """(format_type, device_id, date, coverage_data) of raw report bytes, before filename fallbacks"""
+        batch = self.scan_batch(data)
+        header = batch.header
+        return header.format_type, header.device_id, header.date, batch.coverage_data()
+    
+    def scan_batch(self, data) -> CoverageBatch:
+        """CoverageBatch of raw report bytes: header without filename, before filename fallbacks
+
+        Depends on the content only, so it can be cached by content hash.
+        With instrumentation, the ASCII check and any full utf-8 decode count
+        as 'decode'; the byte scan's per-line latin-1 decoding is part of
+        'scan', as are format detection and row extraction (one pass).
+        """
+        instrumentation = self.instrumentation
+        if instrumentation is not None:
+            start = time.perf_counter()
+        if isinstance(data, memoryview):
+            # memoryview has no find(); use the exporting object when the view covers all of it
+            if isinstance(data.obj, (bytes, bytearray, mmap.mmap)) and data.c_contiguous and data.nbytes == len(data.obj):
+                data = data.obj
+            else:
+                data = data.tobytes()
+        content = data
+        if not is_ascii(data):
+            try:
+                content = str(data, 'utf-8')
+            except UnicodeDecodeError:
+                pass
+        if instrumentation is None:
+            return self.scanner.scan(content)
+        decoded = time.perf_counter()
+        instrumentation.record('decode', decoded - start, len(data))
+        batch = self.scanner.scan(content)
+        instrumentation.record('scan', time.perf_counter() - decoded, len(data))
+        return batch
+    
+    def process_path(self, path: str, filename: Optional[str] = None) -> Dict:
+        """Process a local report file through a read-only mmap (see process_bytes)"""
+        filename = filename or os.path.basename(path)
+        with open(path, 'rb') as file:
+            if not os.fstat(file.fileno()).st_size:
+                # Empty files cannot be mapped
+                return self.process_bytes(b'', filename)
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return self.process_bytes(mapped, filename)
+    
+    def process_lines(self, lines: Iterable[str], filename: str) -> Dict:
+        """Process a report streamed as lines (without newlines); same result shape as process_file"""
+        return self._build_result(filename, self.scanner.scan_lines(lines))
+    
+    def apply_filename_fallbacks(self, filename: str, device_id: Optional[str],
+                                 date: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+        """Fall back to the filename for a device ID or date the content did not yield"""
+        device_id = device_id or self.extract_device_id_from_filename(filename)
         if not date:
-            # Try filename pattern: YYYY_MMDD_HHMM
-            filename_date_match = re.search(r'(\d{4})_(\d{2})(\d{2})_(\d{2})(\d{2})', filename)
-            if filename_date_match:
-                year, month, day, hour, minute = filename_date_match.groups()
-                date = f"{day}/{month}/{year} {hour}:{minute}"
-        
-        # Extract coverage data
-        coverage_data = self.extract_coverage_data(file_content, format_type)
+            date = self.extract_date_from_filename(filename)
+        return device_id, date
+    
+    def complete_header(self, batch: CoverageBatch, filename: str) -> CoverageBatch:
+        """Batch of the same rows with the filename and its fallbacks applied to the header"""
+        header = batch.header
+        device_id, date = self.apply_filename_fallbacks(filename, header.device_id, header.date)
+        return CoverageBatch(ReportHeader(device_id, date, filename, header.format_type), batch.sections, batch.values)
+    
+    def _build_result(self, filename: str, batch: CoverageBatch) -> Dict:
+        header = self.complete_header(batch, filename).header
+        coverage_data = batch.coverage_data()
         
         return {
             'filename': filename,
-            'device_id': device_id,
-            'date': date,
-            'format_type': format_type,
+            'device_id': header.device_id,
+            'date': header.date,
+            'format_type': header.format_type,
             'coverage_data': coverage_data,
             'debug_info': {
-                'device_id_found': device_id is not None,
-                'date_found': date is not None,
+                'device_id_found': header.device_id is not None,
+                'date_found': header.date is not None,
                 'coverage_rows_found': len(coverage_data),
-                'format_detected': format_type,
-                'has_total_row': any(row.get('Is_Total', False) for row in coverage_data)
+                'format_detected': header.format_type,
+                'has_total_row': batch.has_total
             }
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,92 @@
+import numpy as np
+from datetime import datetime
+from typing import Optional
+from coverage_store import NO_TIMESTAMP, CoverageStore, to_seconds
+
+
+class ReportTimeline:
+    """Reports (files) of a CoverageStore keyed by (device, report timestamp), in sorted order
+
+    Report dates are parsed once, when the store interns them; the timeline
+    sorts the file table (not the rows) by (Device_ID code, timestamp, file
+    id), so each device's history is one contiguous slice and the latest
+    report is its last entry. A second ordering by (timestamp, file id)
+    serves time-range slices across devices. Both are rebuilt lazily once
+    the store version changes, which costs O(F log F) for F files.
+
+    Reports whose date does not parse sort before the dated reports of their
+    device and never fall inside a time range; among reports with the same
+    timestamp the one loaded last counts as the latest.
+    """
+
+    def __init__(self, store: CoverageStore):
+        self.store = store
+        self.version = None
+
+    def _refresh(self):
+        store = self.store
+        if self.version == store.version:
+            return
+        file_ids = np.arange(store.file_count)
+        devices = store.file_column('Device_ID').astype(np.int64)
+        timestamps = store.file_timestamps()
+        # File ids sorted by (device, timestamp, file id); device d owns device_order[bounds[d]:bounds[d + 1]]
+        self.device_order = np.lexsort((file_ids, timestamps, devices))
+        self.device_timestamps = timestamps[self.device_order]
+        self.bounds = np.concatenate([[0], np.cumsum(np.bincount(devices, minlength=len(store.categories['Device_ID'])))])
+        # Position of every file in device_order
+        self.ranks = np.empty(store.file_count, dtype=np.int64)
+        self.ranks[self.device_order] = np.arange(store.file_count)
+        # File ids sorted by (timestamp, file id), for slices across devices
+        self.time_order = np.lexsort((file_ids, timestamps))
+        self.sorted_timestamps = timestamps[self.time_order]
+        self.version = store.version
+
+    @staticmethod
+    def _span(timestamps: np.ndarray, start: Optional[datetime], end: Optional[datetime]):
+        """[low, high) of the sorted timestamps within [start, end]; undated entries are only kept without bounds"""
+        if start is None and end is None:
+            return 0, len(timestamps)
+        if start is not None:
+            low = np.searchsorted(timestamps, to_seconds(start), 'left')
+        else:
+            # Skip the undated entries, which sort first
+            low = np.searchsorted(timestamps, NO_TIMESTAMP, 'right')
+        high = np.searchsorted(timestamps, to_seconds(end), 'right') if end is not None else len(timestamps)
+        return int(low), int(max(low, high))
+
+    def device_history(self, device_id: str, start: Optional[datetime] = None,
+                       end: Optional[datetime] = None) -> np.ndarray:
+        """File ids of one device's reports, oldest first, optionally within [start, end]"""
+        self._refresh()
+        code = self.store.categories['Device_ID'].codes.get(device_id)
+        if code is None:
+            return np.zeros(0, dtype=np.int64)
+        first, last = int(self.bounds[code]), int(self.bounds[code + 1])
+        low, high = self._span(self.device_timestamps[first:last], start, end)
+        return self.device_order[first + low:first + high]
+
+    def in_range(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> np.ndarray:
+        """File ids of every report within [start, end], oldest first"""
+        self._refresh()
+        low, high = self._span(self.sorted_timestamps, start, end)
+        return self.time_order[low:high]
+
+    def latest(self, file_ids: Optional[np.ndarray] = None) -> np.ndarray:
+        """Sorted file ids of the latest report of each device, among file_ids (default: every file)"""
+        self._refresh()
+        if file_ids is None:
+            present = np.flatnonzero(np.diff(self.bounds))
+            return np.sort(self.device_order[self.bounds[present + 1] - 1])
+        if not len(file_ids):
+            return np.zeros(0, dtype=np.int64)
+        # Within device_order a device's reports are contiguous and ascending in time, so the
+        # candidate with the highest rank per device is its latest
+        ranks = np.sort(self.ranks[file_ids])
+        devices = self.store.file_column('Device_ID')[self.device_order[ranks]]
+        is_last = np.append(devices[1:] != devices[:-1], True)
+        return np.sort(self.device_order[ranks[is_last]])
+
+    def timestamps(self, file_ids: np.ndarray) -> np.ndarray:
+        """Report times of files as datetime64[s] (NaT where the date does not parse)"""
+        return self.store.file_timestamps()[file_ids].view('datetime64[s]')